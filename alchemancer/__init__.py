@@ -1,5 +1,7 @@
 from marshmallow.fields import Field  # noqa: F401
 
 from alchemancer.ast_handler import AstHandler  # noqa: F401
+from alchemancer.async_query_generator import AsyncQueryGenerator  # noqa: F401
 from alchemancer.query_generator import QueryGenerator  # noqa: F401
+from alchemancer.query_hasher import QueryHasher  # noqa: F401
 from alchemancer.reflection_handler import ReflectionHandler  # noqa: F401
@@ -10,6 +10,7 @@ from typing import Any, Dict, Optional, Tuple, cast
 
 from sqlalchemy import Select
 
+from alchemancer.lru_cache import CacheStats, LruCache
 from alchemancer.reflection_handler import (
     ReflectionHandler,
 )
@@ -17,12 +18,40 @@ from alchemancer.types.query import (
     ColumnTypesT,
 )
 
+# Evaluates a compiled expression against a request's context and model key
+ExpressionEvaluatorT = Callable[[Dict, Optional[str]], Any]
+
 
 class AstHandler:
+    """
+    Converts functional column strings like ``coalesce(User.account_balance, 0).desc()`` into
+    SQLAlchemy expressions.
+
+    Each source string is parsed and validated once and compiled into a tree of evaluators that
+    is kept in a bounded cache. Constants, attribute access, calls and keywords are fixed at
+    compile time, only names are looked up again on every evaluation since they resolve through
+    the request's context, the model key and its subqueries.
+    """
+
     reflection_handler: ReflectionHandler
+    __expression_cache: Optional[LruCache[str, ExpressionEvaluatorT]]
 
-    def __init__(self, reflection_handler: Optional[ReflectionHandler] = None) -> None:
+    def __init__(
+        self,
+        reflection_handler: Optional[ReflectionHandler] = None,
+        expression_cache_size: int = 512,
+    ) -> None:
+        """
+        :param expression_cache_size: how many compiled expressions to keep, 0 disables caching.
+        """
         self.reflection_handler = reflection_handler or ReflectionHandler()
+        self.__expression_cache = (
+            LruCache(expression_cache_size) if expression_cache_size > 0 else None
+        )
+
+    @property
+    def expression_cache_stats(self) -> Optional[CacheStats]:
+        return self.__expression_cache.stats if self.__expression_cache is not None else None
 
     def convert_ast_to_sqlalchemy_column(
         self, functional_column: str, context: Dict, model_key: Optional[str] = None
@@ -30,75 +59,112 @@ class AstHandler:
         Tuple[str, Select | ColumnTypesT | Callable[..., Any]]
     ):
         # For now the return type is any but this honestly only returns sql alchemy columns / selects
+        return self.compile_expression(functional_column)(context, model_key)
+
+    def compile_expression(self, functional_column: str) -> ExpressionEvaluatorT:
+        """
+        Returns the reusable evaluator for a functional column string, raises for syntax errors
+        and unsupported expressions.
+        """
+        if self.__expression_cache is None:
+            return self._compile_expression(functional_column)
+
+        evaluator = self.__expression_cache.get(functional_column)
+        if evaluator is None:
+            evaluator = self._compile_expression(functional_column)
+            self.__expression_cache[functional_column] = evaluator
+
+        return evaluator
+
+    def clear_expression_cache(self) -> None:
+        if self.__expression_cache is not None:
+            self.__expression_cache.clear()
+
+    def _compile_expression(self, functional_column: str) -> ExpressionEvaluatorT:
         tokens = ast.parse(functional_column)
         bodies: list[ast.stmt] = tokens.body
         for body in bodies:
-            return self._ast_switch(body.value, context, model_key)
+            return self._ast_switch(body.value)
 
-    def _ast_switch(
-        self, value, context: Dict, model_key: Optional[str] = None
-    ) -> (None | Select | ColumnTypesT | Callable[..., Any]) | (
-        Tuple[str, Select | ColumnTypesT | Callable[..., Any]]
-    ):
+        return lambda context, model_key: None
+
+    def _ast_switch(self, value) -> ExpressionEvaluatorT:
         match type(value):
             case ast.Name:
                 value = cast(ast.Name, value)
-                return self._process_name(value, context, model_key)
+                return self._process_name(value)
             case ast.Constant:
                 value = cast(ast.Constant, value)
-                return value.value
+                return self._process_constant(value)
             case ast.Call:
                 value = cast(ast.Call, value)
-                return self._process_call(value, context, model_key)
+                return self._process_call(value)
             case ast.Attribute:
                 value = cast(ast.Attribute, value)
-                return self._process_attribute(value, context, model_key)
+                return self._process_attribute(value)
             case ast.keyword:
                 value = cast(ast.keyword, value)
-                return self._process_keyword(value, context, model_key)
+                return self._process_keyword(value)
 
         raise NotImplementedError(f"Not implemented: {value}")
 
-    def _process_name(self, name_obj: ast.Name, context: Dict, model_key: Optional[str] = None):
-        value = (
-            context.get(name_obj.id)
-            or self.reflection_handler.model_class_cache.get(name_obj.id)
-            or self.reflection_handler.model_field_cache.get(model_key, {}).get(name_obj.id)
-        )
-        if value is None and name_obj.id.lower() not in ["none", "null"]:
-            subquery_model = context.get("subqueries", {}).get(model_key, None)
-            if subquery_model is not None:
-                subquery_columns = [column.key for column in subquery_model.columns]
-                if name_obj.id in subquery_columns:
-                    return getattr(subquery_model.c, name_obj.id)
-
-            raise Exception("Could not find", name_obj.id)
-
-        return value
-
-    def _process_call(self, call_obj: ast.Call, context: Dict, model_key: Optional[str] = None):
-        processed_args = [self._ast_switch(x, context, model_key) for x in call_obj.args]
-        processed_keywords = {
-            z[0]: z[1]
-            for z in [self._ast_switch(x, context, model_key) for x in call_obj.keywords]
-        }
-        processed_func: Callable = self._ast_switch(call_obj.func, context, model_key)
-        return processed_func(*processed_args, **processed_keywords)
-
-    def _process_attribute(
-        self,
-        attribute_obj: ast.Attribute,
-        context: Dict,
-        model_key: Optional[str] = None,
-    ):
-        parent = self._ast_switch(attribute_obj.value, context, model_key)
-        return getattr(parent, attribute_obj.attr)
+    def _process_name(self, name_obj: ast.Name) -> ExpressionEvaluatorT:
+        name = name_obj.id
+        is_null = name.lower() in ["none", "null"]
+        model_class_cache = self.reflection_handler.model_class_cache
+        model_field_cache = self.reflection_handler.model_field_cache
 
-    def _process_keyword(
-        self, keyword_obj: ast.keyword, context: Dict, model_key: Optional[str] = None
-    ):
-        return keyword_obj.arg, self._ast_switch(keyword_obj.value, context, model_key)
+        def evaluate_name(context: Dict, model_key: Optional[str] = None):
+            value = (
+                context.get(name)
+                or model_class_cache.get(name)
+                or model_field_cache.get(model_key, {}).get(name)
+            )
+            if value is None and not is_null:
+                subquery_model = context.get("subqueries", {}).get(model_key, None)
+                if subquery_model is not None:
+                    subquery_columns = [column.key for column in subquery_model.columns]
+                    if name in subquery_columns:
+                        return getattr(subquery_model.c, name)
+
+                raise Exception("Could not find", name)
+
+            return value
+
+        return evaluate_name
+
+    def _process_call(self, call_obj: ast.Call) -> ExpressionEvaluatorT:
+        args = [self._ast_switch(x) for x in call_obj.args]
+        keywords = [self._ast_switch(x) for x in call_obj.keywords]
+        func = self._ast_switch(call_obj.func)
+
+        def evaluate_call(context: Dict, model_key: Optional[str] = None):
+            processed_args = [arg(context, model_key) for arg in args]
+            processed_keywords = dict(keyword(context, model_key) for keyword in keywords)
+            processed_func: Callable = func(context, model_key)
+            return processed_func(*processed_args, **processed_keywords)
+
+        return evaluate_call
+
+    def _process_attribute(self, attribute_obj: ast.Attribute) -> ExpressionEvaluatorT:
+        parent = self._ast_switch(attribute_obj.value)
+        attribute_name = attribute_obj.attr
+
+        def evaluate_attribute(context: Dict, model_key: Optional[str] = None):
+            return getattr(parent(context, model_key), attribute_name)
+
+        return evaluate_attribute
+
+    def _process_keyword(self, keyword_obj: ast.keyword) -> ExpressionEvaluatorT:
+        keyword_name = keyword_obj.arg
+        value = self._ast_switch(keyword_obj.value)
+
+        def evaluate_keyword(context: Dict, model_key: Optional[str] = None):
+            return keyword_name, value(context, model_key)
+
+        return evaluate_keyword
 
     @staticmethod
-    def _process_constant(constant_obj: ast.Constant):
-        return constant_obj.value
+    def _process_constant(constant_obj: ast.Constant) -> ExpressionEvaluatorT:
+        constant = constant_obj.value
+        return lambda context, model_key=None: constant
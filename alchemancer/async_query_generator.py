@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import sys
+from contextlib import contextmanager, nullcontext
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from weakref import WeakKeyDictionary
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.util import await_only
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.query_transformation_handler import QueryTransformationHandler
+from alchemancer.types.query import HqlQuery, HqlResponse
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncQueryGenerator(QueryGenerator):
+    """
+    QueryGenerator for asyncio applications, executes queries through an AsyncEngine.
+
+    Queries are built inside ``AsyncConnection.run_sync``, so resolvers create and fill their
+    temp tables on the same (async) connection the query is executed on without blocking the
+    event loop. Requires the ``sqlalchemy[asyncio]`` extra and an async driver like asyncpg or
+    aiosqlite.
+
+    A generator can be used from several event loops, e.g. with ``asyncio.run`` per request.
+    The cost guard's ``max_concurrent_expensive`` and ``refresh_workers`` then apply per loop.
+    """
+
+    __async_engine: AsyncEngine
+    # asyncio semaphores are bound to the loop they are first awaited on
+    __loop_semaphores: (
+        "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]"
+    )
+    __refresh_tasks: Dict[Tuple[str, asyncio.AbstractEventLoop], "asyncio.Task[None]"]
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        base_context_dict: Optional[Dict[str, Any]] = None,
+        query_transformer: QueryTransformationHandler = None,
+        **kwargs,
+    ):
+        """
+        Accepts the same keyword arguments as QueryGenerator.
+        """
+        super().__init__(engine.sync_engine, base_context_dict, query_transformer, **kwargs)
+        self.__async_engine = engine
+        self.__loop_semaphores = WeakKeyDictionary()
+        self.__refresh_tasks = {}
+
+    async def return_from_hql_query(
+        self,
+        query: HqlQuery,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ):
+        return (
+            await self.return_response_from_hql_query(
+                query, complexity_budget, statement_timeout
+            )
+        )["data"]
+
+    async def return_response_from_hql_query(
+        self,
+        query: HqlQuery,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> HqlResponse:
+        """See QueryGenerator.return_response_from_hql_query"""
+        query, context_dict = self._prepare_query(query, complexity_budget=complexity_budget)
+        result_key = self._get_result_key(query)
+
+        async def execute_query() -> HqlResponse:
+            generations = self._get_table_generations(result_key)
+            async with self.__async_engine.connect() as connection:
+                generated_query, rows, total_info = await connection.run_sync(
+                    self._fetch_generated_query, query, context_dict, statement_timeout
+                )
+
+            return self._cache_response(
+                result_key,
+                self._build_response(query, generated_query, rows, total_info),
+                generations,
+            )
+
+        async def fetch_response() -> HqlResponse:
+            if self.single_flight is not None:
+                return await self.single_flight.do_async(
+                    (result_key[0], statement_timeout), execute_query
+                )
+            return await execute_query()
+
+        if result_key is None:
+            return await execute_query()
+
+        if self.result_cache is not None:
+            cached_response, is_stale = self.result_cache.lookup(result_key[0])
+            if cached_response is not None:
+                if is_stale:
+                    self.__refresh_in_background(result_key[0], fetch_response)
+                return self._copy_response(cached_response)
+
+        return self._copy_response(await fetch_response())
+
+    async def return_from_hql_queries(
+        self,
+        queries: Dict[Hashable, HqlQuery],
+        return_errors: bool = False,
+        read_only: bool = True,
+        concurrency: int = 1,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """See return_responses_from_hql_queries, returns the data of every response"""
+        responses = await self.return_responses_from_hql_queries(
+            queries, return_errors, read_only, concurrency, complexity_budget, statement_timeout
+        )
+        return self._get_batch_data(responses)
+
+    async def return_responses_from_hql_queries(
+        self,
+        queries: Dict[Hashable, HqlQuery],
+        return_errors: bool = False,
+        read_only: bool = True,
+        concurrency: int = 1,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """
+        See QueryGenerator.return_responses_from_hql_queries, concurrent queries are run as tasks
+        instead of threads.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency needs to be at least 1")
+
+        if concurrency == 1 or len(queries) < 2:
+            async with self.__async_engine.connect() as connection:
+                return await connection.run_sync(
+                    self._fetch_hql_queries,
+                    queries,
+                    return_errors,
+                    read_only,
+                    complexity_budget,
+                    statement_timeout,
+                )
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_hql_query(query_id: Hashable, query: HqlQuery) -> Any:
+            async with semaphore:
+                async with self.__async_engine.connect() as connection:
+                    results = await connection.run_sync(
+                        self._fetch_hql_queries,
+                        {query_id: query},
+                        return_errors,
+                        read_only,
+                        complexity_budget,
+                        statement_timeout,
+                    )
+                    return results[query_id]
+
+        results = await asyncio.gather(
+            *[fetch_hql_query(query_id, query) for query_id, query in queries.items()]
+        )
+        return dict(zip(queries.keys(), results))
+
+    def stream_from_hql_query(
+        self,
+        query: HqlQuery,
+        chunk_size: int = 1000,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Returns an async generator yielding the serialized results of the query in lists of at
+        most ``chunk_size`` rows, read from a server side cursor. The query is validated when
+        this is called. The connection is released once the generator is exhausted or closed
+        (``aclose``).
+        """
+        query, context_dict = self._prepare_stream_query(query, chunk_size, complexity_budget)
+        return self.__stream_prepared_query(query, context_dict, chunk_size, statement_timeout)
+
+    async def __stream_prepared_query(
+        self,
+        query: HqlQuery,
+        context_dict: Dict[str, Any],
+        chunk_size: int,
+        statement_timeout: Optional[float],
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        async with self.__async_engine.connect() as connection:
+            generated_query = await connection.run_sync(
+                lambda sync_connection: self._generate_query(
+                    query, context_dict, sync_connection
+                )
+            )
+            is_expensive = await connection.run_sync(self._check_query_cost, generated_query)
+            serializer = self._get_result_serializer(generated_query.query.selected_columns)
+            # the timeout is entered and exited inside run_sync, where it can use the connection
+            timeout = await connection.run_sync(
+                self._statement_timeout, query, statement_timeout
+            )
+            await connection.run_sync(lambda _: timeout.__enter__())
+            try:
+                async with (
+                    self.__semaphore("expensive", self.cost_guard.max_concurrent_expensive)
+                    if is_expensive
+                    else nullcontext()
+                ):
+                    async with connection.stream(
+                        self._executable_for(connection.dialect, generated_query),
+                        generated_query.parameters,
+                        execution_options={"yield_per": chunk_size},
+                    ) as result:
+                        async for partition in result.partitions():
+                            yield serializer.dump(partition)
+            except BaseException:
+                exc_info = sys.exc_info()
+                await connection.run_sync(lambda _: timeout.__exit__(*exc_info))
+                raise
+            else:
+                await connection.run_sync(lambda _: timeout.__exit__(None, None, None))
+
+    def __refresh_in_background(
+        self, key: str, refresh: Callable[[], Awaitable[HqlResponse]]
+    ) -> None:
+        """See QueryGenerator._refresh_in_background, refreshes run as tasks."""
+        # tasks are bound to their loop, every loop refreshes its own stale entries
+        task_key = (key, asyncio.get_running_loop())
+        if task_key in self.__refresh_tasks:
+            return
+
+        async def run_refresh() -> None:
+            try:
+                async with self.__semaphore("refresh", self.refresh_workers):
+                    await refresh()
+            except Exception:
+                logger.exception("Refreshing the stale result cache entry %s failed", key)
+            finally:
+                del self.__refresh_tasks[task_key]
+
+        # the event loop only keeps weak references to tasks
+        self.__refresh_tasks[task_key] = asyncio.ensure_future(run_refresh())
+
+    @contextmanager
+    def _throttle_expensive_query(self) -> Iterator[None]:
+        # runs inside run_sync, blocking on a threading semaphore would block the event loop
+        semaphore = self.__semaphore("expensive", self.cost_guard.max_concurrent_expensive)
+        await_only(semaphore.acquire())
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def __semaphore(self, name: str, value: int) -> asyncio.Semaphore:
+        """The running event loop's semaphore with the given name, created on first use"""
+        semaphores = self.__loop_semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(name)
+        if semaphore is None:
+            semaphore = semaphores[name] = asyncio.Semaphore(value)
+        return semaphore
@@ -0,0 +1,118 @@
+import threading
+from contextlib import AbstractContextManager
+from typing import Any, Dict, Hashable, List, Literal, Optional
+
+from sqlalchemy import Connection, Select
+from sqlalchemy.engine.interfaces import Dialect
+
+from alchemancer.explain import QueryPlan, explain
+from alchemancer.lru_cache import CacheStats, LruCache
+from alchemancer.types.exceptions import QueryCostError
+
+
+class CostGuard:
+    """
+    Checks the ``EXPLAIN`` plan of a query against cost thresholds before it is executed.
+
+    Plans are cached per query shape, so a shape is only explained the first time it is seen
+    and later queries of the shape are judged by that plan. Thresholds a plan has no value for
+    are skipped, SQLite plans can only exceed ``max_full_scans``. Expensive queries are either
+    rejected with a QueryCostError or throttled, only ``max_concurrent_expensive`` of them run
+    at a time and the rest wait for their turn.
+    """
+
+    dialect_names = frozenset(("postgresql", "sqlite"))
+    max_cost: Optional[float]
+    max_rows: Optional[float]
+    max_full_scans: Optional[int]
+    action: Literal["reject", "throttle"]
+    max_concurrent_expensive: int
+    __plans: LruCache[Hashable, QueryPlan]
+    __semaphore: threading.BoundedSemaphore
+
+    def __init__(
+        self,
+        max_cost: Optional[float] = None,
+        max_rows: Optional[float] = None,
+        max_full_scans: Optional[int] = None,
+        action: Literal["reject", "throttle"] = "reject",
+        max_concurrent_expensive: int = 1,
+        plan_cache_size: int = 256,
+    ) -> None:
+        """
+        :param max_cost: highest planner cost (PostgreSQL's total cost of the plan).
+        :param max_rows: highest number of rows the planner estimates the query to return.
+        :param max_full_scans: how many tables the query may read with a full table scan.
+        :param action: what happens to queries exceeding a threshold.
+        :param max_concurrent_expensive: how many expensive queries run at a time when they are
+        throttled.
+        :param plan_cache_size: how many query shapes to keep plans for.
+        """
+        if action not in ("reject", "throttle"):
+            raise ValueError('action needs to be "reject" or "throttle"')
+        if max_concurrent_expensive < 1:
+            raise ValueError("max_concurrent_expensive needs to be at least 1")
+
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.max_full_scans = max_full_scans
+        self.action = action
+        self.max_concurrent_expensive = max_concurrent_expensive
+        self.__plans = LruCache(plan_cache_size)
+        self.__semaphore = threading.BoundedSemaphore(max_concurrent_expensive)
+
+    @property
+    def plan_cache_stats(self) -> CacheStats:
+        return self.__plans.stats
+
+    def supports(self, dialect: Dialect) -> bool:
+        return dialect.name in self.dialect_names
+
+    def get_plan(
+        self,
+        connection: Connection,
+        statement: Select,
+        parameters: Optional[Dict[str, Any]] = None,
+        shape: Optional[Hashable] = None,
+    ) -> QueryPlan:
+        """The statement's plan, cached by ``shape`` unless that is None"""
+        plan = self.__plans.get(shape) if shape is not None else None
+        if plan is None:
+            plan = explain(connection, statement, parameters)
+            if shape is not None:
+                self.__plans[shape] = plan
+
+        return plan
+
+    def exceeded_thresholds(self, plan: QueryPlan) -> List[str]:
+        exceeded = []
+        if self.max_cost is not None and (plan.total_cost or 0) > self.max_cost:
+            exceeded.append("max_cost")
+        if self.max_rows is not None and (plan.rows or 0) > self.max_rows:
+            exceeded.append("max_rows")
+        if self.max_full_scans is not None and len(plan.full_scans) > self.max_full_scans:
+            exceeded.append("max_full_scans")
+
+        return exceeded
+
+    def check(
+        self,
+        connection: Connection,
+        statement: Select,
+        parameters: Optional[Dict[str, Any]] = None,
+        shape: Optional[Hashable] = None,
+    ) -> bool:
+        """
+        Returns whether the statement is expensive and needs to be throttled, raises a
+        QueryCostError for expensive statements when they are rejected.
+        """
+        plan = self.get_plan(connection, statement, parameters, shape)
+        exceeded = self.exceeded_thresholds(plan)
+        if exceeded and self.action == "reject":
+            raise QueryCostError(plan, exceeded)
+
+        return bool(exceeded)
+
+    def throttle(self) -> AbstractContextManager:
+        """Context manager holding one of the expensive query slots"""
+        return self.__semaphore
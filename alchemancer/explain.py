@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Connection, Select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """
+    ``EXPLAIN`` of a Select, executed with the Select's own parameters. On PostgreSQL the plan
+    is returned in JSON format as the single value of the single result row, on SQLite as the
+    rows of ``EXPLAIN QUERY PLAN``. Doesn't compile on other dialects.
+    """
+
+    inherit_cache = False
+    statement: Select
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_postgresql_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+@compiles(Explain, "sqlite")
+def _compile_sqlite_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return f"EXPLAIN QUERY PLAN {compiler.process(element.statement, **kw)}"
+
+
+class QueryPlan:
+    """
+    The parts of a query's plan Alchemancer looks at. SQLite's query plans have no cost or row
+    estimates, only their full table scans are known.
+    """
+
+    total_cost: Optional[float]
+    rows: Optional[float]
+    """Names of the tables read with a full scan"""
+    full_scans: List[str]
+
+    def __init__(
+        self, total_cost: Optional[float], rows: Optional[float], full_scans: List[str]
+    ) -> None:
+        self.total_cost = total_cost
+        self.rows = rows
+        self.full_scans = full_scans
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryPlan(total_cost={self.total_cost}, rows={self.rows}, "
+            f"full_scans={self.full_scans})"
+        )
+
+
+def _postgresql_full_scans(plan: Dict[str, Any]) -> List[str]:
+    full_scans = []
+    plans = [plan]
+    while plans:
+        plan = plans.pop()
+        if plan.get("Node Type") == "Seq Scan":
+            full_scans.append(plan["Relation Name"])
+        plans.extend(plan.get("Plans", ()))
+
+    return full_scans
+
+
+def explain(
+    connection: Connection, statement: Select, parameters: Optional[Dict[str, Any]] = None
+) -> QueryPlan:
+    """Returns the plan for the statement, PostgreSQL and SQLite only"""
+    result = connection.execute(Explain(statement), parameters)
+    if connection.dialect.name == "postgresql":
+        plan = result.scalar_one()[0]["Plan"]
+        return QueryPlan(plan["Total Cost"], plan["Plan Rows"], _postgresql_full_scans(plan))
+
+    # rows are (id, parent, unused, detail)
+    full_scans = [table for row in result if (table := _sqlite_full_scan(row[-1])) is not None]
+    return QueryPlan(None, None, full_scans)
+
+
+def _sqlite_full_scan(detail: str) -> Optional[str]:
+    """
+    The table a SQLite plan step reads with a full scan, "SCAN <table>" without an index.
+    SQLite before 3.36 writes "SCAN TABLE <table>".
+    """
+    words = detail.split()
+    if words[0] != "SCAN" or "USING" in words:
+        return None
+
+    if words[1] == "TABLE" and len(words) > 2:
+        return words[2]
+    return words[1]
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Literal, Sequence, Tuple
+
+from sqlalchemy import and_, or_, tuple_, type_coerce
+from sqlalchemy.sql.elements import ColumnElement
+
+from alchemancer.types.query import ColumnTypesT
+
+# Types that can't be represented in JSON are tagged so decoding restores the python type, the
+# cursor values are then coerced to their sort column's SQL type in keyset_clause.
+_ENCODERS: Dict[type, Tuple[str, Callable[[Any], str]]] = {
+    datetime: ("datetime", datetime.isoformat),
+    date: ("date", date.isoformat),
+    time: ("time", time.isoformat),
+    Decimal: ("decimal", str),
+    uuid.UUID: ("uuid", str),
+}
+_DECODERS: Dict[str, Callable[[str], Any]] = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": time.fromisoformat,
+    "decimal": Decimal,
+    "uuid": uuid.UUID,
+}
+
+
+def _encode_value(value: Any) -> Any:
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f"Can't use a value of type {type(value).__name__} in a cursor")
+
+    tag, to_string = encoder
+    return {tag: to_string(value)}
+
+
+def _decode_value(value: Dict[str, str]) -> Any:
+    ((tag, string_value),) = value.items()
+    return _DECODERS[tag](string_value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encodes the sort values of the last row of a page into an opaque cursor string"""
+    payload = json.dumps(list(values), default=_encode_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    if not isinstance(cursor, str):
+        raise TypeError("cursor needs to be a str")
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload, object_hook=_decode_value)
+    except (binascii.Error, ArithmeticError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+def keyset_clause(
+    sort_columns: Sequence[Tuple[ColumnTypesT, Literal["asc", "desc"]]],
+    values: Sequence[Any],
+) -> ColumnElement[bool]:
+    """
+    Filters for the rows sorted after ``values``. A single row value comparison when all columns
+    are sorted in the same direction, the equivalent expanded comparison otherwise. Rows with
+    NULL sort values are never matched, keyset pagination needs non nullable sort columns and
+    the last of them to be unique.
+    """
+    if len(sort_columns) != len(values):
+        raise ValueError("cursor does not match the query's order_by")
+
+    # the values can be untyped bind parameters of a cached template, coercing them gives them
+    # the sort column's type so e.g. datetimes are bound the way the column stores them
+    values = [
+        type_coerce(value, column.type) for (column, _), value in zip(sort_columns, values)
+    ]
+    directions = {direction for _, direction in sort_columns}
+    if len(directions) == 1:
+        columns = tuple_(*[column for column, _ in sort_columns])
+        row_value = tuple_(*values)
+        return columns < row_value if "desc" in directions else columns > row_value
+
+    clauses = []
+    for index, (column, direction) in enumerate(sort_columns):
+        clauses.append(
+            and_(
+                *[
+                    previous_column == values[previous_index]
+                    for previous_index, (previous_column, _) in enumerate(sort_columns[:index])
+                ],
+                column < values[index] if direction == "desc" else column > values[index],
+            )
+        )
+
+    return or_(*clauses)
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ValueT = TypeVar("ValueT")
+
+
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+    expirations: int
+
+    def __init__(
+        self,
+        hits: int,
+        misses: int,
+        evictions: int,
+        size: int,
+        maxsize: int,
+        expirations: int = 0,
+    ):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.size = size
+        self.maxsize = maxsize
+        self.expirations = expirations
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheStats(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+            f"size={self.size}, maxsize={self.maxsize}, expirations={self.expirations})"
+        )
+
+
+class LruCache(Generic[KeyT, ValueT]):
+    """
+    Small thread safe, size bounded LRU mapping with hit / miss / eviction counters.
+
+    Only the subset of the dict interface needed by Alchemancer is implemented, which is also
+    the subset SQLAlchemy needs when it is handed in as a ``compiled_cache``. With a ``ttl``
+    entries expire that many seconds after they were set, expired entries are dropped the next
+    time they are looked up and count as misses. ``on_evict`` is called with the key of every
+    entry dropped for its size or its age, after the lock has been released.
+    """
+
+    maxsize: int
+    ttl: Optional[float]
+    __on_evict: Optional[Callable[[KeyT], None]]
+    __data: "OrderedDict[KeyT, ValueT]"
+    __expires_at: Dict[KeyT, float]
+    __lock: threading.Lock
+    __hits: int
+    __misses: int
+    __evictions: int
+    __expirations: int
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[KeyT], None]] = None,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize needs to be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl needs to be above 0")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.__on_evict = on_evict
+        self.__data = OrderedDict()
+        self.__expires_at = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def get(self, key: KeyT, default: Optional[ValueT] = None) -> Optional[ValueT]:
+        with self.__lock:
+            try:
+                value = self.__data[key]
+            except KeyError:
+                self.__misses += 1
+                return default
+
+            if not self.__expire(key):
+                self.__data.move_to_end(key)
+                self.__hits += 1
+                return value
+
+            self.__misses += 1
+
+        self.__evicted([key])
+        return default
+
+    def __setitem__(self, key: KeyT, value: ValueT) -> None:
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            if self.ttl is not None:
+                self.__expires_at[key] = time.monotonic() + self.ttl
+            evicted_keys = []
+            while len(self.__data) > self.maxsize:
+                evicted_key, _ = self.__data.popitem(last=False)
+                self.__expires_at.pop(evicted_key, None)
+                self.__evictions += 1
+                evicted_keys.append(evicted_key)
+
+        self.__evicted(evicted_keys)
+
+    def __getitem__(self, key: KeyT) -> ValueT:
+        with self.__lock:
+            value = self.__data[key]
+            if not self.__expire(key):
+                self.__data.move_to_end(key)
+                return value
+
+        self.__evicted([key])
+        raise KeyError(key)
+
+    def __contains__(self, key: KeyT) -> bool:
+        if self.ttl is None:
+            return key in self.__data
+
+        expires_at = self.__expires_at.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def pop(self, key: KeyT, default: Optional[ValueT] = None) -> Optional[ValueT]:
+        with self.__lock:
+            self.__expires_at.pop(key, None)
+            return self.__data.pop(key, default)
+
+    def values(self) -> List[ValueT]:
+        with self.__lock:
+            if self.ttl is None:
+                return list(self.__data.values())
+
+            now = time.monotonic()
+            return [value for key, value in self.__data.items() if self.__expires_at[key] > now]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__data.clear()
+            self.__expires_at.clear()
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self.__hits,
+            self.__misses,
+            self.__evictions,
+            len(self.__data),
+            self.maxsize,
+            self.__expirations,
+        )
+
+    def __evicted(self, keys: List[KeyT]) -> None:
+        # called without the lock, so the callback may use the cache
+        if self.__on_evict is not None:
+            for key in keys:
+                self.__on_evict(key)
+
+    def __expire(self, key: KeyT) -> bool:
+        # callers hold the lock
+        if self.ttl is None or self.__expires_at[key] > time.monotonic():
+            return False
+
+        del self.__data[key]
+        del self.__expires_at[key]
+        self.__expirations += 1
+        return True
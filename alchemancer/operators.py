@@ -0,0 +1,103 @@
+import operator
+from enum import Enum
+from typing import Any, Callable, Dict
+
+from sqlalchemy.sql.operators import (
+    custom_op,
+    is_,
+    is_not,
+    like_op,
+    not_ilike_op,
+    not_like_op,
+    not_regexp_match_op,
+    regexp_match_op,
+)
+
+# Builds the clause for a where / having key from its column (or whole subquery) and value
+OperationT = Callable[[Any, Any], Any]
+
+
+class Operator(str, Enum):
+    """Built-in operators of where / having keys, the part after the "__" in "User.id__EQ" """
+
+    EQ = "eq"
+    NE = "ne"
+    LIKE = "like"
+    NOT_LIKE = "not_like"
+    NOT_ILIKE = "not_ilike"
+    EXISTS = "exists"
+    NOT_EXISTS = "not_exists"
+    LT = "lt"
+    LTE = "lte"
+    GT = "gt"
+    GTE = "gte"
+    RE = "re"
+    NOT_RE = "not_re"
+
+
+def _eq(column: Any, value: Any) -> Any:
+    return is_(column, value) if isinstance(value, bool) else column == value
+
+
+def _ne(column: Any, value: Any) -> Any:
+    return is_not(column, value) if isinstance(value, bool) else column != value
+
+
+def _exists(scalar_query: Any, _value: Any) -> Any:
+    return scalar_query.exists()
+
+
+def _not_exists(scalar_query: Any, _value: Any) -> Any:
+    return ~scalar_query.exists()
+
+
+# Operations by lower cased operator name. Extend it with register_operator, the query parser
+# rejects keys using any other operator.
+OPERATORS: Dict[str, OperationT] = {
+    Operator.EQ.value: _eq,
+    Operator.NE.value: _ne,
+    Operator.LIKE.value: like_op,
+    Operator.NOT_LIKE.value: not_like_op,
+    Operator.NOT_ILIKE.value: not_ilike_op,
+    Operator.EXISTS.value: _exists,
+    Operator.NOT_EXISTS.value: _not_exists,
+    Operator.LT.value: operator.lt,
+    Operator.LTE.value: operator.le,
+    Operator.GT.value: operator.gt,
+    Operator.GTE.value: operator.ge,
+    Operator.RE.value: regexp_match_op,
+    Operator.NOT_RE.value: not_regexp_match_op,
+}
+
+
+def register_operator(name: str, operation: OperationT, replace: bool = False) -> None:
+    """
+    Makes ``operation`` usable in where / having keys as ``"Model.field__<name>"``, names are
+    case insensitive. Register dialect specific operators before queries using them are parsed,
+    e.g. postgres' network containment with ``register_operator("<<=", sql_operator("<<="))``.
+
+    :param operation: called with the column (or subquery) and the value, returns the clause.
+    With QueryGenerator's template cache (on by default) the value is an untyped
+    BindParameter taking the column's type, so the clause has to be built from SQL
+    expressions instead of inspecting the value (``func.lower(value)``, not
+    ``value.lower()``).
+    :param replace: replace an operator registered under the same name instead of raising a
+    ValueError.
+    """
+    name = name.lower()
+    if not name or "." in name or "__" in name:
+        raise ValueError(f"{name!r} can't be used as an operator name")
+    if name in OPERATORS and not replace:
+        raise ValueError(f"Operator {name} is already registered")
+
+    OPERATORS[name] = operation
+
+
+def sql_operator(opstring: str) -> OperationT:
+    """An operation comparing the column and the value with the SQL operator ``opstring``"""
+    sql_op = custom_op(opstring, is_comparison=True)
+
+    def operation(column: Any, value: Any) -> Any:
+        return column.operate(sql_op, value)
+
+    return operation
@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional
+
+from alchemancer.types.exceptions import QueryComplexityError
+from alchemancer.types.query import HqlQuery
+
+# Score added for every occurrence of a query feature
+DEFAULT_COMPLEXITY_WEIGHTS: Dict[str, int] = {
+    # selected columns, including join and json columns
+    "columns": 1,
+    "joins": 5,
+    "subqueries": 10,
+    # levels of nested queries below the top level one (subqueries and union branches)
+    "nesting_depth": 10,
+    "union_branches": 10,
+    "recursive_ctes": 50,
+    # functional column calls, "coalesce(sum(User.id), 0)" counts twice
+    "function_calls": 2,
+    # branches of the or lists in where / having clauses, join conditions and when-thens
+    "or_branches": 2,
+}
+
+
+class QueryComplexity:
+    score: int
+    counts: Dict[str, int]
+
+    def __init__(self, score: int, counts: Dict[str, int]):
+        self.score = score
+        self.counts = counts
+
+    def __repr__(self) -> str:
+        return f"QueryComplexity(score={self.score}, counts={self.counts})"
+
+
+def _function_calls(value: Any) -> int:
+    # same rule as the generator uses to tell functional columns from literals
+    if type(value) is str and "(" in value and ")" in value:
+        return value.count("(")
+    return 0
+
+
+class QueryComplexityScorer:
+    """
+    Scores the shape of a (canonical) HqlQuery before any SQL is built for it, the score is the
+    weighted sum of how often each feature in ``weights`` appears in the query.
+
+    The query is walked with explicit stacks instead of recursion, so deeply nested input can't
+    exhaust the interpreter's stack while being scored.
+    """
+
+    weights: Dict[str, int]
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None) -> None:
+        """
+        :param weights: overrides for DEFAULT_COMPLEXITY_WEIGHTS.
+        """
+        unknown_weights = set(weights or {}) - set(DEFAULT_COMPLEXITY_WEIGHTS)
+        if unknown_weights:
+            raise ValueError(f"Unknown complexity weights: {sorted(unknown_weights)}")
+
+        self.weights = {**DEFAULT_COMPLEXITY_WEIGHTS, **(weights or {})}
+
+    def score(self, query: HqlQuery) -> QueryComplexity:
+        counts = dict.fromkeys(self.weights, 0)
+        queries: List[Any] = [(query, 0)]
+        column_sets: List[Any] = []
+        filters: List[Any] = []
+
+        while queries:
+            hql_query, depth = queries.pop()
+            counts["nesting_depth"] = max(counts["nesting_depth"], depth)
+            column_sets.extend((hql_query.get("select") or {}).values())
+            filters.append(hql_query.get("where"))
+            filters.append(hql_query.get("having"))
+
+            for join in (hql_query.get("joins") or {}).values():
+                counts["joins"] += 1
+                column_sets.append(join.get("select"))
+                filters.append(join.get("where"))
+
+            for subquery in (hql_query.get("subqueries") or {}).values():
+                counts["subqueries"] += 1
+                queries.append((subquery, depth + 1))
+
+            if (hql_query.get("cte") or {}).get("recursive"):
+                counts["recursive_ctes"] += 1
+
+            for union_key in ("union", "union_all"):
+                if union := hql_query.get(union_key):
+                    counts["union_branches"] += 2
+                    queries.append((union["left"], depth + 1))
+                    queries.append((union["right"], depth + 1))
+                    if (union.get("cte") or {}).get("recursive"):
+                        counts["recursive_ctes"] += 1
+
+        while column_sets:
+            columns = column_sets.pop()
+            if not isinstance(columns, dict):
+                continue
+
+            for column_name, column_info in columns.items():
+                counts["columns"] += 1
+                counts["function_calls"] += _function_calls(column_name)
+                if not isinstance(column_info, dict):
+                    counts["function_calls"] += _function_calls(column_info)
+                    continue
+
+                counts["function_calls"] += _function_calls(column_info.get("value"))
+                counts["function_calls"] += _function_calls(column_info.get("else_"))
+                column_sets.append(column_info.get("select"))
+                filters.append(column_info.get("where"))
+                for when_item in column_info.get("whens") or ():
+                    counts["function_calls"] += _function_calls(when_item.get("then"))
+                    filters.append(when_item.get("when"))
+
+        while filters:
+            where = filters.pop()
+            if not isinstance(where, dict):
+                continue
+
+            for key, value in where.items():
+                lower_cased_key = key.lower()
+                if lower_cased_key == "and":
+                    filters.append(value)
+                elif lower_cased_key == "or":
+                    counts["or_branches"] += len(value)
+                    filters.extend(value)
+                else:
+                    counts["function_calls"] += _function_calls(value)
+
+        score = sum(self.weights[feature] * count for feature, count in counts.items())
+        return QueryComplexity(score, counts)
+
+    def check(self, query: HqlQuery, budget: int) -> QueryComplexity:
+        """Returns the query's complexity, raises QueryComplexityError when it is over budget"""
+        complexity = self.score(query)
+        if complexity.score > budget:
+            raise QueryComplexityError(complexity.score, budget, complexity.counts)
+
+        return complexity
@@ -1,9 +1,20 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
 from typing import (
     Any,
     Callable,
     Dict,
+    FrozenSet,
+    Hashable,
+    Iterator,
     List,
+    Literal,
     Optional,
+    Sequence,
+    Set,
     Tuple,
     Type,
     Union,
@@ -11,52 +22,180 @@ from typing import (
 )
 
 import marshmallow
-from sqlalchemy import Connection, Engine, Select, case
+from sqlalchemy import (
+    BindParameter,
+    Connection,
+    CursorResult,
+    Engine,
+    Row,
+    Select,
+    Table,
+    bindparam,
+    case,
+    func,
+    select,
+)
+from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.sql import visitors
 from sqlalchemy.sql._typing import _ColumnExpressionArgument
+from sqlalchemy.sql.compiler import Compiled
 from sqlalchemy.sql.functions import array_agg, coalesce
-from sqlalchemy.sql.operators import (
-    and_,
-    is_,
-    is_not,
-    like_op,
-    not_ilike_op,
-    not_like_op,
-    or_,
-    regexp_match_op,
-)
+from sqlalchemy.sql.operators import and_, or_
+from sqlalchemy.types import NullType
 
 from alchemancer.ast_handler import AstHandler
+from alchemancer.cost_guard import CostGuard
+from alchemancer.keyset_pagination import decode_cursor, encode_cursor, keyset_clause
+from alchemancer.lru_cache import CacheStats, LruCache
+from alchemancer.operators import OPERATORS
+from alchemancer.query_complexity import QueryComplexityScorer
+from alchemancer.query_hasher import QueryHasher
+from alchemancer.query_ir import (
+    BooleanClause,
+    CaseColumn,
+    ColumnRef,
+    FunctionExpr,
+    Join,
+    LabeledValue,
+    QueryIR,
+    QueryParser,
+    SelectSource,
+    Sort,
+    Subquery,
+    SubqueryColumn,
+)
+from alchemancer.query_ir import Union as UnionIR
+from alchemancer.query_ir import WhereNodeT
 from alchemancer.query_transformation_handler import QueryTransformationHandler
 from alchemancer.reflection_handler import (
     ReflectionHandler,
 )
+from alchemancer.result_cache import ResultCacheBackend
+from alchemancer.row_estimator import RowEstimator
+from alchemancer.row_serializer import RowSerializer
+from alchemancer.single_flight import SingleFlight
+from alchemancer.statement_timeout import StatementTimeout
 from alchemancer.types.query import (
     ColumnListT,
+    ColumnTypesT,
     GeneratedQuery,
-    HqlJoin,
     HqlQuery,
-    HqlSelect,
-    HqlUnion,
+    HqlResponse,
     NoOpConnection,
     PrimitiveT,
-    WhereClausT,
+    QueryTemplate,
 )
 
+logger = logging.getLogger(__name__)
+
+# Execution options giving a batch of queries a read only transaction with a consistent
+# snapshot, per dialect name. Dialects without an entry run the batch in a regular transaction.
+READ_ONLY_EXECUTION_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "postgresql": {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True},
+}
+
+# Keys dropped from a query to build its companion count query
+_COUNT_QUERY_IGNORED_KEYS = frozenset(("limit", "offset", "order_by", "cursor", "total_count"))
+# Queries with no keys but these, selecting plain columns of a single model, count a whole table
+_TABLE_COUNT_QUERY_KEYS = _COUNT_QUERY_IGNORED_KEYS | {"select", "debug"}
+# How many query shapes to remember the tables read by for the result cache
+_RESULT_TABLES_CACHE_SIZE = 256
+
 
 class QueryGenerator:
     __engine: Engine
     __query_transformer: QueryTransformationHandler = None
+    __canonical_queries: bool
     __reflection_handler: ReflectionHandler = ReflectionHandler
     __base_context_dict: Dict[str, Any]
     __ast_handler: AstHandler
+    __query_hasher: QueryHasher
+    __query_parser: QueryParser
+    __template_cache: Optional[LruCache[Tuple[Any, ...], QueryTemplate]]
+    __cache_compiled_sql: bool
+    __schema_cache: Optional[
+        LruCache[Tuple[Any, ...], Union[marshmallow.Schema, RowSerializer]]
+    ]
+    __fast_serialization: bool
+    __row_estimator: RowEstimator
+    __complexity_scorer: QueryComplexityScorer
+    __complexity_budget: Optional[int]
+    __cost_guard: Optional[CostGuard]
+    __statement_timeout: Optional[float]
+    __result_cache: Optional[ResultCacheBackend]
+    __result_tables_cache: LruCache[Tuple[Any, ...], FrozenSet[str]]
+    __single_flight: Optional[SingleFlight]
+    __refresh_workers: int
+    __refresh_executor: Optional[ThreadPoolExecutor]
+    __refreshing: Set[str]
+    __refresh_lock: threading.Lock
+    """
+    Cumulative count of the marshmallow schema classes generated for query results, including
+    those since evicted from the schema cache. schema_cache_stats.size is how many are cached.
+    """
+    schema_classes_created_total: int
 
     def __init__(
         self,
         engine,
         base_context_dict: Optional[Dict[str, Any]] = None,
         query_transformer: QueryTransformationHandler = None,
+        template_cache_size: int = 256,
+        cache_compiled_sql: bool = False,
+        schema_cache_size: int = 256,
+        fast_serialization: bool = False,
+        statistics_ttl: float = 300,
+        complexity_budget: Optional[int] = None,
+        complexity_weights: Optional[Dict[str, int]] = None,
+        cost_guard: Optional[CostGuard] = None,
+        statement_timeout: Optional[float] = None,
+        result_cache: Optional[ResultCacheBackend] = None,
+        coalesce_queries: bool = False,
+        refresh_workers: int = 2,
+        canonical_queries: bool = False,
     ):
+        """
+        :param template_cache_size: how many query shapes to keep built Select templates for, 0
+        disables the template cache.
+        :param cache_compiled_sql: keep the compiled SQL per dialect on each template and
+        execute that directly, skipping SQLAlchemy's cache key generation and compiled cache
+        lookup. Off by default, compiled SQL is executed through
+        Connection._execute_compiled, which SQLAlchemy may deprecate and which skips per
+        execution compile options and schema translation. Templates reuse their Select, so the
+        engine's compiled_cache already reuses its compiled SQL.
+        :param schema_cache_size: how many result schemas to keep, keyed by the names and types
+        of the selected columns, 0 disables the schema cache.
+        :param fast_serialization: serialize result rows with per column converters instead of a
+        marshmallow schema, the output is the same for the built-in field types.
+        :param statistics_ttl: seconds the planner statistics used for estimated total counts
+        are cached for.
+        :param complexity_budget: reject queries scoring above this with a QueryComplexityError
+        before any SQL is built for them, None disables the check. Can be overridden per call.
+        :param complexity_weights: overrides for the weights queries are scored with, see
+        QueryComplexityScorer.
+        :param cost_guard: checks the plan of every query shape before it is first executed,
+        rejecting or throttling expensive queries. Only used on dialects it supports.
+        :param statement_timeout: seconds queries may run before they are cancelled with a
+        QueryTimeoutError, see StatementTimeout. Can be overridden per call and is capped by
+        model timeouts (ReflectionHandler.set_model_timeout).
+        :param result_cache: serve responses of return_from_hql_query and
+        return_response_from_hql_query from this cache, see InMemoryResultCache. Entries are
+        keyed by the query's shape and parameters and invalidated per table, see
+        ResultCacheBackend.invalidate_tables and invalidate_on_commit.
+        :param coalesce_queries: run identical queries (same shape, parameters and statement
+        timeout) requested while one of them is in flight only once and hand every caller the
+        same response, see SingleFlight. Works with and without a result cache.
+        :param refresh_workers: how many stale result cache entries are refreshed at a time,
+        see InMemoryResultCache's soft_ttl. Further refreshes wait for a free worker and every
+        entry is only refreshed once at a time.
+        :param canonical_queries: every query is already canonical HQL, queries are never handed
+        to the query transformer. See QueryTransformationHandler.is_canonical to pass only some
+        queries through.
+        """
+        if refresh_workers < 1:
+            raise ValueError("refresh_workers needs to be at least 1")
+
         self.__base_context_dict = {
             "array_agg": array_agg,
             "coalesce": coalesce,
@@ -64,114 +203,973 @@ class QueryGenerator:
         }
         self.__engine = engine
         self.__ast_handler = AstHandler(self.__reflection_handler)
+        self.__query_hasher = QueryHasher(self.__reflection_handler)
+        self.__query_parser = QueryParser(self.__reflection_handler)
+        self.__template_cache = (
+            LruCache(template_cache_size) if template_cache_size > 0 else None
+        )
+        self.__cache_compiled_sql = cache_compiled_sql
+        self.__schema_cache = LruCache(schema_cache_size) if schema_cache_size > 0 else None
+        self.schema_classes_created_total = 0
+        self.__fast_serialization = fast_serialization
+        self.__row_estimator = RowEstimator(statistics_ttl)
+        self.__complexity_scorer = QueryComplexityScorer(complexity_weights)
+        self.__complexity_budget = complexity_budget
+        self.__cost_guard = cost_guard
+        self.__statement_timeout = statement_timeout
+        self.__result_cache = result_cache
+        self.__result_tables_cache = LruCache(_RESULT_TABLES_CACHE_SIZE)
+        self.__single_flight = SingleFlight() if coalesce_queries else None
+        self.__refresh_workers = refresh_workers
+        self.__refresh_executor = None
+        self.__refreshing = set()
+        self.__refresh_lock = threading.Lock()
         self.__query_transformer = query_transformer or QueryTransformationHandler({})
+        self.__canonical_queries = canonical_queries
+
+    @property
+    def template_cache_stats(self) -> Optional[CacheStats]:
+        return self.__template_cache.stats if self.__template_cache is not None else None
+
+    def compile_cache_report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Reports, per cached query shape hash, whether its statement is cacheable by SQLAlchemy
+        and how often compiling it was served from a cache.
+        """
+        if self.__template_cache is None:
+            return {}
+
+        return {
+            template.shape_hash: {
+                "cacheable": template.cacheable,
+                "compiled_cache_hits": template.compiled_cache_hits,
+                "compiled_cache_misses": template.compiled_cache_misses,
+            }
+            for template in self.__template_cache.values()
+        }
+
+    @property
+    def schema_cache_stats(self) -> Optional[CacheStats]:
+        return self.__schema_cache.stats if self.__schema_cache is not None else None
+
+    @property
+    def statistics_cache_stats(self) -> CacheStats:
+        return self.__row_estimator.statistics_cache_stats
+
+    def close(self) -> None:
+        """
+        Shuts down the worker threads refreshing stale result cache entries, running refreshes
+        are finished in the background. A generator used after being closed starts new workers
+        when it needs them.
+        """
+        with self.__refresh_lock:
+            refresh_executor, self.__refresh_executor = self.__refresh_executor, None
+        if refresh_executor is not None:
+            refresh_executor.shutdown(wait=False)
+
+    def __enter__(self) -> "QueryGenerator":
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        self.close()
+
+    def clear_template_cache(self) -> None:
+        """Needs to be called if models are reloaded after templates have been cached."""
+        if self.__template_cache is not None:
+            self.__template_cache.clear()
+
+    @property
+    def complexity_scorer(self) -> QueryComplexityScorer:
+        return self.__complexity_scorer
+
+    @property
+    def cost_guard(self) -> Optional[CostGuard]:
+        return self.__cost_guard
+
+    @property
+    def result_cache(self) -> Optional[ResultCacheBackend]:
+        return self.__result_cache
+
+    @property
+    def result_cache_stats(self) -> Optional[CacheStats]:
+        return self.__result_cache.stats if self.__result_cache is not None else None
+
+    @property
+    def single_flight(self) -> Optional[SingleFlight]:
+        return self.__single_flight
+
+    @property
+    def refresh_workers(self) -> int:
+        return self.__refresh_workers
+
+    @property
+    def coalesced_executions(self) -> Optional[int]:
+        """How many query executions were saved by coalescing identical queries"""
+        if self.__single_flight is None:
+            return None
+        return self.__single_flight.saved_executions
+
+    def return_from_hql_query(
+        self,
+        query: HqlQuery,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ):
+        return self.return_response_from_hql_query(query, complexity_budget, statement_timeout)[
+            "data"
+        ]
+
+    def return_response_from_hql_query(
+        self,
+        query: HqlQuery,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> HqlResponse:
+        """
+        Returns the query's results along with its pagination info, the next page's cursor for
+        keyset paginated queries and the total row count for queries with a total_count.
+        Responses served from the result cache or shared by coalesced queries are copied, they
+        can be modified without affecting other callers.
+
+        :param complexity_budget: overrides the generator's complexity budget for this call.
+        :param statement_timeout: overrides the generator's statement timeout for this call.
+        """
+        query, context_dict = self._prepare_query(query, complexity_budget=complexity_budget)
+        result_key = self._get_result_key(query)
+
+        def execute_query() -> HqlResponse:
+            generations = self._get_table_generations(result_key)
+            with self.__engine.connect() as connection:
+                generated_query, rows, total_info = self._fetch_generated_query(
+                    connection, query, context_dict, statement_timeout
+                )
+
+            return self._cache_response(
+                result_key,
+                self._build_response(query, generated_query, rows, total_info),
+                generations,
+            )
+
+        def fetch_response() -> HqlResponse:
+            if self.__single_flight is not None:
+                return self.__single_flight.do(
+                    (result_key[0], statement_timeout), execute_query
+                )
+            return execute_query()
+
+        if result_key is None:
+            return execute_query()
 
-    def return_from_hql_query(self, query: HqlQuery):
-        query = cast(HqlQuery, self.__query_transformer.transform_query(query))
-        context_dict = {**self.__base_context_dict}
+        if self.__result_cache is not None:
+            cached_response, is_stale = self.__result_cache.lookup(result_key[0])
+            if cached_response is not None:
+                if is_stale:
+                    self._refresh_in_background(result_key[0], fetch_response)
+                return self._copy_response(cached_response)
+
+        return self._copy_response(fetch_response())
+
+    def return_from_hql_queries(
+        self,
+        queries: Dict[Hashable, HqlQuery],
+        return_errors: bool = False,
+        read_only: bool = True,
+        concurrency: int = 1,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """See return_responses_from_hql_queries, returns the data of every response"""
+        responses = self.return_responses_from_hql_queries(
+            queries, return_errors, read_only, concurrency, complexity_budget, statement_timeout
+        )
+        return self._get_batch_data(responses)
+
+    def return_responses_from_hql_queries(
+        self,
+        queries: Dict[Hashable, HqlQuery],
+        return_errors: bool = False,
+        read_only: bool = True,
+        concurrency: int = 1,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        """
+        Runs a batch of queries on a single connection inside one transaction and returns their
+        responses keyed by the ids they were passed in with, in the order they were passed in.
+        Like return_response_from_hql_query's they hold the pagination info and total counts.
+
+        :param queries: queries keyed by caller chosen ids.
+        :param return_errors: run every query in its own savepoint and return the exception
+        raised by a failing query as its result instead of aborting the batch.
+        :param read_only: run the batch in a read only transaction with a consistent snapshot
+        where the dialect supports it (see READ_ONLY_EXECUTION_OPTIONS). Resolvers create temp
+        tables, batches using them need to pass False.
+        :param concurrency: when above 1 the queries run concurrently from a thread pool of that
+        size instead, each on its own pooled connection and transaction, so they no longer share
+        a snapshot. Keep it within the engine's pool size.
+        :param complexity_budget: overrides the generator's complexity budget for this call,
+        with return_errors queries over budget get their QueryComplexityError as their result.
+        :param statement_timeout: overrides the generator's statement timeout for every query in
+        this call.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency needs to be at least 1")
+
+        if concurrency == 1 or len(queries) < 2:
+            with self.__engine.connect() as connection:
+                return self._fetch_hql_queries(
+                    connection,
+                    queries,
+                    return_errors,
+                    read_only,
+                    complexity_budget,
+                    statement_timeout,
+                )
+
+        def fetch_hql_query(query_id: Hashable, query: HqlQuery) -> Any:
+            with self.__engine.connect() as connection:
+                return self._fetch_hql_queries(
+                    connection,
+                    {query_id: query},
+                    return_errors,
+                    read_only,
+                    complexity_budget,
+                    statement_timeout,
+                )[query_id]
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(queries))) as executor:
+            results = executor.map(fetch_hql_query, queries.keys(), queries.values())
+            return dict(zip(queries.keys(), results))
+
+    def stream_from_hql_query(
+        self,
+        query: HqlQuery,
+        chunk_size: int = 1000,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Returns a generator yielding the serialized results of the query in lists of at most
+        ``chunk_size`` rows. The query is validated when this is called, it is executed once the
+        generator is first consumed.
+
+        Rows are fetched with a server side cursor where the dialect supports one, so memory use
+        is bounded by the chunk size instead of the result size. The connection is only held
+        while the generator is being consumed, it is released once the generator is exhausted,
+        closed or garbage collected. On SQLite the statement timeout covers consuming the whole
+        stream.
+        """
+        query, context_dict = self._prepare_stream_query(query, chunk_size, complexity_budget)
+        return self._stream_prepared_query(query, context_dict, chunk_size, statement_timeout)
+
+    def _prepare_stream_query(
+        self, query: HqlQuery, chunk_size: int, complexity_budget: Optional[int]
+    ) -> Tuple[HqlQuery, Dict[str, Any]]:
+        if chunk_size < 1:
+            raise ValueError("chunk_size needs to be at least 1")
+        if "cursor" in query:
+            raise ValueError("keyset pagination is not supported when streaming results")
+        if query.get("total_count"):
+            raise ValueError("total counts are not supported when streaming results")
+
+        return self._prepare_query(
+            query, report_truncation=False, complexity_budget=complexity_budget
+        )
+
+    def _stream_prepared_query(
+        self,
+        query: HqlQuery,
+        context_dict: Dict[str, Any],
+        chunk_size: int,
+        statement_timeout: Optional[float],
+    ) -> Iterator[List[Dict[str, Any]]]:
         with self.__engine.connect() as connection:
-            with Session(bind=connection) as _:
-                generated_query = self._process_query(query, context_dict, connection)
-                response = connection.execute(generated_query.query).fetchall()
+            with (
+                Session(bind=connection) as _,
+                self._statement_timeout(connection, query, statement_timeout),
+            ):
+                generated_query = self._generate_query(query, context_dict, connection)
+                result = self._execute_generated_query(
+                    connection,
+                    generated_query,
+                    {"stream_results": True, "yield_per": chunk_size},
+                )
+                serializer = self._get_result_serializer(generated_query.query.selected_columns)
+                for partition in result.partitions():
+                    yield serializer.dump(partition)
+
+    def _prepare_query(
+        self,
+        query: HqlQuery,
+        report_truncation: bool = True,
+        complexity_budget: Optional[int] = None,
+    ) -> Tuple[HqlQuery, Dict[str, Any]]:
+        """
+        Returns the transformed query with its model limits applied and a fresh context dict to
+        build it with. With ``report_truncation`` queries on models with limits fetch one row
+        more than their limit so _build_response can tell whether rows were cut off.
+
+        Queries over the complexity budget (the generator's unless one is passed) are rejected
+        right after being transformed.
+        """
+        if not self.__canonical_queries:
+            query = cast(HqlQuery, self.__query_transformer.transform_query(query))
+        if complexity_budget is None:
+            complexity_budget = self.__complexity_budget
+        if complexity_budget is not None:
+            self.__complexity_scorer.check(query, complexity_budget)
+
+        # without any model limits there is nothing to apply, the query isn't copied
+        if self.__reflection_handler.model_limit_cache:
+            query = self._apply_model_limits(query)
+        if "cursor" in query:
+            query = self._prepare_keyset_query(query)
+        elif report_truncation and self._has_model_limits(query):
+            query = cast(HqlQuery, {**query, "limit": query["limit"] + 1})
+
+        return query, {**self.__base_context_dict}
+
+    def _apply_model_limits(self, query: HqlQuery) -> HqlQuery:
+        """
+        Returns a copy of the query with the default / max limits of the models it selects from
+        or joins to applied to it, its subqueries and its union branches. The recursive branch
+        of a recursive cte is left alone, it can't be limited.
+        """
+        limited_query = {**query}
+        if subqueries := query.get("subqueries"):
+            limited_query["subqueries"] = {
+                name: self._apply_model_limits(subquery)
+                for name, subquery in subqueries.items()
+            }
+
+        for union_key in ("union", "union_all"):
+            if union := query.get(union_key):
+                is_recursive = (union.get("cte") or {}).get("recursive", False)
+                limited_query[union_key] = {
+                    **union,
+                    "left": self._apply_model_limits(union["left"]),
+                    "right": (
+                        union["right"]
+                        if is_recursive
+                        else self._apply_model_limits(union["right"])
+                    ),
+                }
+
+        default_limits, max_limits = [], []
+        for model_name in [*query["select"], *query.get("joins", ())]:
+            model_limits = self.__reflection_handler.model_limit_cache.get(model_name)
+            if model_limits is None:
+                continue
+            if model_limits.default_limit is not None:
+                default_limits.append(model_limits.default_limit)
+            if model_limits.max_limit is not None:
+                max_limits.append(model_limits.max_limit)
+
+        limit = query.get("limit") or min(default_limits, default=None)
+        max_limit = min(max_limits, default=None)
+        if max_limit is not None and (not limit or limit > max_limit):
+            limit = max_limit
+        if limit:
+            limited_query["limit"] = limit
+
+        return cast(HqlQuery, limited_query)
+
+    def _has_model_limits(self, query: HqlQuery) -> bool:
+        model_limit_cache = self.__reflection_handler.model_limit_cache
+        return any(
+            model_name in model_limit_cache
+            for model_name in [*query["select"], *query.get("joins", ())]
+        )
+
+    @staticmethod
+    def _prepare_keyset_query(query: HqlQuery) -> HqlQuery:
+        # The cursor is decoded before the query is hashed so its values become template
+        # parameters. One row more than the limit is fetched to tell whether there is a next
+        # page.
+        if not query.get("order_by") or not query.get("limit"):
+            raise ValueError("keyset pagination needs an order_by and a limit")
+
+        cursor = query["cursor"]
+        return cast(
+            HqlQuery,
+            {
+                **query,
+                "cursor": decode_cursor(cursor) if cursor else None,
+                "limit": query["limit"] + 1,
+            },
+        )
+
+    def _get_result_key(self, query: HqlQuery) -> Optional[Tuple[str, FrozenSet[str]]]:
+        """
+        Returns the key identifying a prepared query's results, used by the result cache and to
+        coalesce queries, and the names of the tables it reads. None when neither is enabled or
+        the query uses a resolver, whose results depend on data only known while the query is
+        being built.
+        """
+        if self.__result_cache is None and self.__single_flight is None:
+            return None
+
+        fingerprint = self.__query_hasher.fingerprint(query)
+        if fingerprint.uses_resolver:
+            return None
+
+        key = hashlib.blake2b(
+            repr((fingerprint.key, fingerprint.parameters)).encode(), digest_size=16
+        ).hexdigest()
+        # Models can be read by functional columns, where clause subqueries and ctes as well,
+        # so the tables are collected from the built statement. They only depend on the shape.
+        tables = self.__result_tables_cache.get(fingerprint.key)
+        if tables is None:
+            statement = self._generate_query(query, {**self.__base_context_dict}).query
+            tables = self.__result_tables_cache[fingerprint.key] = self._get_statement_tables(
+                statement
+            )
+        return key, tables
 
-        schema_dict = {}
-        for x in generated_query.query.columns:
+    @staticmethod
+    def _get_statement_tables(statement: Select) -> FrozenSet[str]:
+        """Names of the tables read by a statement, its subqueries and its ctes"""
+        return frozenset(
+            element.name
+            for element in visitors.iterate(statement)
+            if isinstance(element, Table)
+        )
+
+    def _refresh_in_background(self, key: str, refresh: Callable[[], Any]) -> None:
+        """
+        Runs ``refresh`` on the refresh worker pool unless the entry is already being refreshed.
+        A failing refresh is logged and leaves the stale entry in place, the next stale hit
+        retries it.
+        """
+
+        def run_refresh() -> None:
+            try:
+                refresh()
+            except Exception:
+                logger.exception("Refreshing the stale result cache entry %s failed", key)
+            finally:
+                with self.__refresh_lock:
+                    self.__refreshing.discard(key)
+
+        with self.__refresh_lock:
+            if key in self.__refreshing:
+                return
+            self.__refreshing.add(key)
+            if self.__refresh_executor is None:
+                self.__refresh_executor = ThreadPoolExecutor(
+                    self.__refresh_workers, thread_name_prefix="alchemancer-refresh"
+                )
+            # submitted under the lock so close can't shut the executor down in between
+            self.__refresh_executor.submit(run_refresh)
+
+    def _get_table_generations(
+        self, result_key: Optional[Tuple[str, FrozenSet[str]]]
+    ) -> Optional[Hashable]:
+        """Read before a query is executed, see ResultCacheBackend.table_generations"""
+        if result_key is None or self.__result_cache is None:
+            return None
+        return self.__result_cache.table_generations(result_key[1])
+
+    def _cache_response(
+        self,
+        result_key: Optional[Tuple[str, FrozenSet[str]]],
+        response: HqlResponse,
+        generations: Optional[Hashable] = None,
+    ) -> HqlResponse:
+        if result_key is not None and self.__result_cache is not None:
+            key, tables = result_key
+            self.__result_cache.set(key, response, tables, generations)
+        return response
+
+    @staticmethod
+    def _copy_response(response: HqlResponse) -> HqlResponse:
+        """
+        Cached and coalesced responses are shared, callers get their own copy of the response,
+        its data and its rows. Values nested in the rows are still shared.
+        """
+        return cast(HqlResponse, {**response, "data": [{**row} for row in response["data"]]})
+
+    def _build_response(
+        self,
+        query: HqlQuery,
+        generated_query: GeneratedQuery,
+        rows: Sequence[Row],
+        total_info: Optional[Dict[str, Any]] = None,
+    ) -> HqlResponse:
+        columns = list(generated_query.query.selected_columns)
+        # the sort values selected for the cursor and the window count are the last columns, see
+        # _process_query
+        keyset_size = len(query["order_by"]) if "cursor" in query else 0
+        hidden_columns = keyset_size + QueryParser.uses_window_count(query)
+        if hidden_columns:
+            columns = columns[:-hidden_columns]
+
+        response: HqlResponse = {"data": []}
+        if "cursor" in query:
+            cursor = None
+            limit = query["limit"] - 1
+            if len(rows) > limit:
+                rows = rows[:limit]
+                cursor = encode_cursor(rows[-1][-hidden_columns:][:keyset_size])
+            response["cursor"] = cursor
+            if self._has_model_limits(query):
+                response["truncated"] = cursor is not None
+        elif self._has_model_limits(query):
+            # see _prepare_query, one row more than the limit was fetched
+            limit = query["limit"] - 1
+            response["truncated"] = len(rows) > limit
+            rows = rows[:limit]
+
+        if total_info:
+            response.update(total_info)
+
+        response["data"] = self._get_result_serializer(columns).dump(rows)
+        return response
+
+    def _fetch_generated_query(
+        self,
+        connection: Connection,
+        query: HqlQuery,
+        context_dict: Dict[str, Any],
+        statement_timeout: Optional[float] = None,
+    ) -> Tuple[GeneratedQuery, Sequence[Row], Dict[str, Any]]:
+        with (
+            Session(bind=connection) as _,
+            self._statement_timeout(connection, query, statement_timeout),
+        ):
+            generated_query = self._generate_query(query, context_dict, connection)
+            response = self._execute_generated_query(connection, generated_query).fetchall()
+            total_info = self._fetch_total_count(connection, query, response)
+
+        return generated_query, response, total_info
+
+    def _fetch_total_count(
+        self, connection: Connection, query: HqlQuery, rows: Sequence[Row]
+    ) -> Dict[str, Any]:
+        """
+        Returns the total count fields of the query's response, empty without a total_count.
+
+        Exact totals are read from the window count of the first row where there is one,
+        otherwise they are fetched with a companion count query on the same connection. Capped
+        counts count up to one row more than the cap to tell whether it was reached. Estimated
+        counts come from planner statistics where the dialect has them and are exact otherwise.
+        """
+        total_count = query.get("total_count")
+        if not total_count:
+            return {}
+
+        if QueryParser.uses_window_count(query):
+            if rows:
+                return {"total": rows[0][-1], "total_is_estimate": False}
+            if not query.get("offset"):
+                return {"total": 0, "total_is_estimate": False}
+
+        count_query = {
+            key: value for key, value in query.items() if key not in _COUNT_QUERY_IGNORED_KEYS
+        }
+        is_capped = total_count is not True and isinstance(total_count, int)
+        if is_capped:
+            count_query["limit"] = total_count + 1
+
+        if total_count == "estimate" and self.__row_estimator.supports(connection.dialect):
+            total = None
+            table = self._get_counted_table(query)
+            if table is not None:
+                total = self.__row_estimator.table_rows(connection, table)
+
+            if total is None:
+                generated_query = self._generate_query(
+                    cast(HqlQuery, count_query), {**self.__base_context_dict}, connection
+                )
+                total = self.__row_estimator.statement_rows(
+                    connection, generated_query.query, generated_query.parameters
+                )
+
+            return {"total": total, "total_is_estimate": True}
+
+        generated_query = self._generate_query(
+            cast(HqlQuery, count_query), {**self.__base_context_dict}, connection
+        )
+        total = connection.execute(
+            select(func.count()).select_from(generated_query.query.subquery()),
+            generated_query.parameters,
+        ).scalar_one()
+        if is_capped:
+            return {
+                "total": min(total, total_count),
+                "total_is_estimate": False,
+                "total_capped": total > total_count,
+            }
+
+        return {"total": total, "total_is_estimate": False}
+
+    def _get_counted_table(self, query: HqlQuery) -> Optional[Table]:
+        """The table whose row count is the query's total, None for filtered queries"""
+        if query.keys() - _TABLE_COUNT_QUERY_KEYS or len(query["select"]) != 1:
+            return None
+
+        ((model_name, columns),) = query["select"].items()
+        model = self.__reflection_handler.model_class_cache.get(model_name)
+        if model is None or not isinstance(columns, dict):
+            return None
+
+        # functions, aggregates and column options can change the number of rows
+        if any(info or "(" in column for column, info in columns.items()):
+            return None
+
+        return model.__table__
+
+    def _fetch_hql_queries(
+        self,
+        connection: Connection,
+        queries: Dict[Hashable, HqlQuery],
+        return_errors: bool,
+        read_only: bool,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> Dict[Hashable, Any]:
+        if read_only:
+            connection.execution_options(
+                **READ_ONLY_EXECUTION_OPTIONS.get(connection.dialect.name, {})
+            )
+
+        results = {}
+        with connection.begin(), Session(bind=connection) as _:
+            for query_id, query in queries.items():
+                if not return_errors:
+                    results[query_id] = self._fetch_and_dump_hql_query(
+                        connection, query, complexity_budget, statement_timeout
+                    )
+                    continue
+
+                try:
+                    with connection.begin_nested():
+                        results[query_id] = self._fetch_and_dump_hql_query(
+                            connection, query, complexity_budget, statement_timeout
+                        )
+                except Exception as e:
+                    results[query_id] = e
+
+        return results
+
+    def _fetch_and_dump_hql_query(
+        self,
+        connection: Connection,
+        query: HqlQuery,
+        complexity_budget: Optional[int] = None,
+        statement_timeout: Optional[float] = None,
+    ) -> HqlResponse:
+        query, context_dict = self._prepare_query(query, complexity_budget=complexity_budget)
+        # the batch's transaction continues after this query, so its timeout is restored
+        with self._statement_timeout(connection, query, statement_timeout, restore=True):
+            generated_query = self._generate_query(query, context_dict, connection)
+            rows = self._execute_generated_query(connection, generated_query).fetchall()
+            total_info = self._fetch_total_count(connection, query, rows)
+        return self._build_response(query, generated_query, rows, total_info)
+
+    @staticmethod
+    def _get_batch_data(responses: Dict[Hashable, Any]) -> Dict[Hashable, Any]:
+        """The data of every response of a batch, errors returned in place of one are kept"""
+        return {
+            query_id: response if isinstance(response, Exception) else response["data"]
+            for query_id, response in responses.items()
+        }
+
+    def _get_result_serializer(self, columns) -> Union[marshmallow.Schema, RowSerializer]:
+        """
+        Returns the serializer for a result with the given columns, a (many=True) marshmallow
+        schema or a RowSerializer when fast serialization is enabled. Serializers are cached by
+        column name, SQL type, python type and whether the column is a list, so repeated result
+        shapes don't create new schema classes.
+        """
+        signature = []
+        for x in columns:
             python_type = x.type.python_type
             is_many = False
             if python_type is list:
                 is_many = True
                 python_type = x.type.item_type.python_type
 
-            marshmallow_field = (
-                self.__reflection_handler.python_primitive_types_to_marshmallow_fields[
-                    python_type
+            signature.append((x.name, type(x.type), python_type, is_many))
+
+        signature = tuple(signature)
+        if self.__schema_cache is not None:
+            serializer = self.__schema_cache.get(signature)
+            if serializer is not None:
+                return serializer
+
+        marshmallow_fields = (
+            self.__reflection_handler.python_primitive_types_to_marshmallow_fields
+        )
+        if self.__fast_serialization:
+            serializer = RowSerializer(
+                [
+                    (name, marshmallow_fields[python_type](), is_many)
+                    for name, _, python_type, is_many in signature
                 ]
             )
-            schema_dict[x.name] = (
-                marshmallow.fields.List(marshmallow_field()) if is_many else marshmallow_field()
+        else:
+            schema_dict = {}
+            for name, _, python_type, is_many in signature:
+                marshmallow_field = marshmallow_fields[python_type]
+                schema_dict[name] = (
+                    marshmallow.fields.List(marshmallow_field())
+                    if is_many
+                    else marshmallow_field()
+                )
+
+            serializer = marshmallow.Schema.from_dict(fields=schema_dict)(many=True)
+            self.schema_classes_created_total += 1
+
+        if self.__schema_cache is not None:
+            self.__schema_cache[signature] = serializer
+        return serializer
+
+    def _generate_query(
+        self,
+        query: HqlQuery,
+        context_dict: Optional[Dict] = None,
+        connection: Optional[Connection] = NoOpConnection,
+    ) -> GeneratedQuery:
+        """
+        Builds the query through the template cache. The first query of a given shape is built
+        with bind parameters in place of its literals, later queries of the same shape reuse
+        that Select and only hand in their own literal values as execution parameters.
+        Without the template cache the query is only fingerprinted for the cost guard, which
+        caches plans per shape.
+        """
+        if self.__template_cache is None and self.__cost_guard is None:
+            return self._process_query(query, context_dict, connection)
+
+        fingerprint = self.__query_hasher.fingerprint(query)
+        # resolvers insert their data while the query is being built, so they can't be cached
+        if fingerprint.uses_resolver:
+            return self._process_query(query, context_dict, connection)
+
+        if self.__template_cache is None:
+            generated_query = self._process_query(query, context_dict, connection)
+            generated_query.shape_key = fingerprint.key
+            return generated_query
+
+        template = self.__template_cache.get(fingerprint.key)
+        if template is None:
+            # Bind parameters aren't checked while parsing, so the literals are checked before
+            # they are swapped for them. Their types are part of the shape, later queries of
+            # the shape have literals of the same types.
+            self.__query_parser.parse(query)
+            parameterized_query = self.__query_hasher.parameterize(
+                query, self._template_parameter
+            )
+            template = QueryTemplate(
+                self._process_query(parameterized_query, context_dict, connection).query,
+                fingerprint.hash,
+            )
+            self.__template_cache[fingerprint.key] = template
+
+        return GeneratedQuery(
+            template.query,
+            query.get("limit"),
+            query.get("offset"),
+            {
+                f"hql_{index}": parameter
+                for index, parameter in enumerate(fingerprint.parameters)
+            },
+            template,
+            fingerprint.key,
+        )
+
+    def _execute_generated_query(
+        self,
+        connection: Connection,
+        generated_query: GeneratedQuery,
+        execution_options: Optional[Dict[str, Any]] = None,
+    ) -> CursorResult:
+        is_expensive = self._check_query_cost(connection, generated_query)
+        with self._throttle_expensive_query() if is_expensive else nullcontext():
+            result = connection.execute(
+                self._executable_for(connection.dialect, generated_query),
+                generated_query.parameters,
+                execution_options=execution_options,
             )
+        if generated_query.template is not None and not self.__cache_compiled_sql:
+            generated_query.template.record_execution(result)
+        return result
 
-        schema = marshmallow.Schema.from_dict(fields=schema_dict)(many=True)
-        return schema.dump(response)
+    def _statement_timeout(
+        self,
+        connection: Connection,
+        query: HqlQuery,
+        statement_timeout: Optional[float] = None,
+        restore: bool = False,
+    ) -> AbstractContextManager:
+        """
+        The StatementTimeout for the query, the caller's timeout or else the generator's capped
+        by the timeouts of the models the query touches. A no-op without any timeout.
+        """
+        if statement_timeout is None:
+            statement_timeout = self.__statement_timeout
+
+        timeouts = [] if statement_timeout is None else [statement_timeout]
+        model_timeout_cache = self.__reflection_handler.model_timeout_cache
+        if model_timeout_cache:
+            timeouts.extend(
+                model_timeout_cache[model_name]
+                for model_name in self._get_model_names(query)
+                if model_name in model_timeout_cache
+            )
+
+        if not timeouts or connection.dialect.name not in StatementTimeout.dialect_names:
+            return nullcontext()
+
+        return StatementTimeout(connection, min(timeouts), restore)
+
+    @staticmethod
+    def _get_model_names(query: HqlQuery) -> Set[str]:
+        """Names selected from or joined to by the query, its subqueries and union branches"""
+        model_names = set()
+        queries = [query]
+        while queries:
+            hql_query = queries.pop()
+            model_names.update(hql_query["select"])
+            model_names.update(hql_query.get("joins") or ())
+            queries.extend((hql_query.get("subqueries") or {}).values())
+            for union_key in ("union", "union_all"):
+                if union := hql_query.get(union_key):
+                    queries.extend((union["left"], union["right"]))
+
+        return model_names
+
+    def _check_query_cost(
+        self, connection: Connection, generated_query: GeneratedQuery
+    ) -> bool:
+        """Runs the cost guard, returns whether the query needs to be throttled"""
+        if self.__cost_guard is None or not self.__cost_guard.supports(connection.dialect):
+            return False
+
+        return self.__cost_guard.check(
+            connection,
+            generated_query.query,
+            generated_query.parameters,
+            generated_query.shape_key,
+        )
+
+    def _throttle_expensive_query(self) -> AbstractContextManager:
+        """Held while an expensive query the cost guard throttles is executed"""
+        return self.__cost_guard.throttle()
+
+    def _executable_for(
+        self, dialect: Dialect, generated_query: GeneratedQuery
+    ) -> Union[Select, Compiled]:
+        """The template's compiled SQL when compiled SQL is cached, the Select otherwise"""
+        if generated_query.template is not None and self.__cache_compiled_sql:
+            return generated_query.template.compiled_for(dialect)
+
+        return generated_query.query
+
+    @staticmethod
+    def _template_parameter(index: int, value: Any) -> BindParameter:
+        # untyped, so comparisons give it the column's type and its bind processing
+        # (TypeDecorators, Enums, ...) like they do for a plain literal
+        return bindparam(f"hql_{index}", value, type_=NullType())
+
+    @staticmethod
+    def _typed_parameter(value: Any) -> Any:
+        """
+        Selected template parameters aren't compared to anything, they take their type from
+        their value like a plain literal would. Other values are returned as they are.
+        """
+        if isinstance(value, BindParameter) and isinstance(value.type, NullType):
+            return bindparam(value.key, value.value)
+        return value
 
     def _process_query(
         self,
-        query: HqlQuery,
+        query: Union[HqlQuery, QueryIR],
         context_dict: Optional[Dict] = None,
         connection: Optional[Connection] = NoOpConnection,
     ) -> GeneratedQuery:
+        """
+        Builds the Select for a query, HqlQueries are parsed into a QueryIR first. Subqueries,
+        ctes and unions are put into the context dict under their names so the rest of the
+        query can reference them.
+        """
+        query_ir = query if isinstance(query, QueryIR) else self.__query_parser.parse(query)
         selected_join_columns, join_conditions = None, None
         context_dict = context_dict or {**self.__base_context_dict}
 
-        select = query["select"]
-        joins = query.get("joins")
-        where = query.get("where")
-        having = query.get("having")
-        limit = query.get("limit")
-        offset = query.get("offset")
-        order_by = query.get("order_by")
-        group_by = query.get("group_by")
-        distinct = query.get("distinct")
-        subqueries = query.get("subqueries")
-        cte = query.get("cte")
-        union: HqlUnion | None = query.get("union", None) or query.get("union_all")
-        union_all = "union_all" in query
-        resolver_params = query.get("resolver_args")
-        is_resolver = "()" in ([x for x in query["select"].keys()][0])
-
-        if union:
-            self._process_union(context_dict, union, union_all, connection)
-
-        if subqueries:
-            self._process_sub_queries(subqueries, context_dict, connection)
-
-        if joins:
-            selected_join_columns, join_conditions = self._process_joins(joins, context_dict)
-
-        if is_resolver:
+        if query_ir.union:
+            self._process_union(context_dict, query_ir.union, connection)
+
+        if query_ir.subqueries:
+            self._process_sub_queries(query_ir.subqueries, context_dict, connection)
+
+        if query_ir.joins:
+            selected_join_columns, join_conditions = self._process_joins(
+                query_ir.joins, context_dict
+            )
+
+        if query_ir.resolver is not None:
             query = self._process_resolver(
-                select,
+                query_ir.resolver,
                 context_dict,
-                resolver_params,
+                dict(query_ir.resolver_args),
                 selected_join_columns,
                 join_conditions,
                 connection,
             )
         else:
             query = self._process_selects(
-                select, context_dict, selected_join_columns, join_conditions
+                query_ir.select, context_dict, selected_join_columns, join_conditions
             )
 
-        if having:
-            query = query.having(*self._process_where_clause(having, context_dict))
+        if query_ir.having:
+            query = query.having(*self._process_where_clause(query_ir.having, context_dict))
 
-        if where:
-            query = query.filter(*self._process_where_clause(where, context_dict))
+        if query_ir.where:
+            query = query.filter(*self._process_where_clause(query_ir.where, context_dict))
 
-        if limit:
+        if query_ir.is_keyset_paginated:
+            sort_columns = self._get_sort_columns(query_ir.order_by, context_dict)
+            if query_ir.cursor:
+                query = query.filter(keyset_clause(sort_columns, query_ir.cursor))
+
+            # the last row's sort values are selected so the next cursor can be built from them
+            query = query.add_columns(
+                *[
+                    column.label(f"_keyset_{index}")
+                    for index, (column, _) in enumerate(sort_columns)
+                ]
+            )
+
+        if query_ir.window_count:
+            query = query.add_columns(func.count().over().label("_total_count"))
+
+        # limit / offset can be bind parameters when building a template
+        limit, offset = query_ir.limit, query_ir.offset
+        if isinstance(limit, BindParameter) or limit:
             query = query.limit(limit)
 
-        if offset:
+        if isinstance(offset, BindParameter) or offset:
             query = query.offset(offset)
 
-        if distinct:
+        if query_ir.distinct:
             query = query.distinct()
 
-        if group_by:
-            query = self._process_group_by(group_by, query)
+        if query_ir.group_by:
+            query = self._process_group_by(query_ir.group_by, query, context_dict)
 
-        if order_by:
-            query = self._process_order_by(order_by, query)
+        if query_ir.order_by:
+            query = self._process_order_by(query_ir.order_by, query, context_dict)
 
-        if cte:
-            query = query.cte(name=cte["name"], recursive=cte.get("recursive", False))
-            context_dict[cte["name"]] = query
+        if query_ir.cte:
+            query = query.cte(name=query_ir.cte.name, recursive=query_ir.cte.recursive)
+            context_dict[query_ir.cte.name] = query
 
         return GeneratedQuery(query, limit, offset)
 
     def _process_sub_queries(
         self,
-        subqueries: Dict[str, HqlQuery],
+        subqueries: Tuple[Subquery, ...],
         context_dict: Optional[Dict] = None,
         connection: Optional[Connection] = NoOpConnection,
     ):
@@ -181,15 +1179,14 @@ class QueryGenerator:
         # which may be different across web frameworks
         context_dict["subqueries"] = {}
         context_dict["subqueries_original"] = {}
-        for subquery_name in subqueries:
-            subquery = cast(HqlQuery, subqueries[subquery_name])
-            processed_subquery = self._process_query(subquery, context_dict, connection)
-            context_dict["subqueries"][subquery_name] = processed_subquery.query.subquery()
-            context_dict["subqueries_original"][subquery_name] = processed_subquery.query
+        for subquery in subqueries:
+            processed_subquery = self._process_query(subquery.query, context_dict, connection)
+            context_dict["subqueries"][subquery.name] = processed_subquery.query.subquery()
+            context_dict["subqueries_original"][subquery.name] = processed_subquery.query
 
     def _process_selects(
         self,
-        select: Dict[str, Dict[str, HqlSelect]],
+        select: Tuple[SelectSource, ...],
         context_dict: Dict,
         join_columns: List[ColumnListT],
         joins_conditions: List[
@@ -198,48 +1195,10 @@ class QueryGenerator:
     ):
         models = []
         select_columns = []
-        for model_key in select.keys():
-            model_or_subquery = self.__reflection_handler.model_class_cache.get(model_key, None)
-            if model_or_subquery is None:
-                model_or_subquery = context_dict.get("subqueries", context_dict).get(
-                    model_key, None
-                )
-
-            if model_or_subquery is None:
-                raise Exception("we need something here!")
-
-            models.append(model_or_subquery)
-            columns = select[model_key]
-            for column_key in columns.keys():
-                column_info: HqlSelect = columns[column_key]
-                label_name = column_info.get("label")
-                is_distinct = column_info.get("distinct")
-                else_ = column_info.get("else_", None)
-
-                if else_ is not None:
-                    else_ = self._return_value_from_hql_select_or_string(else_, context_dict)
-
-                if when_thens := column_info.get("whens", []):
-                    when_then_conditions = []
-                    for when_item in when_thens:
-                        when = self._process_where_clause(when_item["when"], context_dict)
-                        then = self._return_value_from_hql_select_or_string(
-                            when_item["then"], context_dict
-                        )
-                        when_then_conditions.append((when, then))
-
-                    select_column = case(*when_then_conditions, else_=else_).label(
-                        label_name or column_key
-                    )
-                    if is_distinct:
-                        select_column = select_column.distinct()
-
-                else:
-                    select_column = self._return_value_from_hql_select_or_string(
-                        column_info, context_dict, model_key, column_key
-                    )
-
-                select_columns.append(select_column)
+        for select_source in select:
+            models.append(self._get_model_or_subquery(select_source.name, context_dict))
+            for column in select_source.columns:
+                select_columns.append(self._return_value_from_query_ir(column, context_dict))
 
         need_to_select_from = False
         if len(select_columns) == 0:
@@ -259,163 +1218,115 @@ class QueryGenerator:
 
         return query
 
+    def _process_condition(
+        self, where: Tuple[WhereNodeT, ...], context_dict: Dict
+    ) -> _ColumnExpressionArgument[bool]:
+        """A where clause as a single condition, e.g. the when of a case column"""
+        clauses = self._process_where_clause(where, context_dict)
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
     def _process_where_clause(
-        self, where: WhereClausT, context_dict: Dict
+        self, where: Tuple[WhereNodeT, ...], context_dict: Dict
     ) -> List[_ColumnExpressionArgument[bool]]:
-        keys = where.keys()
         clauses = []
-        for key in keys:
-            lower_cased_key = key.lower()
-            if lower_cased_key == "and":
-                value = where[key]
+        for clause in where:
+            if isinstance(clause, BooleanClause):
+                inner_clauses = self._process_where_clause(clause.clauses, context_dict)
                 clauses.append(
-                    and_(
-                        *self._process_where_clause(value, context_dict),
-                    )
+                    and_(*inner_clauses) if clause.conjunction == "and" else or_(*inner_clauses)
                 )
-            elif lower_cased_key == "or":
-                value = where[key]
-                or_clause_input = []
-                for or_dict in value:
-                    or_clause_input.extend(self._process_where_clause(or_dict, context_dict))
-
-                clauses.append(or_(*or_clause_input))
+                continue
+
+            column = clause.column
+            is_model = column.source in self.__reflection_handler.model_field_cache
+            if not is_model and column.name == column.source:
+                # predicates on a whole subquery use its select rather than the subquery
+                self._get_model_or_subquery(column.source, context_dict)
+                comparator = context_dict["subqueries_original"][column.source]
             else:
-                model_name, field_name, operation = (
-                    self._parse_column_name_and_operation_from_key(key)
-                )
-                is_subquery = False
-                model_or_subquery = self.__reflection_handler.model_class_cache.get(
-                    model_name, None
-                )
-                if model_or_subquery is None:
-                    model_or_subquery = context_dict.get("subqueries", context_dict).get(
-                        model_name, None
-                    )
-                    is_subquery = model_or_subquery is not None
-
-                if model_or_subquery is None:
-                    raise Exception("we need something here!")
-
-                if is_subquery and field_name != model_name:
-                    column = getattr(model_or_subquery.c, field_name)
-                    value = self._return_value_from_hql_select_or_string(
-                        where[key], context_dict
-                    )
-                elif is_subquery and field_name == model_name:
-                    column = context_dict["subqueries_original"][model_name]
-                    value = None
-                else:
-                    column = self.__reflection_handler.model_field_cache[model_name][field_name]
-                    value = self._return_value_from_hql_select_or_string(
-                        where[key], context_dict
-                    )
+                comparator = self._get_column(column, context_dict)
 
-                clauses.append(
-                    operation(
-                        column,
-                        value,
-                    )
-                )
+            value = self._return_value_from_query_ir(clause.value, context_dict)
+            clauses.append(OPERATORS[clause.op](comparator, value))
 
         return clauses
 
-    def _process_joins(self, joins: Dict[str, HqlJoin], context_dict: Dict) -> Tuple[
+    def _process_joins(self, joins: Tuple[Join, ...], context_dict: Dict) -> Tuple[
         List[ColumnListT],
         List[Tuple[Type[DeclarativeBase], List[_ColumnExpressionArgument[bool]]]],
     ]:
         select_columns = []
         joins_to_return = []
-        for join_key in joins.keys():
-            columns = joins[join_key].get("select")
-            model = self.__reflection_handler.model_class_cache[join_key]
-            where_clauses = self._process_where_clause(
-                joins[join_key].get("where"), context_dict
-            )
-            for column_key in columns.keys():
-                column_info = columns[column_key]
-                select_column = self.__reflection_handler.model_field_cache[join_key][
-                    column_key
-                ]
-                if column_info.get("label"):
-                    select_column = select_column.label(column_info["label"])
-                else:
-                    select_column = select_column.label(f"{join_key.lower()}_{column_key}")
-                if column_info.get("distinct"):
-                    select_column = select_column.distinct()
-
-                select_columns.append(select_column)
+        for join in joins:
+            model = self.__reflection_handler.model_class_cache[join.model]
+            where_clauses = self._process_where_clause(join.where, context_dict)
+            for column in join.columns:
+                select_columns.append(self._return_value_from_query_ir(column, context_dict))
 
             joins_to_return.append((model, where_clauses))
 
         return select_columns, joins_to_return
 
-    def _process_group_by(self, group_by, query):
-        group_by_columns = []
-        for column in group_by:
-            split_key = column.split(".")
-            model_name = split_key[0]
-            field_name = split_key[1]
-            group_by_columns.append(
-                self.__reflection_handler.model_field_cache[model_name][field_name]
-            )
-        query = query.group_by(*group_by_columns)
-        return query
+    def _process_group_by(self, group_by: Tuple[ColumnRef, ...], query, context_dict: Dict):
+        return query.group_by(*[self._get_column(column, context_dict) for column in group_by])
 
-    def _process_order_by(self, order_by, query):
-        order_by_columns = {}
-        for column in order_by:
-            value = order_by[column]
-            split_key = column.split(".")
-            model_name = split_key[0]
-            field_name = split_key[1]
-            if value["dir"] == "desc":
-                order_by_columns[value["index"]] = self.__reflection_handler.model_field_cache[
-                    model_name
-                ][field_name].desc()
-            else:
-                order_by_columns[value["index"]] = self.__reflection_handler.model_field_cache[
-                    model_name
-                ][field_name].asc()
+    def _process_order_by(self, order_by: Tuple[Sort, ...], query, context_dict: Dict):
         order_by_array = []
-        keys_len = len(order_by_columns)
-        for idx in range(keys_len):
-            order_by_array.append(order_by_columns[idx])
+        for column, direction in self._get_sort_columns(order_by, context_dict):
+            order_by_array.append(column.desc() if direction == "desc" else column.asc())
         query = query.order_by(*order_by_array)
         return query
 
+    def _get_sort_columns(
+        self, order_by: Tuple[Sort, ...], context_dict: Dict
+    ) -> List[Tuple[ColumnTypesT, Literal["asc", "desc"]]]:
+        """Returns the columns of an order_by with their directions, in sort order"""
+        return [
+            (self._get_column(sort.column, context_dict), sort.direction) for sort in order_by
+        ]
+
     def _process_union(
         self,
         context_dict: Dict,
-        union: HqlUnion,
-        union_all: bool,
+        union: UnionIR,
         connection: Optional[Connection] = NoOpConnection,
     ):
         # run the left side of the query and throw it into the context for referencing by name
-        processed_left = self._process_query(union["left"], context_dict, connection).query
-        context_dict[union["left"]["alias"]] = processed_left
+        processed_left = self._process_query(union.left, context_dict, connection).query
+        context_dict[union.left_alias] = processed_left
 
         # run the right side of the query, then apply the union on it and the cte if needed
-        processed_right = self._process_query(union["right"], context_dict, connection).query
+        processed_right = self._process_query(union.right, context_dict, connection).query
 
-        if union_all:
-            union_query = processed_left.union_all(processed_right)
+        left_branch = self._union_branch(union.left, processed_left)
+        right_branch = self._union_branch(union.right, processed_right)
+        if union.all:
+            union_query = left_branch.union_all(right_branch)
         else:
-            union_query = processed_left.union(processed_right)
+            union_query = left_branch.union(right_branch)
 
-        union_cte = union.get("cte")
-        if union_cte:
-            union_query = union_query.cte(
-                name=union_cte["name"], recursive=union_cte.get("recursive", False)
-            )
-            context_dict[union_cte["name"]] = union_query
+        if union.cte:
+            union_query = union_query.cte(name=union.cte.name, recursive=union.cte.recursive)
+            context_dict[union.cte.name] = union_query
 
         # Everything should be in the context under it's alias, now we can reference the items in the rest of the query
-        context_dict[union["name"]] = union_query
+        context_dict[union.name] = union_query
+
+    @staticmethod
+    def _union_branch(branch: QueryIR, query: Select) -> Select:
+        """
+        Branches with a limit, offset or order_by (e.g. from model limits) are selected from as
+        a subquery, SQLite doesn't allow them on the selects of a compound select.
+        """
+        if branch.limit is None and branch.offset is None and not branch.order_by:
+            return query
+
+        branch_subquery = query.subquery()
+        return select(*branch_subquery.c)
 
     def _process_resolver(
         self,
-        select: Dict[str, Dict[str, HqlSelect]],
+        resolver_key: str,
         context_dict: Dict,
         resolver_params: Dict[str, PrimitiveT],
         join_columns: List[ColumnListT],
@@ -424,15 +1335,12 @@ class QueryGenerator:
         ],
         connection: Optional[Connection] = NoOpConnection,
     ) -> Select:
-        # we're only going to processs the first item in the selects dict when working with resolvers
-        resolver_key = [x for x in select.keys()][0].replace("()", "")
         try:
             resolver = self.__reflection_handler.resolver_name_type_cache[resolver_key](
                 connection
             )
             query = resolver.execute(**resolver_params)
         except Exception:
-            print("resolver is not defined")
             raise Exception(f"resolver ({resolver_key}) is not defined")
 
         if join_columns:
@@ -444,164 +1352,87 @@ class QueryGenerator:
 
         return query
 
-    def _return_value_from_hql_select_or_string(
-        self,
-        select: Union[str, HqlSelect],
-        context_dict: Dict,
-        model_key: Optional[str] = None,
-        column_name: Optional[str] = None,
-    ) -> Any:
-        if isinstance(select, str):
-            if "(" in select and ")" in select:
-                return self.__ast_handler.convert_ast_to_sqlalchemy_column(
-                    select, context_dict, model_key
-                )
-            if "." not in select:
-                return select
-
-            key_split = select.split(".")
-            model_name = key_split[0]
-            action_split = key_split[1].split("__")
-            field_name = action_split[0]
-            possible_value = self.__reflection_handler.model_field_cache.get(
-                model_name, {}
-            ).get(field_name, None)
-            if possible_value is not None:
-                return possible_value
-            else:
-                return select
-        elif isinstance(select, Dict):
-            label = select.get("label", None)
-            # when then value
-            if "value" in select.keys():
-                value = self._return_value_from_hql_select_or_string(
-                    select.get("value"), context_dict
-                )
-                is_distinct = select.get("distinct", None) is not None
-                if label is not None:
-                    value = value.label(label)
-                if is_distinct:
-                    value = value.distinct()
-                return value
-
-            # functional column handling
-            if "(" in column_name and ")" in column_name:
-                select = self.__ast_handler.convert_ast_to_sqlalchemy_column(
-                    column_name, context_dict, model_key
-                )
-                if label is not None:
-                    select = select.label(label)
-                return select
-
-            # standard column path
-            if (
-                model_obj := self.__reflection_handler.model_field_cache.get(model_key, None)
-            ) is not None:
-                if "[" and "]" in column_name:
-                    split_items = column_name.split("[")
-                    column_name = split_items[0]
-                    select = model_obj[column_name]
-                    split = [x.replace("'", "").replace("]", "") for x in split_items[1:]]
-                    for item in split:
-                        select = select[item]
-                else:
-                    select = model_obj[column_name]
-
-                if label is not None:
-                    select = select.label(label)
-                return select
-
-            model_or_subquery = context_dict.get("subqueries", context_dict).get(
-                model_key, None
-            )
-            if model_or_subquery is not None:
-                columns_inner_select = select.get("select", None)
-                columns_inner_where = select.get("where", None)
-                if columns_inner_select is not None:
-                    select = self._return_value_from_hql_select_or_string(
-                        columns_inner_select, context_dict, model_key
-                    )
-                    if columns_inner_where is not None:
-                        filter_conditions = self._process_where_clause(
-                            columns_inner_where, context_dict
-                        )
-                        select = select.filter(*filter_conditions)
-                else:
-                    select = getattr(model_or_subquery.c, column_name)
-
-                if label is not None:
-                    select = select.label(label)
-
-                return select
-
-            raise Exception("Not implemented yet for type", type(select))
-        elif type(select) in [
-            int,
-            str,
-            float,
-            bool,
-            List[int],
-            List[str],
-            List[float],
-            List[bool],
-        ]:
+    def _get_model_or_subquery(self, name: str, context_dict: Dict) -> Any:
+        """The model, or the subquery, cte or union in the context dict, with the given name"""
+        model_or_subquery = self.__reflection_handler.model_class_cache.get(name, None)
+        if model_or_subquery is None:
+            model_or_subquery = context_dict.get("subqueries", context_dict).get(name, None)
+
+        if model_or_subquery is None:
+            raise Exception("we need something here!")
+
+        return model_or_subquery
+
+    def _get_column(self, column: ColumnRef, context_dict: Dict) -> ColumnTypesT:
+        model_fields = self.__reflection_handler.model_field_cache.get(column.source, None)
+        if model_fields is None:
+            subquery = self._get_model_or_subquery(column.source, context_dict)
+            return getattr(subquery.c, column.name)
+
+        select_column = model_fields[column.name]
+        for item in column.path:
+            select_column = select_column[item]
+        return select_column
+
+    def _return_value_from_query_ir(self, value: Any, context_dict: Dict) -> Any:
+        """
+        Builds the column or expression for a select column or value of the IR, literals and
+        bind parameters are returned as they are.
+        """
+        if isinstance(value, ColumnRef):
+            select = self._get_column(value, context_dict)
+            if value.label is not None:
+                select = select.label(value.label)
+            if value.distinct:
+                select = select.distinct()
             return select
-        else:
-            raise Exception("Not implemented yet for type", type(select))
 
-    @staticmethod
-    def _get_operation_from_action_name(operation: str):
-        operation = operation.lower()
-        if operation == "eq":
-            return lambda comparator, _value: (
-                is_ if isinstance(_value, bool) else comparator == _value
+        if isinstance(value, FunctionExpr):
+            select = self.__ast_handler.convert_ast_to_sqlalchemy_column(
+                value.expression, context_dict, value.source
             )
+            if value.label is not None:
+                select = select.label(value.label)
+            return select
 
-        if operation == "ne":
-            return lambda comparator, _value: (
-                is_not if isinstance(_value, bool) else comparator != _value
+        if isinstance(value, LabeledValue):
+            select = self._typed_parameter(
+                self._return_value_from_query_ir(value.value, context_dict)
             )
+            if value.label is not None:
+                select = select.label(value.label)
+            if value.distinct:
+                select = select.distinct()
+            return select
 
-        if operation == "like":
-            return like_op
-
-        if operation == "not_like":
-            return not_like_op
-
-        if operation == "not_ilike":
-            return not_ilike_op
-
-        if operation == "exists":
-            return lambda scalar_query, _: scalar_query.exists()
-
-        if operation == "not_exists":
-            return lambda scalar_query, _: ~scalar_query.exists()
-
-        if operation == "lt":
-            return lambda comparator, _value: comparator < _value
-
-        if operation == "lte":
-            return lambda comparator, _value: comparator <= _value
-
-        if operation == "gt":
-            return lambda comparator, _value: comparator > _value
-
-        if operation == "gte":
-            return lambda comparator, _value: comparator >= _value
+        if isinstance(value, CaseColumn):
+            when_then_conditions = [
+                (
+                    self._process_condition(when_then.when, context_dict),
+                    self._typed_parameter(
+                        self._return_value_from_query_ir(when_then.then, context_dict)
+                    ),
+                )
+                for when_then in value.whens
+            ]
+            else_ = value.else_
+            if else_ is not None:
+                else_ = self._typed_parameter(
+                    self._return_value_from_query_ir(else_, context_dict)
+                )
 
-        if operation == "re":
-            return regexp_match_op
+            select = case(*when_then_conditions, else_=else_).label(value.label)
+            if value.distinct:
+                select = select.distinct()
+            return select
 
-        if operation == "not_re":
-            return
+        if isinstance(value, SubqueryColumn):
+            self._get_model_or_subquery(value.source, context_dict)
+            select = self._return_value_from_query_ir(value.select, context_dict)
+            if value.where:
+                select = select.filter(*self._process_where_clause(value.where, context_dict))
+            if value.label is not None:
+                select = select.label(value.label)
+            return select
 
-    @staticmethod
-    def _parse_column_name_and_operation_from_key(
-        key: str,
-    ) -> Tuple[str, str, Callable]:
-        key_split = key.split(".")
-        model_name = key_split[0]
-        action_split = key_split[-1].split("__")
-        field_name = action_split[0]
-        operation = QueryGenerator._get_operation_from_action_name(action_split[1])
-        return model_name if len(key_split) > 1 else field_name, field_name, operation
+        return value
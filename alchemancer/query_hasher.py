@@ -0,0 +1,301 @@
+import copy
+import hashlib
+import itertools
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from alchemancer.reflection_handler import (
+    ReflectionHandler,
+)
+from alchemancer.types.query import HqlQuery
+
+# Structural markers are ints so they can never be confused with the (repr quoted) strings
+# coming from the query itself. Booleans compare equal to 0 and 1, they are emitted tagged as
+# (_BOOLEAN, value) so they can't be confused with _OPEN and _CLOSE.
+_OPEN = 0
+_CLOSE = 1
+_LITERAL = 2
+_COLUMN = 3
+_FUNCTION = 4
+_BOOLEAN = 5
+_LITERAL_TOKENS = {
+    _type: (_LITERAL, _type.__name__) for _type in (int, float, str, list, dict, bool)
+}
+
+
+def _ordered(value: dict):
+    # sorting is comparatively expensive and most dicts in a query only have a single key
+    return value if len(value) < 2 else sorted(value)
+
+
+class QueryFingerprint:
+    """
+    ``key`` is a flat tuple describing the shape of the query, it is cheap to hash and compare
+    and is what in process caches should use. ``hash`` is a stable hex digest of that key,
+    suitable for cataloguing queries across processes, it is computed on first access.
+    ``sources`` holds every model, subquery, cte and resolver name the query selects from or
+    joins to.
+    """
+
+    key: Tuple[Any, ...]
+    parameters: List[Any]
+    sources: FrozenSet[str]
+    __hash: Optional[str]
+
+    def __init__(self, key: Tuple[Any, ...], parameters: List[Any], sources: FrozenSet[str]):
+        self.key = key
+        self.parameters = parameters
+        self.sources = sources
+        self.__hash = None
+
+    @property
+    def uses_resolver(self) -> bool:
+        return any("()" in source for source in self.sources)
+
+    @property
+    def hash(self) -> str:
+        if self.__hash is None:
+            self.__hash = hashlib.blake2b(repr(self.key).encode(), digest_size=16).hexdigest()
+        return self.__hash
+
+
+class QueryHasher:
+    """
+    Computes fingerprints for the shape of a (canonical) HqlQuery.
+
+    The fingerprint covers models, columns, functional columns, operators, joins, subqueries and
+    the union / cte structure. Literal values found in where / having clauses, when-then values,
+    limit, offset, resolver_args and decoded keyset cursors are stripped out and returned in a
+    deterministic order as the query's parameters. ``None`` and booleans are kept as part of the
+    shape since they change the generated operators (``IS NULL`` etc.). Dict key order does not
+    change the result, except for the selected models, columns and joins whose order is the
+    order of the result's columns.
+    """
+
+    reflection_handler: ReflectionHandler
+
+    def __init__(self, reflection_handler: Optional[ReflectionHandler] = None) -> None:
+        self.reflection_handler = reflection_handler or ReflectionHandler()
+
+    def hash_query(self, query: HqlQuery) -> str:
+        return self.fingerprint(query).hash
+
+    def fingerprint(self, query: HqlQuery) -> QueryFingerprint:
+        parameters = []
+        add_parameter = parameters.append
+
+        def on_literal(container: Dict, key: Any) -> None:
+            add_parameter(container[key])
+
+        key, sources = self._walk(query, on_literal)
+        return QueryFingerprint(key, parameters, sources)
+
+    def parameterize(
+        self, query: HqlQuery, parameter_factory: Callable[[int, Any], Any]
+    ) -> HqlQuery:
+        """
+        Returns a copy of the query where every literal that ``fingerprint`` strips out is
+        replaced with ``parameter_factory(index, value)``, index being the literal's position in
+        ``QueryFingerprint.parameters``.
+        """
+        query_copy = copy.deepcopy(query)
+        index = itertools.count()
+
+        def on_literal(container: Dict, key: Any) -> None:
+            container[key] = parameter_factory(next(index), container[key])
+
+        self._walk(query_copy, on_literal)
+        return query_copy
+
+    def _walk(
+        self, query: HqlQuery, on_literal: Callable[[Dict, Any], None]
+    ) -> Tuple[Tuple[Any, ...], FrozenSet[str]]:
+        # This runs on every request, so the walk is written with closures over local names
+        # instead of methods to keep attribute lookups out of the hot path. Literals are dict
+        # values or list items, on_literal gets handed the container and key so the caller can
+        # either read or replace them.
+        tokens = []
+        sources = set()
+        emit = tokens.append
+        add_source = sources.add
+        model_field_cache = self.reflection_handler.model_field_cache
+
+        def walk_value(container, key):
+            value = container[key]
+            # Mirrors QueryParser.parse_value, columns and functions are part of the shape
+            # while anything else is treated as a literal parameter.
+            if value is None:
+                emit(value)
+                return
+            if value is True or value is False:
+                emit((_BOOLEAN, value))
+                return
+
+            value_type = type(value)
+            if value_type is str:
+                if "(" in value and ")" in value:
+                    emit(_FUNCTION)
+                    emit(value)
+                    return
+                if "." in value:
+                    key_split = value.split(".")
+                    model_fields = model_field_cache.get(key_split[0])
+                    if model_fields is not None and key_split[1].split("__")[0] in model_fields:
+                        emit(_COLUMN)
+                        emit(value)
+                        return
+
+            elif value_type is dict:
+                walk_select_column(value)
+                return
+
+            emit(_LITERAL_TOKENS.get(value_type) or (_LITERAL, value_type.__name__))
+            on_literal(container, key)
+
+        def walk_filter(where):
+            emit(_OPEN)
+            if where:
+                for key in _ordered(where):
+                    value = where[key]
+                    lower_cased_key = key.lower() if len(key) < 4 else key
+                    if lower_cased_key == "and":
+                        emit(lower_cased_key)
+                        walk_filter(value)
+                    elif lower_cased_key == "or":
+                        emit(lower_cased_key)
+                        emit(_OPEN)
+                        for or_dict in value:
+                            walk_filter(or_dict)
+                        emit(_CLOSE)
+                    else:
+                        emit(key)
+                        value_type = type(value)
+                        if value_type is int or value_type is float:
+                            emit(_LITERAL_TOKENS[value_type])
+                            on_literal(where, key)
+                        else:
+                            walk_value(where, key)
+            emit(_CLOSE)
+
+        def walk_columns(columns):
+            # unlike other keys the selected columns keep their order, it is the result's order
+            emit(_OPEN)
+            for column_key in columns:
+                emit(column_key)
+                column_info = columns[column_key]
+                # the overwhelmingly common case, a plain column with no extra options
+                if not column_info:
+                    emit(None)
+                elif type(column_info) is dict:
+                    walk_select_column(column_info)
+                else:
+                    walk_value(columns, column_key)
+            emit(_CLOSE)
+
+        def walk_select_column(column_info):
+            emit(_OPEN)
+            for key in _ordered(column_info):
+                value = column_info[key]
+                emit(key)
+                if key == "value" or key == "else_":
+                    walk_value(column_info, key)
+                elif key == "whens":
+                    emit(_OPEN)
+                    for when_item in value:
+                        walk_filter(when_item.get("when"))
+                        walk_value(when_item, "then")
+                    emit(_CLOSE)
+                elif key == "where":
+                    walk_filter(value)
+                elif key == "select" and type(value) is dict:
+                    walk_columns(value)
+                else:
+                    freeze(value)
+            emit(_CLOSE)
+
+        def freeze(value):
+            value_type = type(value)
+            if value_type is dict:
+                emit(_OPEN)
+                for key in _ordered(value):
+                    emit(key)
+                    freeze(value[key])
+                emit(_CLOSE)
+            elif value_type is list:
+                emit(_OPEN)
+                for item in value:
+                    freeze(item)
+                emit(_CLOSE)
+            else:
+                emit(repr(value))
+
+        def walk_query(hql_query):
+            emit(_OPEN)
+            for key in _ordered(hql_query):
+                value = hql_query[key]
+                emit(key)
+                if key == "select":
+                    emit(_OPEN)
+                    for model_key in value:
+                        emit(model_key)
+                        add_source(model_key)
+                        walk_columns(value[model_key])
+                    emit(_CLOSE)
+                elif key == "where" or key == "having":
+                    walk_filter(value)
+                elif key == "limit" or key == "offset":
+                    # falsy limits / offsets are not applied by the generator
+                    if value:
+                        value_type = type(value)
+                        emit(_LITERAL_TOKENS.get(value_type) or (_LITERAL, value_type.__name__))
+                        on_literal(hql_query, key)
+                elif key == "joins":
+                    emit(_OPEN)
+                    # joins are applied and their columns selected in order as well
+                    for join_key in value:
+                        join = value[join_key]
+                        emit(join_key)
+                        add_source(join_key)
+                        walk_columns(join.get("select") or {})
+                        walk_filter(join.get("where"))
+                    emit(_CLOSE)
+                elif key == "subqueries":
+                    emit(_OPEN)
+                    for subquery_name in _ordered(value):
+                        emit(subquery_name)
+                        walk_query(value[subquery_name])
+                    emit(_CLOSE)
+                elif key == "union" or key == "union_all":
+                    emit(_OPEN)
+                    for union_key in _ordered(value):
+                        emit(union_key)
+                        if union_key == "left" or union_key == "right":
+                            walk_query(value[union_key])
+                        else:
+                            freeze(value[union_key])
+                    emit(_CLOSE)
+                elif key == "cursor":
+                    # decoded keyset values, the first page has no cursor value
+                    if value is None:
+                        emit(None)
+                    else:
+                        emit(_OPEN)
+                        for index in range(len(value)):
+                            item_type = type(value[index])
+                            emit(
+                                _LITERAL_TOKENS.get(item_type) or (_LITERAL, item_type.__name__)
+                            )
+                            on_literal(value, index)
+                        emit(_CLOSE)
+                elif key == "resolver_args":
+                    emit(_OPEN)
+                    for arg_name in _ordered(value):
+                        emit(arg_name)
+                        on_literal(value, arg_name)
+                    emit(_CLOSE)
+                else:
+                    # order_by, group_by, distinct, cte, alias, debug, etc. are structural only
+                    freeze(value)
+            emit(_CLOSE)
+
+        walk_query(query)
+        return tuple(tokens), frozenset(sources)
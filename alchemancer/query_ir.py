@@ -0,0 +1,418 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Literal, Optional, Tuple, Type
+
+from sqlalchemy import BindParameter
+
+from alchemancer.keyset_pagination import decode_cursor
+from alchemancer.operators import OPERATORS
+from alchemancer.reflection_handler import ReflectionHandler
+from alchemancer.types.query import HqlQuery, HqlSelect, WhereClausT
+
+# Literal types a value can have, anything else is rejected while parsing
+_LITERAL_TYPES = (int, str, float, bool)
+
+
+@dataclass(frozen=True, slots=True)
+class ColumnRef:
+    """
+    A column of a model or of a subquery, cte or union referenced by name. ``path`` holds the
+    keys of a json column item, ``"data['a']['b']"`` has the path ``("a", "b")``.
+    """
+
+    source: str
+    name: str
+    path: Tuple[str, ...] = ()
+    label: Optional[str] = None
+    distinct: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class FunctionExpr:
+    """A functional column, ``source`` is the model its bare column names belong to"""
+
+    expression: str
+    source: Optional[str] = None
+    label: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class LabeledValue:
+    value: Any
+    label: Optional[str] = None
+    distinct: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class Predicate:
+    """
+    ``column`` compared to ``value`` with ``op``, the name of an operator in OPERATORS (see
+    Operator for the built-in ones). Predicates on a whole subquery (exists / not exists)
+    reference a column named after the subquery and have no value.
+    """
+
+    column: ColumnRef
+    op: str
+    value: Any = None
+
+
+@dataclass(frozen=True, slots=True)
+class BooleanClause:
+    conjunction: Literal["and", "or"]
+    clauses: Tuple["WhereNodeT", ...]
+
+
+WhereNodeT = Predicate | BooleanClause
+
+
+@dataclass(frozen=True, slots=True)
+class WhenThen:
+    when: Tuple[WhereNodeT, ...]
+    then: Any
+
+
+@dataclass(frozen=True, slots=True)
+class CaseColumn:
+    label: str
+    whens: Tuple[WhenThen, ...]
+    else_: Any = None
+    distinct: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class SubqueryColumn:
+    """A column selected from a subquery through an inner select, filtered by ``where``"""
+
+    source: str
+    select: Any
+    where: Tuple[WhereNodeT, ...] = ()
+    label: Optional[str] = None
+
+
+SelectColumnT = ColumnRef | FunctionExpr | LabeledValue | CaseColumn | SubqueryColumn
+
+
+@dataclass(frozen=True, slots=True)
+class SelectSource:
+    """A model, subquery, cte or union selected from and the columns selected from it"""
+
+    name: str
+    columns: Tuple[SelectColumnT, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Join:
+    model: str
+    columns: Tuple[ColumnRef, ...]
+    where: Tuple[WhereNodeT, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Sort:
+    column: ColumnRef
+    direction: Literal["asc", "desc"]
+
+
+@dataclass(frozen=True, slots=True)
+class Cte:
+    name: str
+    recursive: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class Subquery:
+    name: str
+    query: "QueryIR"
+
+
+@dataclass(frozen=True, slots=True)
+class Union:
+    """
+    ``left`` is available to ``right`` under ``left_alias``, the union itself under ``name``
+    and ``cte``'s name if it is one.
+    """
+
+    name: str
+    left: "QueryIR"
+    left_alias: str
+    right: "QueryIR"
+    all: bool = False
+    cte: Optional[Cte] = None
+
+
+@dataclass(frozen=True, slots=True)
+class QueryIR:
+    """
+    A parsed HqlQuery, built by QueryParser. Every node is immutable and hashable, as long as
+    the literals in it are. ``limit`` and ``offset`` may be bind parameters when the query is
+    built as a template. ``cursor`` is set for keyset paginated queries, decoded and empty on
+    their first page.
+    """
+
+    select: Tuple[SelectSource, ...]
+    resolver: Optional[str] = None
+    resolver_args: Tuple[Tuple[str, Any], ...] = ()
+    joins: Tuple[Join, ...] = ()
+    where: Tuple[WhereNodeT, ...] = ()
+    having: Tuple[WhereNodeT, ...] = ()
+    limit: Any = None
+    offset: Any = None
+    order_by: Tuple[Sort, ...] = ()
+    group_by: Tuple[ColumnRef, ...] = ()
+    distinct: bool = False
+    subqueries: Tuple[Subquery, ...] = ()
+    cte: Optional[Cte] = None
+    union: Optional[Union] = None
+    cursor: Optional[Tuple[Any, ...]] = None
+    window_count: bool = False
+
+    @property
+    def is_keyset_paginated(self) -> bool:
+        return self.cursor is not None
+
+
+class QueryParser:
+    """
+    Parses an HqlQuery into a QueryIR in a single pass, splitting every ``"Model.field__OP"``
+    key and telling columns, functions and literals apart once. Models, their columns and
+    operators are validated while parsing, names of subqueries, ctes and unions can only be
+    resolved once the query is built.
+    """
+
+    reflection_handler: Type[ReflectionHandler]
+
+    def __init__(self, reflection_handler: Type[ReflectionHandler] = ReflectionHandler):
+        self.reflection_handler = reflection_handler
+
+    def parse(self, query: HqlQuery) -> QueryIR:
+        select = query["select"]
+        first_source = next(iter(select))
+        # resolver queries only use the first select key, their columns come from the resolver
+        is_resolver = "()" in first_source
+        union = query.get("union") or query.get("union_all")
+        cte = query.get("cte")
+        order_by = query.get("order_by")
+        is_keyset_paginated = "cursor" in query
+        cursor = query.get("cursor")
+        if isinstance(cursor, str):
+            cursor = decode_cursor(cursor)
+
+        return QueryIR(
+            select=(
+                ()
+                if is_resolver
+                else tuple(
+                    SelectSource(
+                        source,
+                        tuple(
+                            self.__parse_select_column(source, column_key, column_info)
+                            for column_key, column_info in columns.items()
+                        ),
+                    )
+                    for source, columns in select.items()
+                )
+            ),
+            resolver=first_source.replace("()", "") if is_resolver else None,
+            resolver_args=tuple((query.get("resolver_args") or {}).items()),
+            joins=tuple(
+                self.__parse_join(model, join)
+                for model, join in (query.get("joins") or {}).items()
+            ),
+            where=self.parse_where(query.get("where")),
+            having=self.parse_where(query.get("having")),
+            limit=query.get("limit"),
+            offset=query.get("offset"),
+            order_by=self.__parse_order_by(order_by) if order_by else (),
+            group_by=tuple(self.__model_column(key) for key in query.get("group_by") or ()),
+            distinct=bool(query.get("distinct")),
+            subqueries=tuple(
+                Subquery(name, self.parse(subquery))
+                for name, subquery in (query.get("subqueries") or {}).items()
+            ),
+            cte=Cte(cte["name"], cte.get("recursive", False)) if cte else None,
+            union=(
+                Union(
+                    union["name"],
+                    self.parse(union["left"]),
+                    union["left"]["alias"],
+                    self.parse(union["right"]),
+                    "union_all" in query,
+                    (
+                        Cte(union["cte"]["name"], union["cte"].get("recursive", False))
+                        if union.get("cte")
+                        else None
+                    ),
+                )
+                if union
+                else None
+            ),
+            cursor=tuple(cursor or ()) if is_keyset_paginated else None,
+            window_count=self.uses_window_count(query),
+        )
+
+    @staticmethod
+    def uses_window_count(query: HqlQuery) -> bool:
+        # A window count can't be capped, is counted before DISTINCT is applied and would only
+        # count the rows after a keyset cursor, those cases use a companion count query instead.
+        return (
+            query.get("total_count") is True
+            and not query.get("distinct")
+            and not query.get("cursor")
+        )
+
+    def parse_where(self, where: Optional[WhereClausT]) -> Tuple[WhereNodeT, ...]:
+        if not where:
+            return ()
+
+        clauses = []
+        for key, value in where.items():
+            lower_cased_key = key.lower()
+            if lower_cased_key == "and":
+                clauses.append(BooleanClause("and", self.parse_where(value)))
+            elif lower_cased_key == "or":
+                clauses.append(
+                    BooleanClause(
+                        "or",
+                        tuple(clause for item in value for clause in self.parse_where(item)),
+                    )
+                )
+            else:
+                clauses.append(self.__parse_predicate(key, value))
+
+        return tuple(clauses)
+
+    def parse_value(self, value: Any, source: Optional[str] = None) -> Any:
+        """
+        Columns (``"User.id"``) become ColumnRefs, functions FunctionExprs and
+        ``{"value": ...}`` dicts LabeledValues. Strings naming no known column are literals,
+        like other literals they are returned as they are.
+        """
+        # literals are swapped for bind parameters when building a template
+        if isinstance(value, BindParameter):
+            return value
+
+        if isinstance(value, str):
+            if "(" in value and ")" in value:
+                return FunctionExpr(value, source)
+            if "." not in value:
+                return value
+
+            key_split = value.split(".")
+            field_name = key_split[1].split("__")[0]
+            if field_name in self.reflection_handler.model_field_cache.get(key_split[0], {}):
+                return ColumnRef(key_split[0], field_name)
+            return value
+
+        if isinstance(value, dict) and "value" in value:
+            return LabeledValue(
+                self.parse_value(value["value"]),
+                value.get("label"),
+                value.get("distinct") is not None,
+            )
+
+        if type(value) in _LITERAL_TYPES:
+            return value
+
+        raise Exception("Not implemented yet for type", type(value))
+
+    def __parse_select_column(
+        self, source: str, column_key: str, column_info: HqlSelect
+    ) -> SelectColumnT:
+        label = column_info.get("label")
+        if when_thens := column_info.get("whens", []):
+            else_ = column_info.get("else_")
+            return CaseColumn(
+                label or column_key,
+                tuple(
+                    WhenThen(self.parse_where(item["when"]), self.parse_value(item["then"]))
+                    for item in when_thens
+                ),
+                self.parse_value(else_) if else_ is not None else None,
+                bool(column_info.get("distinct")),
+            )
+
+        if "value" in column_info:
+            return self.parse_value(column_info)
+
+        if "(" in column_key and ")" in column_key:
+            return FunctionExpr(column_key, source, label)
+
+        if source in self.reflection_handler.model_field_cache:
+            name, *path = column_key.split("[")
+            return ColumnRef(
+                source,
+                self.__validate_field(source, name),
+                tuple(item.replace("'", "").replace("]", "") for item in path),
+                label,
+            )
+
+        if (inner_select := column_info.get("select")) is not None:
+            return SubqueryColumn(
+                source,
+                self.parse_value(inner_select, source),
+                self.parse_where(column_info.get("where")),
+                label,
+            )
+
+        return ColumnRef(source, column_key, label=label)
+
+    def __parse_predicate(self, key: str, value: Any) -> Predicate:
+        key_split = key.split(".")
+        action_split = key_split[-1].split("__")
+        if len(action_split) < 2:
+            raise ValueError(f"{key} has no operator")
+
+        field_name = action_split[0]
+        source = key_split[0] if len(key_split) > 1 else field_name
+        operator = self.parse_operator(action_split[1])
+        if source in self.reflection_handler.model_class_cache:
+            column = ColumnRef(source, self.__validate_field(source, field_name))
+        else:
+            column = ColumnRef(source, field_name)
+            # predicates on a whole subquery ("Subquery__EXISTS") don't use their value
+            if field_name == source:
+                return Predicate(column, operator)
+
+        return Predicate(column, operator, self.parse_value(value))
+
+    @staticmethod
+    def parse_operator(name: str) -> str:
+        name = name.lower()
+        if name not in OPERATORS:
+            raise ValueError(f"Unknown operator {name}")
+        return name
+
+    def __parse_join(self, model: str, join: Dict[str, Any]) -> Join:
+        if model not in self.reflection_handler.model_class_cache:
+            raise ValueError(f"Can't join unknown model {model}")
+
+        return Join(
+            model,
+            tuple(
+                ColumnRef(
+                    model,
+                    self.__validate_field(model, column_key),
+                    label=column_info.get("label") or f"{model.lower()}_{column_key}",
+                    distinct=bool(column_info.get("distinct")),
+                )
+                for column_key, column_info in join["select"].items()
+            ),
+            self.parse_where(join.get("where")),
+        )
+
+    def __parse_order_by(self, order_by: Dict[str, Any]) -> Tuple[Sort, ...]:
+        sorts = {
+            sort["index"]: Sort(
+                self.__model_column(key), "desc" if sort["dir"] == "desc" else "asc"
+            )
+            for key, sort in order_by.items()
+        }
+        return tuple(sorts[index] for index in range(len(sorts)))
+
+    def __model_column(self, key: str) -> ColumnRef:
+        model_name, field_name = key.split(".")[:2]
+        return ColumnRef(model_name, self.__validate_field(model_name, field_name))
+
+    def __validate_field(self, model_name: str, field_name: str) -> str:
+        if field_name not in self.reflection_handler.model_field_cache.get(model_name, {}):
+            raise ValueError(f"{model_name} has no column {field_name}")
+        return field_name
@@ -7,7 +7,11 @@ else:
     from typing import Self, Callable
 
 from typing import (
+    Any,
     Dict,
+    FrozenSet,
+    Iterable,
+    List,
     Literal,
     Optional,
     TypeAlias,
@@ -15,7 +19,7 @@ from typing import (
     cast,
 )
 
-from alchemancer.types.query import HqlJoin, HqlQuery, HqlSelect, HqlSort, WhereClausT
+from alchemancer.types.query import HqlQuery, HqlSelect, HqlSort, WhereClausT
 
 TransformationName: TypeAlias = str
 
@@ -111,6 +115,20 @@ class ResolverArgsNode:
         self.alias = alias
 
 
+class CursorNode:
+    alias: str
+
+    def __init__(self, alias: str = "cursor") -> None:
+        self.alias = alias
+
+
+class TotalCountNode:
+    alias: str
+
+    def __init__(self, alias: str = "total_count") -> None:
+        self.alias = alias
+
+
 class HqlCTENode:
     name_alias: str
     recursive_alias: str
@@ -279,6 +297,8 @@ class QueryTransformation:
     union_all: HqlUnionNode
     resolver_args: ResolverArgsNode
     debug: DebugNode
+    cursor: CursorNode
+    total_count: TotalCountNode
 
     def __init__(
         self,
@@ -298,6 +318,8 @@ class QueryTransformation:
         union_all: HqlUnionNode,
         resolver_args: ResolverArgsNode,
         debug: DebugNode,
+        cursor: CursorNode = None,
+        total_count: TotalCountNode = None,
     ) -> None:
         if joins.select_node is None:
             joins.select_node = select
@@ -327,251 +349,450 @@ class QueryTransformation:
         self.union_all = union_all
         self.resolver_args = resolver_args
         self.debug = debug
+        self.cursor = cursor or CursorNode()
+        self.total_count = total_count or TotalCountNode()
+
+
+TranslateT = Callable[[Any, Dict[str, Any]], None]
+# Top-level keys of a canonical HqlQuery
+CANONICAL_QUERY_KEYS: FrozenSet[str] = frozenset(HqlQuery.__annotations__)
+
+
+class CompiledTransformation:
+    """
+    A QueryTransformation flattened into the alias lookup tables translating a client query
+    needs. ``translate`` rewrites a client query into a canonical HqlQuery in a single pass over
+    its keys, dispatching every top-level key to the translator of the node it is the alias of.
+    Keys that aren't an alias of the transformation are dropped.
+
+    Subqueries and union branches are translated by the compiled transformations of their
+    nodes, looked up through ``compile_transformation``.
+    """
+
+    __compile_transformation: Callable[[QueryTransformation], "CompiledTransformation"]
+    __translators: Dict[str, TranslateT]
+    __select_alias: str
+    __label_alias: str
+    __distinct_alias: str
+    __value_alias: str
+    __whens_alias: str
+    __else_alias: str
+    __where_alias: str
+    __when_alias: str
+    __then_alias: str
+    __join_select_alias: str
+    __join_where_alias: str
+    __and_alias: str
+    __or_alias: str
+    __operator_map: Dict[str, str]
+    __debug_values: Dict[str, Literal["html", "str"]]
+    __sort_item_conversion_function: Optional[Callable[[Union[str, Dict]], HqlSort]]
+    __index_alias: str
+    __nulls_last_alias: str
+    __dir_alias: str
+    __directions: Dict[str, Literal["asc", "desc"]]
+    __subquery_transformation: QueryTransformation
 
+    def __init__(
+        self,
+        transformation: QueryTransformation,
+        compile_transformation: Callable[[QueryTransformation], "CompiledTransformation"],
+    ) -> None:
+        self.__compile_transformation = compile_transformation
+
+        select = transformation.select
+        self.__select_alias = select.alias
+        self.__label_alias = select.label_alias
+        self.__distinct_alias = select.distinct_alias
+        self.__value_alias = select.value_alias
+        self.__whens_alias = select.whens_alias
+        self.__else_alias = select.else_alias
+        self.__where_alias = select.where_alias
+        self.__when_alias = select.when_node.when_alias
+        self.__then_alias = select.when_node.then_alias
+        self.__join_select_alias = transformation.joins.select_node.select_alias
+        self.__join_where_alias = transformation.joins.where_node.alias
+
+        filter_info = transformation.filter_info
+        self.__and_alias = filter_info.and_alias
+        self.__or_alias = filter_info.or_alias
+        self.__operator_map = dict(filter_info.operator_map)
+
+        debug = transformation.debug
+        self.__debug_values = {debug.html_alias: "html", debug.str_alias: "str"}
+
+        sort_node = transformation.order_by.sort_node
+        self.__sort_item_conversion_function = sort_node.sort_item_conversion_function
+        self.__index_alias = sort_node.index_alias
+        self.__nulls_last_alias = sort_node.nulls_last_alias
+        self.__dir_alias = sort_node.dir_alias
+        self.__directions = {sort_node.asc_alias: "asc", sort_node.desc_alias: "desc"}
+
+        self.__subquery_transformation = transformation.subqueries.query_node
+
+        # the cte has no top-level alias, it is only translated as part of unions
+        self.__translators = {
+            select.alias: self.__translate_select,
+            transformation.joins.alias: self.__translate_joins,
+            transformation.limit.alias: self.__translate_limit,
+            transformation.offset.alias: self.__translate_offset,
+            transformation.distinct.alias: self.__translate_distinct,
+            transformation.group_by.alias: self.__translate_group_by,
+            debug.alias: self.__translate_debug,
+            transformation.order_by.alias: self.__translate_order_by,
+            transformation.cursor.alias: self.__translate_cursor,
+            transformation.total_count.alias: self.__translate_total_count,
+            transformation.where.alias: self.__translate_where,
+            transformation.having.alias: self.__translate_having,
+            transformation.subqueries.alias: self.__translate_subqueries,
+            transformation.union.alias: self.__union_translator(
+                "union", transformation.union, transformation
+            ),
+            transformation.union_all.alias: self.__union_translator(
+                "union_all", transformation.union_all, transformation
+            ),
+            transformation.resolver_args.alias: self.__translate_resolver_args,
+        }
 
-class QueryTransformationHandler:
-    _transformations: Dict[TransformationName, QueryTransformation]
-
-    def __init__(self, transformations: Dict[TransformationName, QueryTransformation]) -> None:
-        self._transformations = transformations
-
-    def transform_query(
-        self, hql_query: Dict, target_transformation: Union[QueryTransformation, None] = None
-    ) -> HqlQuery:
-        # This method should implement the logic to transform the HQL query
-        # using the transformations defined in self._transformations
-        if target_transformation is None:
-            target_transformation = self.find_transformation(hql_query)
+    def translate(self, client_query: Dict[str, Any]) -> HqlQuery:
+        hql_query: Dict[str, Any] = {}
+        translators = self.__translators
+        for key, value in client_query.items():
+            translator = translators.get(key)
+            if translator is not None:
+                translator(value, hql_query)
+
+        if "select" not in hql_query:
+            raise KeyError(self.__select_alias)
+
+        return cast(HqlQuery, hql_query)
+
+    def __translate_select(self, select: Any, hql_query: Dict[str, Any]) -> None:
+        select_alias = self.__select_alias
+        hql_query["select"] = {
+            model_name: {
+                column_name: self.__translate_column(column_query, select_alias)
+                for column_name, column_query in model_query.items()
+            }
+            for model_name, model_query in select.items()
+        }
 
-        if target_transformation is None:
-            return hql_query
+    def __translate_column(self, column_query: Any, select_alias: str) -> Union[str, HqlSelect]:
+        if isinstance(column_query, str):
+            return column_query
 
-        # select
-        return_query: HqlQuery = {
-            # can the cast be removed? Maybe if we go to pydantic models instead of typedDicts
-            "select": cast(
-                Dict[str, Dict[str, HqlSelect]],
-                self._process_selects_for_models(hql_query, target_transformation),
+        hql_select: Dict[str, Any] = {}
+        if (label := column_query.get(self.__label_alias)) is not None:
+            hql_select["label"] = label
+        if (distinct := column_query.get(self.__distinct_alias)) is not None:
+            hql_select["distinct"] = distinct
+        if (value := column_query.get(self.__value_alias)) is not None:
+            hql_select["value"] = value
+        if inner_select := column_query.get(select_alias):
+            hql_select["select"] = (
+                inner_select
+                if isinstance(inner_select, str)
+                else {
+                    inner_key: self.__translate_column(inner_value, select_alias)
+                    for inner_key, inner_value in inner_select.items()
+                }
             )
-        }
-
-        # joins
-        if joins := hql_query.get(target_transformation.joins.alias):
-            prepped_joins = {}
-            if not isinstance(joins, Dict):
-                raise TypeError("joins needs to be a Dict[str, HqlJoin]")
-
-            for model_name, join_query in joins.items():
-                prepped_joins[model_name] = self._process_select_transformation(
-                    join_query,
-                    target_transformation.joins.select_node.select_alias,
-                    target_transformation,
-                )
-                prepped_joins[model_name]["where"] = self._process_filter_transformation(
-                    join_query[target_transformation.joins.where_node.alias],
-                    target_transformation,
-                )
-
-            return_query["joins"] = cast(Dict[str, HqlJoin], prepped_joins)
-
-        # limit
-        if limit := hql_query.get(target_transformation.limit.alias):
-            if not isinstance(limit, int):
-                raise TypeError("limit needs to be an int")
-
-            return_query["limit"] = limit
-
-        # offset
-        if offset := hql_query.get(target_transformation.offset.alias):
-            if not isinstance(offset, int):
-                raise TypeError("offset needs to be an int")
-
-            return_query["offset"] = offset
-
-        # distinct
-        if distinct := hql_query.get(target_transformation.distinct.alias):
-            if not (
-                isinstance(distinct, list)
-                and all(isinstance(item, str) for item in distinct)
-                or isinstance(distinct, bool)
-            ):
-                raise TypeError("distinct needs to be a List[str] or bool")
-
-            return_query["distinct"] = distinct
-
-        # group_by
-        if group_by := hql_query.get(target_transformation.group_by.alias):
-            if not (
-                isinstance(group_by, list)
-                and all(isinstance(group_by_item, str) for group_by_item in group_by)
-            ):
-                raise TypeError("group_by needs to be a List[str] or bool")
-
-            return_query["group_by"] = group_by
-
-        # debug
-        if debug := hql_query.get(target_transformation.debug.alias):
-            debug_value: Optional[Literal["html", "str"]] = None
-            if debug == target_transformation.debug.html_alias:
-                debug_value = "html"
-            if debug == target_transformation.debug.str_alias:
-                debug_value = "str"
-
-            if debug_value is not None:
-                return_query["debug"] = debug_value
-
-        # order_by
-        if order_by := hql_query.get(target_transformation.order_by.alias):
-            return_order_by = {}
-            for key, value in order_by.items():
-                sort_conversion_function = (
-                    target_transformation.order_by.sort_node.sort_item_conversion_function
-                )
-                if sort_conversion_function is not None:
-                    value = sort_conversion_function(value)
-
-                nulls_last = value.get(
-                    target_transformation.order_by.sort_node.nulls_last_alias,
-                    value.get("nulls_last", None),
-                )
-                order_direction = value.get(
-                    target_transformation.order_by.sort_node.dir_alias, value.get("dir")
-                )
-                if order_direction == target_transformation.order_by.sort_node.asc_alias:
-                    order_direction = "asc"
-                if order_direction == target_transformation.order_by.sort_node.desc_alias:
-                    order_direction = "desc"
-
-                updated_order_by_item = {
-                    "index": value.get(
-                        target_transformation.order_by.sort_node.index_alias, value.get("index")
-                    ),
-                    "dir": order_direction,
+        if (where := column_query.get(self.__where_alias)) is not None:
+            hql_select["where"] = where
+        if whens := column_query.get(self.__whens_alias):
+            when_alias = self.__when_alias
+            then_alias = self.__then_alias
+            hql_select["whens"] = [
+                {
+                    "when": self.__translate_filter(when.get(when_alias) or {}),
+                    "then": when.get(then_alias),
                 }
-                if nulls_last is not None:
-                    updated_order_by_item["nulls_last"] = nulls_last
-
-                return_order_by[key] = updated_order_by_item
-
-            if not isinstance(return_order_by, Dict):
-                raise TypeError("order_by needs to be a Dict[str, HqlSort]")
-
-            return_query["order_by"] = cast(Dict[str, HqlSort], return_order_by)
-
-        # where clause
-        return_query["where"] = self._process_filter_transformation(
-            hql_query.get(target_transformation.where.alias, {}), target_transformation
-        )
-        if len(return_query["where"].keys()) == 0:
-            return_query.pop("where")
-
-        # having clause
-        return_query["having"] = self._process_filter_transformation(
-            hql_query.get(target_transformation.having.alias, {}), target_transformation
-        )
-        if len(return_query["having"].keys()) == 0:
-            return_query.pop("having")
-
-        # subquery
-        if subquery := hql_query.get(target_transformation.subqueries.alias):
-            if not isinstance(subquery, dict):
-                raise TypeError("subquery needs to be a Dict[str, HqlQuery]")
+                for when in whens
+            ]
+        if else_ := column_query.get(self.__else_alias):
+            hql_select["else_"] = self.__translate_column(else_, select_alias)
+
+        return cast(HqlSelect, hql_select)
+
+    def __translate_joins(self, joins: Any, hql_query: Dict[str, Any]) -> None:
+        if not joins:
+            return
+        if not isinstance(joins, Dict):
+            raise TypeError("joins needs to be a Dict[str, HqlJoin]")
+
+        hql_joins = {}
+        for model_name, join_query in joins.items():
+            hql_join = self.__translate_column(join_query, self.__join_select_alias)
+            hql_join["where"] = self.__translate_filter(join_query[self.__join_where_alias])
+            hql_joins[model_name] = hql_join
+
+        hql_query["joins"] = hql_joins
+
+    def __translate_limit(self, limit: Any, hql_query: Dict[str, Any]) -> None:
+        if not limit:
+            return
+        if not isinstance(limit, int):
+            raise TypeError("limit needs to be an int")
+
+        hql_query["limit"] = limit
+
+    def __translate_offset(self, offset: Any, hql_query: Dict[str, Any]) -> None:
+        if not offset:
+            return
+        if not isinstance(offset, int):
+            raise TypeError("offset needs to be an int")
+
+        hql_query["offset"] = offset
+
+    def __translate_distinct(self, distinct: Any, hql_query: Dict[str, Any]) -> None:
+        if not distinct:
+            return
+        if not (
+            isinstance(distinct, list)
+            and all(isinstance(item, str) for item in distinct)
+            or isinstance(distinct, bool)
+        ):
+            raise TypeError("distinct needs to be a List[str] or bool")
+
+        hql_query["distinct"] = distinct
+
+    def __translate_group_by(self, group_by: Any, hql_query: Dict[str, Any]) -> None:
+        if not group_by:
+            return
+        if not (
+            isinstance(group_by, list)
+            and all(isinstance(group_by_item, str) for group_by_item in group_by)
+        ):
+            raise TypeError("group_by needs to be a List[str] or bool")
+
+        hql_query["group_by"] = group_by
+
+    def __translate_debug(self, debug: Any, hql_query: Dict[str, Any]) -> None:
+        if debug and isinstance(debug, str):
+            if debug_value := self.__debug_values.get(debug):
+                hql_query["debug"] = debug_value
+
+    def __translate_order_by(self, order_by: Any, hql_query: Dict[str, Any]) -> None:
+        if not order_by:
+            return
+
+        conversion_function = self.__sort_item_conversion_function
+        index_alias = self.__index_alias
+        nulls_last_alias = self.__nulls_last_alias
+        dir_alias = self.__dir_alias
+        directions = self.__directions
+        hql_order_by = {}
+        for key, value in order_by.items():
+            if conversion_function is not None:
+                value = conversion_function(value)
+
+            order_direction = value.get(dir_alias, value.get("dir"))
+            hql_sort = {
+                "index": value.get(index_alias, value.get("index")),
+                "dir": directions.get(order_direction, order_direction),
+            }
+            nulls_last = value.get(nulls_last_alias, value.get("nulls_last"))
+            if nulls_last is not None:
+                hql_sort["nulls_last"] = nulls_last
+
+            hql_order_by[key] = hql_sort
+
+        hql_query["order_by"] = hql_order_by
+
+    @staticmethod
+    def __translate_cursor(cursor: Any, hql_query: Dict[str, Any]) -> None:
+        # None requests the first page
+        if cursor is not None and not isinstance(cursor, str):
+            raise TypeError("cursor needs to be a str or None")
+
+        hql_query["cursor"] = cursor
+
+    @staticmethod
+    def __translate_total_count(total_count: Any, hql_query: Dict[str, Any]) -> None:
+        # True for an exact count, the number of rows to count up to or "estimate"
+        if not total_count:
+            return
+        if not isinstance(total_count, int) and total_count != "estimate":
+            raise TypeError('total_count needs to be a bool, an int or "estimate"')
+
+        hql_query["total_count"] = total_count
+
+    def __translate_where(self, where: Any, hql_query: Dict[str, Any]) -> None:
+        if where and (hql_where := self.__translate_filter(where)):
+            hql_query["where"] = hql_where
+
+    def __translate_having(self, having: Any, hql_query: Dict[str, Any]) -> None:
+        if having and (hql_having := self.__translate_filter(having)):
+            hql_query["having"] = hql_having
+
+    def __translate_filter(self, where: WhereClausT) -> WhereClausT:
+        operator_map = self.__operator_map
+        hql_where = {}
+        for key, value in where.items():
+            lower_cased_key = key.lower()
+            if lower_cased_key == self.__and_alias:
+                hql_where["and"] = value
+            elif lower_cased_key == self.__or_alias:
+                hql_where["or"] = [self.__translate_filter(or_dict) for or_dict in value]
+            else:
+                column_name, separator, operator = key.partition("__")
+                if separator and (conversion := operator_map.get(operator)) is not None:
+                    key = f"{column_name}__{conversion}"
+                hql_where[key] = value
+
+        return hql_where
+
+    def __translate_subqueries(self, subqueries: Any, hql_query: Dict[str, Any]) -> None:
+        if not subqueries:
+            return
+        if not isinstance(subqueries, dict):
+            raise TypeError("subquery needs to be a Dict[str, HqlQuery]")
+
+        translate = self.__compile_transformation(self.__subquery_transformation).translate
+        hql_query["subqueries"] = {
+            name: translate(subquery) for name, subquery in subqueries.items()
+        }
 
-            for key, value in subquery.items():
-                subquery[key] = self.transform_query(
-                    subquery[key], target_transformation.subqueries.query_node
-                )
+    def __union_translator(
+        self,
+        union_key: Literal["union", "union_all"],
+        union_node: HqlUnionNode,
+        transformation: QueryTransformation,
+    ) -> TranslateT:
+        name_alias = union_node.name_alias
+        left_alias = union_node.left_alias
+        right_alias = union_node.right_alias
+        cte_alias = union_node.cte_alias
+        cte_node = union_node.cte_node or transformation.cte
+        cte_name_alias = cte_node.name_alias
+        cte_recursive_alias = cte_node.recursive_alias
+        left_transformation = union_node.left_node or transformation
+        right_transformation = union_node.right_node or transformation
+
+        def translate_branch(
+            branch_transformation: QueryTransformation, branch: Dict[str, Any]
+        ) -> Dict[str, Any]:
+            hql_branch = self.__compile_transformation(branch_transformation).translate(branch)
+            # branches are referenced by their alias, it isn't part of the transformation
+            if "alias" in branch:
+                hql_branch["alias"] = branch["alias"]
+            return hql_branch
+
+        def translate_union(union: Any, hql_query: Dict[str, Any]) -> None:
+            if not union:
+                return
+            if not isinstance(union, dict):
+                raise TypeError(f"{union_key} needs to be a HqlUnion")
+
+            hql_union = {
+                "name": union[name_alias],
+                "left": translate_branch(left_transformation, union[left_alias]),
+                "right": translate_branch(right_transformation, union[right_alias]),
+            }
+            if cte := union.get(cte_alias):
+                hql_cte = {"name": cte[cte_name_alias]}
+                if cte_recursive_alias in cte:
+                    hql_cte["recursive"] = cte[cte_recursive_alias]
+                hql_union["cte"] = hql_cte
+
+            hql_query[union_key] = hql_union
+
+        return translate_union
+
+    @staticmethod
+    def __translate_resolver_args(resolver_args: Any, hql_query: Dict[str, Any]) -> None:
+        if not resolver_args:
+            return
+        if not isinstance(resolver_args, dict):
+            raise TypeError("resolver_args needs to be a Dict[str, Any]")
+
+        hql_query["resolver_args"] = resolver_args
 
-            return_query["subqueries"] = subquery
 
-        # cte
-        # @TODO: Add it
+class QueryTransformationHandler:
+    """
+    Rewrites queries written in a client's dialect into canonical HqlQueries.
 
-        # union
-        # @TODO: Add it
+    The top-level aliases of every transformation are indexed when the handler is created, a
+    query is matched by the transformation whose aliases cover all of its top-level keys. When
+    several transformations cover a query the one passed in first wins, a query without any keys
+    is matched by the first transformation.
 
-        # union_all
-        # @TODO: Add it
+    Queries that are already canonical are passed through as they are, without being matched or
+    copied. A handler without transformations treats every query as canonical, with
+    ``canonical_keys`` so is every query whose top-level keys are all canonical HqlQuery keys.
+    """
 
-        # resolver_args
-        if resolver_args := hql_query.get(target_transformation.resolver_args.alias):
-            if not isinstance(resolver_args, dict):
-                raise TypeError("resolver_args needs to be a Dict[str, Any]")
+    _transformations: Dict[TransformationName, QueryTransformation]
+    """Top-level aliases of each transformation"""
+    _transformation_aliases: Dict[TransformationName, FrozenSet[str]]
+    _ordered_transformations: List[QueryTransformation]
+    """Bitmask of the positions in _ordered_transformations having each alias"""
+    _alias_index: Dict[str, int]
+    _compiled_transformations: Dict[QueryTransformation, CompiledTransformation]
+    canonical_keys: bool
 
-            return_query["resolver_args"] = resolver_args
+    def __init__(
+        self,
+        transformations: Dict[TransformationName, QueryTransformation],
+        canonical_keys: bool = False,
+    ) -> None:
+        """
+        :param canonical_keys: pass queries whose top-level keys are all canonical through
+        untouched. Only safe when no client dialect uses the canonical top-level keys with
+        different aliases or operators below them.
+        """
+        self._transformations = transformations
+        self.canonical_keys = canonical_keys
+        self._transformation_aliases = {
+            name: self._get_top_level_aliases(transformation)
+            for name, transformation in transformations.items()
+        }
+        self._ordered_transformations = list(transformations.values())
+        self._alias_index = {}
+        for position, aliases in enumerate(self._transformation_aliases.values()):
+            for alias in aliases:
+                self._alias_index[alias] = self._alias_index.get(alias, 0) | 1 << position
+        self._compiled_transformations = {}
+        for transformation in self._ordered_transformations:
+            self._compile_transformation(transformation)
+
+    @staticmethod
+    def _get_top_level_aliases(transformation: QueryTransformation) -> FrozenSet[str]:
+        return frozenset(
+            node.alias for node in vars(transformation).values() if hasattr(node, "alias")
+        )
 
-        return return_query
+    def is_canonical(self, hql_query: Dict) -> bool:
+        if not self._ordered_transformations:
+            return True
+        return self.canonical_keys and CANONICAL_QUERY_KEYS.issuperset(hql_query.keys())
 
-    def _process_selects_for_models(
-        self, hql_query, target_transformation
-    ) -> Dict[str, Dict[str, HqlSelect]]:
-        select = hql_query[target_transformation.select.alias]
-        prepped_select: Dict[str, Dict[str, HqlSelect]] = {}
-        for model_name, model_query in select.items():
-            prepped_select[model_name] = {}
-            for column_name, column_query in model_query.items():
-                prepped_select[model_name][column_name] = self._process_select_transformation(
-                    column_query, target_transformation.select.alias, target_transformation
-                )
+    def transform_query(
+        self, hql_query: Dict, target_transformation: Union[QueryTransformation, None] = None
+    ) -> HqlQuery:
+        if target_transformation is None:
+            if self.is_canonical(hql_query):
+                return cast(HqlQuery, hql_query)
+            target_transformation = self.find_transformation(hql_query)
 
-        return prepped_select
+        if target_transformation is None:
+            return hql_query
 
-    def _process_select_transformation(
-        self, column_query, select_alias: str, target_transformation
-    ) -> Union[str, HqlSelect]:
-        if isinstance(column_query, str):
-            return column_query
+        return self._compile_transformation(target_transformation).translate(hql_query)
 
-        inner_select_node = column_query.get(select_alias)
-        prepped_inner_select_node = {}
-        if isinstance(inner_select_node, str):
-            prepped_inner_select_node = inner_select_node
-        elif inner_select_node is not None:
-            for inner_select_key, inner_select_value in inner_select_node.items():
-                prepped_inner_select_node[inner_select_key] = (
-                    self._process_select_transformation(
-                        inner_select_value, select_alias, target_transformation
-                    )
-                )
-
-        updated_column_query = {
-            "label": column_query.get(target_transformation.select.label_alias),
-            "distinct": column_query.get(target_transformation.select.distinct_alias),
-            "value": column_query.get(target_transformation.select.value_alias),
-            "select": prepped_inner_select_node,
-            "where": column_query.get(target_transformation.select.where_alias),
-        }
-        if when := column_query.get(target_transformation.select.whens_alias):
-            when_items = []
-            for when_item in when:
-                when_items.append(
-                    {
-                        "when": when_item.get(
-                            target_transformation.select.when_node.when_alias
-                        ),
-                        "then": when_item.get(
-                            target_transformation.select.when_node.then_alias
-                        ),
-                    }
-                )
-            updated_column_query["when"] = when_items
-        if else_ := column_query.get(target_transformation.select.else_alias):
-            updated_column_query["else_"] = self._process_select_transformation(
-                else_, select_alias, target_transformation
+    def _compile_transformation(
+        self, transformation: QueryTransformation
+    ) -> CompiledTransformation:
+        """Compiled transformations are kept for every transformation queries were sent to"""
+        compiled_transformation = self._compiled_transformations.get(transformation)
+        if compiled_transformation is None:
+            compiled_transformation = CompiledTransformation(
+                transformation, self._compile_transformation
             )
+            self._compiled_transformations[transformation] = compiled_transformation
 
-        keys_to_pop = []
-        if len(updated_column_query.get("select", {}).keys()) == 0:
-            keys_to_pop.append("select")
-
-        for key, value in updated_column_query.items():
-            if value is None:
-                keys_to_pop.append(key)
-
-        for key_to_pop in keys_to_pop:
-            updated_column_query.pop(key_to_pop)
-
-        return cast(HqlSelect, updated_column_query)
+        return compiled_transformation
 
     def find_transformation(self, hql_query: HqlQuery) -> Union[QueryTransformation, None]:
         """
@@ -579,57 +800,26 @@ class QueryTransformationHandler:
         :param hql_query: HqlQuery
         :return:
         """
-        if len(self._transformations) == 0:
-            return None
+        return self._find_transformation_by_aliases(hql_query.keys())
 
-        query_keys = hql_query.keys()
-        for transformation_name, transformation in self._transformations.items():
-            hits = 0
-            for field in list(transformation.__dict__.keys()):
-                query_field = getattr(transformation, field)
-                if hasattr(query_field, "alias"):
-                    query_field_alias = query_field.alias
-                    for key in query_keys:
-                        if key == query_field_alias:
-                            hits += 1
-
-            if hits == len(query_keys):
-                return transformation
-
-        return None
-
-    def _process_filter_transformation(
-        self, where: WhereClausT, query_transformation: QueryTransformation
-    ):
-        keys = where.keys()
-        if len(keys) == 0:
-            return {}
+    def _find_transformation_by_aliases(
+        self, keys: Iterable[str]
+    ) -> Union[QueryTransformation, None]:
+        """
+        Returns the first transformation having all of the keys as top-level aliases, the cost
+        only depends on the number of keys. Can be used by overrides of find_transformation
+        matching on something other than a query's keys.
+        """
+        if not self._ordered_transformations:
+            return None
 
-        return_dict = {}
+        # one bit per transformation, cleared for every key it doesn't have an alias for
+        candidates = (1 << len(self._ordered_transformations)) - 1
+        alias_index = self._alias_index
         for key in keys:
-            lower_cased_key = key.lower()
-            if lower_cased_key == query_transformation.filter_info.and_alias:
-                return_dict["and"] = where[key]
-
-            elif lower_cased_key == query_transformation.filter_info.or_alias:
-                value = where[key]
-                or_clause_input = []
-                for or_dict in value:
-                    or_clause_input.append(
-                        self._process_filter_transformation(or_dict, query_transformation)
-                    )
-                return_dict["or"] = or_clause_input
+            candidates &= alias_index.get(key, 0)
+            if not candidates:
+                return None
 
-            else:
-                original_key = key
-                operator_start_index = key.find("__")
-                user_operator_string = key[operator_start_index + 2 :]
-                conversion = query_transformation.filter_info.operator_map.get(
-                    user_operator_string, None
-                )
-                if conversion is not None:
-                    key = key.replace(f"__{user_operator_string}", f"__{conversion}")
-
-                return_dict[key] = where[original_key]
-
-        return return_dict
+        # the lowest set bit is the transformation passed in first
+        return self._ordered_transformations[(candidates & -candidates).bit_length() - 1]
@@ -3,7 +3,7 @@ import os
 import sys
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Type, TypeVar, Union, cast
+from typing import Dict, List, Optional, Set, Tuple, Type, TypeVar, Union, cast
 
 from marshmallow.fields import Boolean
 from marshmallow.fields import Date as MarshmallowDate
@@ -15,7 +15,7 @@ from marshmallow.fields import String
 from sqlalchemy.orm import DeclarativeBase
 
 from alchemancer.types.marshmallow import JsonBField, JsonField
-from alchemancer.types.query import ColumnTypesT
+from alchemancer.types.query import ColumnTypesT, ModelLimits
 from alchemancer.types.resolver import HqlResolver
 
 T = TypeVar("T")
@@ -43,6 +43,8 @@ class ReflectionHandler:
         JsonField: JsonBField,
     }
     resolver_name_type_cache: Dict[str, Type[HqlResolver]] = {}
+    model_limit_cache: Dict[str, ModelLimits] = {}
+    model_timeout_cache: Dict[str, float] = {}
 
     @staticmethod
     def init(
@@ -93,6 +95,55 @@ class ReflectionHandler:
                 for _, column in columns.items():
                     ReflectionHandler.model_field_cache[_class.__name__][column.name] = column
 
+    @staticmethod
+    def set_model_limits(
+        model_name: str, default_limit: Optional[int] = None, max_limit: Optional[int] = None
+    ):
+        """
+        Sets the row limits for queries selecting from or joining to a model, passing neither
+        limit removes them. When a query touches several models with limits the lowest ones
+        apply.
+
+        :param model_name: name of a model in model_class_cache.
+        :param default_limit: limit for queries that don't set one.
+        :param max_limit: upper bound for the limit queries set, also applies to queries without
+        a limit when there is no default_limit.
+        """
+        if model_name not in ReflectionHandler.model_class_cache:
+            raise ValueError(f"Model ({model_name}) is not loaded")
+        for limit in (default_limit, max_limit):
+            if limit is not None and limit < 1:
+                raise ValueError("limits need to be at least 1")
+        if default_limit is not None and max_limit is not None and default_limit > max_limit:
+            raise ValueError("default_limit can't be above max_limit")
+
+        if default_limit is None and max_limit is None:
+            ReflectionHandler.model_limit_cache.pop(model_name, None)
+        else:
+            ReflectionHandler.model_limit_cache[model_name] = ModelLimits(
+                default_limit, max_limit
+            )
+
+    @staticmethod
+    def set_model_timeout(model_name: str, statement_timeout: Optional[float] = None):
+        """
+        Sets how many seconds queries selecting from or joining to a model may run, None
+        removes the timeout. When a query touches several models with timeouts the lowest one
+        applies, it also caps the generator's and caller's timeouts.
+
+        :param model_name: name of a model in model_class_cache.
+        :param statement_timeout: seconds.
+        """
+        if model_name not in ReflectionHandler.model_class_cache:
+            raise ValueError(f"Model ({model_name}) is not loaded")
+        if statement_timeout is not None and statement_timeout <= 0:
+            raise ValueError("statement_timeout needs to be above 0")
+
+        if statement_timeout is None:
+            ReflectionHandler.model_timeout_cache.pop(model_name, None)
+        else:
+            ReflectionHandler.model_timeout_cache[model_name] = statement_timeout
+
     @staticmethod
     def _import_objects_from_modules_via_path(
         module_path: _absolute_module_path,
@@ -0,0 +1,224 @@
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from itertools import chain
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from alchemancer.lru_cache import CacheStats, LruCache
+from alchemancer.types.query import HqlResponse
+
+# Session.info key the tables written in the session's transaction are collected under
+_WRITTEN_TABLES_KEY = "alchemancer_written_tables"
+
+
+class ResultCacheBackend(metaclass=ABCMeta):
+    """
+    Storage for cached query responses.
+
+    Keys are hex digests of a query's shape and its parameters, every entry is stored with the
+    names of the tables it was read from so writes to a table can invalidate it. Backends decide
+    how long entries are kept and how many of them, responses handed out by a backend are shared
+    and must not be modified.
+
+    A query can start before a write and finish after the write invalidated its tables. Its
+    result is then already stale, backends keep generations per table to drop such writes: the
+    generator reads ``table_generations`` before executing a query and hands them to ``set``.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[HqlResponse]:
+        pass
+
+    def lookup(self, key: str) -> Tuple[Optional[HqlResponse], bool]:
+        """
+        Returns the cached response and whether it is stale, past its soft TTL. Stale responses
+        are still served while they are refreshed in the background. Backends without soft TTLs
+        only need to implement get.
+        """
+        return self.get(key), False
+
+    def table_generations(self, tables: FrozenSet[str]) -> Optional[Hashable]:
+        """
+        Snapshot of how often the tables were invalidated, changes whenever any of them is.
+        Backends without generations return None, they can't tell stale writes apart.
+        """
+        return None
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        response: HqlResponse,
+        tables: FrozenSet[str],
+        generations: Optional[Hashable] = None,
+    ) -> None:
+        """
+        Caches the response read from the tables. With ``generations``, taken from
+        table_generations before the response was read, the response isn't cached if any of
+        the tables was invalidated since.
+        """
+        pass
+
+    @abstractmethod
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """Drops every entry read from any of the tables, returns how many were dropped."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @property
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        pass
+
+
+class InMemoryResultCache(ResultCacheBackend):
+    """
+    Process local ResultCacheBackend, a size bounded LRU whose entries expire ``ttl`` seconds
+    after they were cached. With a ``soft_ttl`` entries older than that are stale, served while
+    they are refreshed until they expire. Keeps an index of the entries read from each table so
+    invalidating a table doesn't have to scan the whole cache.
+    """
+
+    soft_ttl: Optional[float]
+    __entries: LruCache[str, HqlResponse]
+    __stale_at: Dict[str, float]
+    __entry_tables: Dict[str, FrozenSet[str]]
+    __table_entries: Dict[str, Set[str]]
+    __table_generations: Dict[str, int]
+    # bumped by clear, which invalidates every table
+    __clear_generation: int
+    __lock: threading.RLock
+
+    def __init__(
+        self, maxsize: int = 1024, ttl: Optional[float] = 60, soft_ttl: Optional[float] = None
+    ) -> None:
+        """
+        :param maxsize: how many responses to keep.
+        :param ttl: seconds responses are served from the cache for, None keeps them until they
+        are evicted or invalidated.
+        :param soft_ttl: seconds after which responses are refreshed in the background, the
+        stale response is served in the meantime. Needs to be below the ttl.
+        """
+        if soft_ttl is not None and (soft_ttl <= 0 or (ttl is not None and soft_ttl >= ttl)):
+            raise ValueError("soft_ttl needs to be above 0 and below the ttl")
+
+        self.soft_ttl = soft_ttl
+        self.__entries = LruCache(maxsize, ttl, on_evict=self.__forget)
+        self.__stale_at = {}
+        self.__entry_tables = {}
+        self.__table_entries = {}
+        self.__table_generations = {}
+        self.__clear_generation = 0
+        # reentrant, evictions caused by set call back into __forget
+        self.__lock = threading.RLock()
+
+    def get(self, key: str) -> Optional[HqlResponse]:
+        return self.__entries.get(key)
+
+    def lookup(self, key: str) -> Tuple[Optional[HqlResponse], bool]:
+        response = self.__entries.get(key)
+        if response is None or self.soft_ttl is None:
+            return response, False
+
+        stale_at = self.__stale_at.get(key)
+        return response, stale_at is not None and stale_at <= time.monotonic()
+
+    def table_generations(self, tables: FrozenSet[str]) -> Tuple[int, ...]:
+        with self.__lock:
+            return self.__clear_generation, *[
+                self.__table_generations.get(table, 0) for table in sorted(tables)
+            ]
+
+    def set(
+        self,
+        key: str,
+        response: HqlResponse,
+        tables: FrozenSet[str],
+        generations: Optional[Hashable] = None,
+    ) -> None:
+        with self.__lock:
+            if generations is not None and generations != self.table_generations(tables):
+                return
+
+            self.__unindex(key)
+            if self.soft_ttl is not None:
+                self.__stale_at[key] = time.monotonic() + self.soft_ttl
+            self.__entry_tables[key] = tables
+            for table in tables:
+                self.__table_entries.setdefault(table, set()).add(key)
+            self.__entries[key] = response
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        with self.__lock:
+            tables = list(tables)
+            # in flight queries reading from the tables must not cache their results anymore
+            for table in tables:
+                self.__table_generations[table] = self.__table_generations.get(table, 0) + 1
+            keys = set(chain.from_iterable(self.__table_entries.get(t, ()) for t in tables))
+            for key in keys:
+                self.__unindex(key)
+                self.__entries.pop(key)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__clear_generation += 1
+            self.__entries.clear()
+            self.__stale_at.clear()
+            self.__entry_tables.clear()
+            self.__table_entries.clear()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.__entries.stats
+
+    def __forget(self, key: str) -> None:
+        with self.__lock:
+            # the key may have been cached again since it was evicted
+            if key not in self.__entries:
+                self.__unindex(key)
+
+    def __unindex(self, key: str) -> None:
+        # callers hold the lock
+        self.__stale_at.pop(key, None)
+        for table in self.__entry_tables.pop(key, ()):
+            keys = self.__table_entries[table]
+            keys.discard(key)
+            if not keys:
+                del self.__table_entries[table]
+
+
+def invalidate_on_commit(target: Any, result_cache: ResultCacheBackend) -> None:
+    """
+    Registers session event listeners invalidating the cached responses read from every table
+    an ORM flush wrote to once the transaction commits. ``target`` is anything session events
+    can be listened for on, a Session, a sessionmaker or the Session class itself.
+
+    Writes made with Core statements (``session.execute(update(...))``) are not seen by flushes,
+    call ``result_cache.invalidate_tables`` for those.
+    """
+
+    def collect_written_tables(session: Session, _flush_context) -> None:
+        written_tables = session.info.setdefault(_WRITTEN_TABLES_KEY, set())
+        for instance in chain(session.new, session.dirty, session.deleted):
+            # joined table inheritance writes to every table of the mapper
+            written_tables.update(table.name for table in inspect(instance).mapper.tables)
+
+    def invalidate_written_tables(session: Session) -> None:
+        written_tables = session.info.pop(_WRITTEN_TABLES_KEY, None)
+        if written_tables:
+            result_cache.invalidate_tables(written_tables)
+
+    def discard_written_tables(session: Session) -> None:
+        session.info.pop(_WRITTEN_TABLES_KEY, None)
+
+    event.listen(target, "after_flush", collect_written_tables)
+    event.listen(target, "after_commit", invalidate_written_tables)
+    event.listen(target, "after_rollback", discard_written_tables)
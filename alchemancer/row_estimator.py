@@ -0,0 +1,64 @@
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Connection, Select, Table, text
+from sqlalchemy.engine.interfaces import Dialect
+
+from alchemancer.explain import Explain
+from alchemancer.lru_cache import CacheStats, LruCache
+
+_RELTUPLES_QUERY = text(
+    "SELECT c.reltuples FROM pg_catalog.pg_class c "
+    "JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE c.relname = :table_name AND n.nspname = coalesce(:schema, current_schema())"
+)
+
+
+class RowEstimator:
+    """
+    Estimates row counts from PostgreSQL's planner statistics.
+
+    The size of a whole table is read from ``pg_class.reltuples`` and cached per table for
+    ``statistics_ttl`` seconds, the size of a filtered result is the planner's row estimate
+    from ``EXPLAIN``. Estimates are only as fresh as the table's last ``ANALYZE``.
+    """
+
+    dialect_names = frozenset(("postgresql",))
+    __table_rows: LruCache[Tuple[Optional[str], str], float]
+
+    def __init__(self, statistics_ttl: float = 300, statistics_cache_size: int = 1024) -> None:
+        """
+        :param statistics_ttl: seconds table statistics are cached for.
+        :param statistics_cache_size: how many tables statistics are cached for.
+        """
+        self.__table_rows = LruCache(statistics_cache_size, ttl=statistics_ttl)
+
+    @property
+    def statistics_cache_stats(self) -> CacheStats:
+        return self.__table_rows.stats
+
+    def supports(self, dialect: Dialect) -> bool:
+        return dialect.name in self.dialect_names
+
+    def table_rows(self, connection: Connection, table: Table) -> Optional[int]:
+        """The table's estimated row count, None if the table has never been analyzed"""
+        key = (table.schema, table.name)
+        reltuples = self.__table_rows.get(key)
+        if reltuples is None:
+            reltuples = connection.execute(
+                _RELTUPLES_QUERY, {"table_name": table.name, "schema": table.schema}
+            ).scalar()
+            # -1 for tables that have never been vacuumed or analyzed (0 before PostgreSQL 14)
+            reltuples = -1 if reltuples is None else reltuples
+            self.__table_rows[key] = reltuples
+
+        return round(reltuples) if reltuples > 0 else None
+
+    def statement_rows(
+        self,
+        connection: Connection,
+        statement: Select,
+        parameters: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """The planner's estimate of how many rows the statement returns"""
+        plan = connection.execute(Explain(statement), parameters).scalar_one()
+        return plan[0]["Plan"]["Plan Rows"]
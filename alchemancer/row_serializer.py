@@ -0,0 +1,137 @@
+import operator
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+import marshmallow
+from marshmallow.fields import Boolean
+from marshmallow.fields import Date as MarshmallowDate
+from marshmallow.fields import DateTime as MarshmallowDateTime
+from marshmallow.fields import Dict as MarshmallowDict
+from marshmallow.fields import Float, Integer, String
+
+from alchemancer.types.marshmallow import (
+    JsonBField,
+    JsonField,
+    serialize_json,
+    serialize_json_b,
+)
+
+ConverterT = Callable[[Any], Any]
+
+
+def _coerce_to(python_type: type) -> ConverterT:
+    # values of the native type, what drivers usually hand back, skip the constructor call
+    def coerce(value):
+        return value if type(value) is python_type else python_type(value)
+
+    return coerce
+
+
+def _coerce_to_bool(value: Any) -> bool:
+    # same rules as Boolean._serialize
+    if type(value) is bool:
+        return value
+    try:
+        if value in Boolean.truthy:
+            return True
+        if value in Boolean.falsy:
+            return False
+    except TypeError:
+        pass
+    return bool(value)
+
+
+# Converters producing the same output as the marshmallow field's _serialize for the values the
+# database drivers hand back, None means the value is passed through untouched. Only exact field
+# classes are matched, anything else (including subclasses) is serialized through its field.
+_FIELD_CONVERTERS: Dict[Type[marshmallow.fields.Field], Optional[ConverterT]] = {
+    Integer: _coerce_to(int),
+    Float: _coerce_to(float),
+    String: _coerce_to(str),
+    Boolean: _coerce_to_bool,
+    MarshmallowDict: dict,
+    MarshmallowDate: date.isoformat,
+    MarshmallowDateTime: operator.methodcaller("isoformat"),
+    JsonBField: serialize_json_b,
+    JsonField: serialize_json,
+}
+
+
+def _list_converter(inner: Optional[ConverterT]) -> ConverterT:
+    if inner is None:
+        return list
+
+    def convert_list(value):
+        return [None if each is None else inner(each) for each in value]
+
+    return convert_list
+
+
+class RowSerializer:
+    """
+    Serializes result rows straight into dicts without going through a marshmallow schema.
+
+    Converters are chosen once per result shape from the marshmallow field each column maps to,
+    the output matches ``Schema.dump`` for the built-in fields. Columns mapped to a field
+    without a converter fall back to calling that field for every value.
+    """
+
+    __names: Tuple[str, ...]
+    __converters: Tuple[Tuple[str, ConverterT], ...]
+    __field_converters: Tuple[Tuple[str, ConverterT], ...]
+
+    def __init__(
+        self,
+        columns: Sequence[Tuple[str, marshmallow.fields.Field, bool]],
+    ) -> None:
+        """
+        :param columns: (name, marshmallow field, is_many) for each selected column, in order.
+        """
+        converters = []
+        field_converters = []
+        for name, field, is_many in columns:
+            field_type = type(field)
+            if field_type in _FIELD_CONVERTERS:
+                converter = _FIELD_CONVERTERS[field_type]
+                if is_many:
+                    converters.append((name, _list_converter(converter)))
+                elif converter is not None:
+                    converters.append((name, converter))
+            elif is_many:
+                list_field = marshmallow.fields.List(field)
+                field_converters.append((name, self._field_converter(name, list_field)))
+            else:
+                field_converters.append((name, self._field_converter(name, field)))
+
+        self.__names = tuple(name for name, _, _ in columns)
+        self.__converters = tuple(converters)
+        self.__field_converters = tuple(field_converters)
+
+    def dump(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        names = self.__names
+        results = [dict(zip(names, row)) for row in rows]
+        converters = self.__converters
+        if converters:
+            for result in results:
+                for name, convert in converters:
+                    value = result[name]
+                    if value is not None:
+                        result[name] = convert(value)
+
+        # fields handle None themselves
+        field_converters = self.__field_converters
+        if field_converters:
+            for result in results:
+                for name, convert in field_converters:
+                    result[name] = convert(result[name])
+
+        return results
+
+    @staticmethod
+    def _field_converter(name: str, field: marshmallow.fields.Field) -> ConverterT:
+        serialize = field._serialize
+
+        def convert_with_field(value):
+            return serialize(value, name, None)
+
+        return convert_with_field
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+ResultT = TypeVar("ResultT")
+
+
+class _Call:
+    done: threading.Event
+    result: Any
+    error: Optional[BaseException]
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls made with the same key into a single execution, callers arriving
+    while a call for their key is in flight wait for it and share its result or exception.
+
+    ``do`` coalesces across threads, ``do_async`` across the tasks of an event loop. Async calls
+    run as their own task, cancelling the caller that started one doesn't cancel it for the
+    others waiting on it. ``saved_executions`` counts the calls that were served by another
+    call's execution.
+    """
+
+    __calls: Dict[Hashable, _Call]
+    __tasks: Dict[Tuple[Hashable, asyncio.AbstractEventLoop], "asyncio.Task[Any]"]
+    __lock: threading.Lock
+    __saved_executions: int
+
+    def __init__(self) -> None:
+        self.__calls = {}
+        self.__tasks = {}
+        self.__lock = threading.Lock()
+        self.__saved_executions = 0
+
+    @property
+    def saved_executions(self) -> int:
+        return self.__saved_executions
+
+    def do(self, key: Hashable, function: Callable[[], ResultT]) -> ResultT:
+        with self.__lock:
+            call = self.__calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.__calls[key] = _Call()
+            else:
+                self.__saved_executions += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def do_async(
+        self, key: Hashable, function: Callable[[], Awaitable[ResultT]]
+    ) -> ResultT:
+        # tasks are bound to their loop, the same key is coalesced per loop
+        task_key = (key, asyncio.get_running_loop())
+        task = self.__tasks.get(task_key)
+        if task is None:
+            task = self.__tasks[task_key] = asyncio.ensure_future(function())
+            task.add_done_callback(lambda _: self.__tasks.pop(task_key, None))
+        else:
+            with self.__lock:
+                self.__saved_executions += 1
+
+        return await asyncio.shield(task)
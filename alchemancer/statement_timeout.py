@@ -0,0 +1,113 @@
+import inspect
+import time
+from types import TracebackType
+from typing import Optional, Type
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.util import await_only
+
+from alchemancer.types.exceptions import QueryTimeoutError
+
+# SQLSTATE of statements cancelled by PostgreSQL's statement_timeout
+_QUERY_CANCELED = "57014"
+# SQLite VM instructions between checks of the deadline
+_SQLITE_PROGRESS_INTERVAL = 1000
+
+
+def _await_if_needed(value):
+    # async drivers (aiosqlite) return coroutines, they are awaited from inside run_sync
+    return await_only(value) if inspect.isawaitable(value) else value
+
+
+class StatementTimeout:
+    """
+    Context manager bounding how long the statements executed on a connection inside it may
+    run, statements running longer are cancelled and a QueryTimeoutError is raised.
+
+    On PostgreSQL this is ``statement_timeout``, set for the current transaction only, on
+    SQLite a progress handler interrupting statements past the deadline that is removed again
+    on exit. The connection is left as it was, other dialects are not bounded.
+    """
+
+    dialect_names = frozenset(("postgresql", "sqlite"))
+    connection: Connection
+    timeout: float
+    restore: bool
+    __deadline: Optional[float]
+    __previous_timeout: Optional[str]
+
+    def __init__(self, connection: Connection, timeout: float, restore: bool = False) -> None:
+        """
+        :param timeout: seconds each statement may run on PostgreSQL, seconds all statements
+        inside the context manager may run together on SQLite.
+        :param restore: restore the statement_timeout in effect before entering on exit. Only
+        needed when the transaction continues with other statements afterwards, the timeout
+        ends with the transaction otherwise.
+        """
+        if timeout <= 0:
+            raise ValueError("timeout needs to be above 0")
+
+        self.connection = connection
+        self.timeout = timeout
+        self.restore = restore
+        self.__deadline = None
+        self.__previous_timeout = None
+
+    def __enter__(self) -> "StatementTimeout":
+        dialect_name = self.connection.dialect.name
+        if dialect_name == "postgresql":
+            # the previous value is read before it is replaced, in the same round trip
+            self.__previous_timeout = self.connection.execute(
+                text(
+                    "SELECT current_setting('statement_timeout'), "
+                    "set_config('statement_timeout', :timeout, true)"
+                ),
+                {"timeout": str(max(1, round(self.timeout * 1000)))},
+            ).scalar_one()
+        elif dialect_name == "sqlite":
+            self.__deadline = time.monotonic() + self.timeout
+            _await_if_needed(
+                self.connection.connection.driver_connection.set_progress_handler(
+                    self.__interrupt_past_deadline, _SQLITE_PROGRESS_INTERVAL
+                )
+            )
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        dialect_name = self.connection.dialect.name
+        if dialect_name == "sqlite":
+            _await_if_needed(
+                self.connection.connection.driver_connection.set_progress_handler(None, 0)
+            )
+        elif dialect_name == "postgresql" and exc_value is None and self.restore:
+            self.connection.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": self.__previous_timeout},
+            )
+
+        if exc_value is not None and self.is_timeout(exc_value):
+            raise QueryTimeoutError(self.timeout) from exc_value
+
+    def is_timeout(self, error: BaseException) -> bool:
+        """Whether the error was raised for a statement this timeout cancelled"""
+        if not isinstance(error, DBAPIError):
+            return False
+
+        if self.connection.dialect.name == "sqlite":
+            return self.__deadline is not None and time.monotonic() >= self.__deadline
+
+        # psycopg2 has pgcode, asyncpg sqlstate
+        original = error.orig
+        return (
+            getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)
+        ) == _QUERY_CANCELED
+
+    def __interrupt_past_deadline(self) -> int:
+        return 1 if time.monotonic() >= self.__deadline else 0
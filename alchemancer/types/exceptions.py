@@ -0,0 +1,62 @@
+from typing import Any, Dict, List
+
+from alchemancer.explain import QueryPlan
+
+
+class QueryComplexityError(Exception):
+    """Raised before any SQL is built for queries scoring over their complexity budget"""
+
+    score: int
+    budget: int
+    """How often each scored feature appears in the query, see QueryComplexityScorer"""
+    counts: Dict[str, int]
+
+    def __init__(self, score: int, budget: int, counts: Dict[str, int]):
+        super().__init__(f"Query complexity ({score}) is over the budget ({budget})")
+        self.score = score
+        self.budget = budget
+        self.counts = counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "error": "query_too_complex",
+            "score": self.score,
+            "budget": self.budget,
+            "counts": {**self.counts},
+        }
+
+
+class QueryCostError(Exception):
+    """Raised before execution for queries whose plan exceeds a CostGuard threshold"""
+
+    plan: QueryPlan
+    """Names of the CostGuard thresholds the plan exceeds"""
+    exceeded: List[str]
+
+    def __init__(self, plan: QueryPlan, exceeded: List[str]):
+        super().__init__(f"Query plan exceeds {', '.join(exceeded)} ({plan})")
+        self.plan = plan
+        self.exceeded = exceeded
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "error": "query_too_expensive",
+            "exceeded": [*self.exceeded],
+            "total_cost": self.plan.total_cost,
+            "rows": self.plan.rows,
+            "full_scans": [*self.plan.full_scans],
+        }
+
+
+class QueryTimeoutError(Exception):
+    """Raised for queries cancelled for running longer than their statement timeout"""
+
+    """Seconds the query was allowed to run"""
+    timeout: float
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Query was cancelled after running for more than {timeout}s")
+        self.timeout = timeout
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": "query_timeout", "timeout": self.timeout}
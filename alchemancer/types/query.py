@@ -10,6 +10,7 @@ else:
 from typing import (
     Any,
     Dict,
+    Hashable,
     List,
     Literal,
     Optional,
@@ -18,11 +19,14 @@ from typing import (
 )
 
 from sqlalchemy import Column, Connection, CursorResult, Executable, Select
+from sqlalchemy.engine.default import CACHE_HIT, NO_CACHE_KEY
 from sqlalchemy.engine.interfaces import (
     CoreExecuteOptionsParameter,
+    Dialect,
     _CoreAnyExecuteParams,
 )
 from sqlalchemy.orm import InstrumentedAttribute, RelationshipProperty
+from sqlalchemy.sql.compiler import Compiled
 from sqlalchemy.sql.elements import ColumnElement, KeyedColumnElement
 
 ColumnTypesT = Union[
@@ -138,24 +142,112 @@ class HqlQuery(TypedDict):
     union_all: NotRequired[HqlUnion]
     resolver_args: NotRequired[Dict[str, PrimitiveT]]
     debug: NotRequired[Literal["html", "str"]]
+    # keyset pagination, driven by order_by and limit. None for the first page, the cursor of
+    # the previous page's response after that.
+    cursor: NotRequired[Optional[str]]
+    # returns the total row count ignoring limit / offset. True counts every row, an int counts
+    # up to that many rows, "estimate" uses planner statistics where the dialect has them
+    total_count: NotRequired[Union[bool, int, Literal["estimate"]]]
 
 
 class HqlQueryUnion(HqlQuery):
     alias: NotRequired[str]
 
 
+# Response Models
+class HqlResponse(TypedDict):
+    data: List[Dict[str, Any]]
+    # only set for keyset paginated queries, None on the last page
+    cursor: NotRequired[Optional[str]]
+    # only set for queries with a total_count, total_capped only for capped counts
+    total: NotRequired[int]
+    total_is_estimate: NotRequired[bool]
+    total_capped: NotRequired[bool]
+    # only set for queries on models with limits, whether rows past the limit were cut off
+    truncated: NotRequired[bool]
+
+
+# Configuration Models
+class ModelLimits:
+    """Row limits for queries selecting from or joining to a model"""
+
+    """Applied when a query doesn't set a limit"""
+    default_limit: Optional[int]
+    """Queries are never limited to more rows than this"""
+    max_limit: Optional[int]
+
+    def __init__(self, default_limit: Optional[int] = None, max_limit: Optional[int] = None):
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+
 # Generator Models
+class QueryTemplate:
+    """A Select built for a query shape, with bind parameters in place of its literals"""
+
+    query: Select
+    shape_hash: str
+    """Whether SQLAlchemy can produce a cache key for the statement and cache its compilation"""
+    cacheable: bool
+    compiled_cache_hits: int
+    compiled_cache_misses: int
+    __compiled: Dict[Dialect, Compiled]
+
+    def __init__(self, query: Select, shape_hash: str):
+        self.query = query
+        self.shape_hash = shape_hash
+        self.cacheable = query._generate_cache_key() is not None
+        self.compiled_cache_hits = 0
+        self.compiled_cache_misses = 0
+        self.__compiled = {}
+
+    def compiled_for(self, dialect: Dialect) -> Compiled:
+        compiled = self.__compiled.get(dialect)
+        if compiled is None:
+            compiled = self.query.compile(dialect=dialect)
+            self.__compiled[dialect] = compiled
+            self.compiled_cache_misses += 1
+        else:
+            self.compiled_cache_hits += 1
+
+        return compiled
+
+    def record_execution(self, result: CursorResult) -> None:
+        """Records whether SQLAlchemy's own compiled cache was hit when executing the Select"""
+        cache_hit = result.context.cache_hit
+        if cache_hit is NO_CACHE_KEY:
+            self.cacheable = False
+        if cache_hit is CACHE_HIT:
+            self.compiled_cache_hits += 1
+        else:
+            self.compiled_cache_misses += 1
+
+
 class GeneratedQuery:
     query: Select
     limit: Optional[int]
     offset: Optional[int]
+    """Values for the query's bind parameters, passed along when executing the query"""
+    parameters: Optional[Dict[str, Any]]
+    template: Optional[QueryTemplate]
+    """The query's shape (QueryFingerprint.key), None for queries built without one"""
+    shape_key: Optional[Hashable]
 
     def __init__(
-        self, query: Select, limit: Optional[int] = None, offset: Optional[int] = None
+        self,
+        query: Select,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        template: Optional[QueryTemplate] = None,
+        shape_key: Optional[Hashable] = None,
     ):
         self.query = query
         self.limit = limit
         self.offset = offset
+        self.parameters = parameters
+        self.template = template
+        self.shape_key = shape_key
 
 
 class NoOpConnection(Connection):
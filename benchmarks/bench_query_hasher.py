@@ -0,0 +1,84 @@
+"""
+Benchmarks QueryHasher.fingerprint against a typical ~30 key dashboard query.
+
+The median is compared to json.dumps(sort_keys=True) of the same query, a C implemented
+reference that runs at the machine's speed, so the budget holds on slower hardware too. Run
+with ``python -m benchmarks.bench_query_hasher``, exits non-zero when the ratio is over budget.
+"""
+
+import json
+import statistics
+import sys
+import timeit
+
+from alchemancer.query_hasher import QueryHasher
+from alchemancer.reflection_handler import ReflectionHandler
+from tests.fixtures.models.generic.user import Address, User
+
+# fingerprint may take at most this many times as long as the json.dumps reference
+BUDGET_RATIO = 2.0
+
+typical_query = {
+    "select": {
+        "User": {
+            "id": {},
+            "name": {},
+            "coalesce(User.account_balance, 1000.0)": {"label": "account_balance"},
+            "status": {
+                "whens": [{"when": {"User.account_balance__GT": 100}, "then": "rich"}],
+                "else_": "poor",
+            },
+        }
+    },
+    "joins": {
+        "Address": {
+            "select": {"id": {}},
+            "where": {"Address.user_id__EQ": "User.id"},
+        }
+    },
+    "where": {
+        "or": [
+            {"User.id__EQ": 1},
+            {"User.id__EQ": 2},
+        ],
+        "User.id__NE": 5,
+    },
+    "limit": 50,
+    "offset": 100,
+    "order_by": {"User.id": {"index": 0, "dir": "desc"}},
+    "group_by": ["User.id", "Address.id"],
+}
+
+
+def _count_keys(value) -> int:
+    if isinstance(value, dict):
+        return len(value) + sum(_count_keys(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_count_keys(item) for item in value)
+    return 0
+
+
+def main() -> int:
+    ReflectionHandler.model_field_cache["User"] = {
+        column.name: column for column in User.__table__.columns
+    }
+    ReflectionHandler.model_field_cache["Address"] = {
+        column.name: column for column in Address.__table__.columns
+    }
+    hasher = QueryHasher()
+    runs = timeit.repeat(lambda: hasher.fingerprint(typical_query), number=10_000, repeat=7)
+    median_us = statistics.median(runs) / 10_000 * 1_000_000
+    reference_runs = timeit.repeat(
+        lambda: json.dumps(typical_query, sort_keys=True), number=10_000, repeat=7
+    )
+    reference_us = statistics.median(reference_runs) / 10_000 * 1_000_000
+    print(f"keys in query:   {_count_keys(typical_query)}")
+    ratio = median_us / reference_us
+    print(f"median per call: {median_us:.2f}us")
+    print(f"json.dumps(sort_keys=True) of the same query: {reference_us:.2f}us")
+    print(f"ratio to json.dumps: {ratio:.2f}x (budget {BUDGET_RATIO}x)")
+    return 0 if ratio <= BUDGET_RATIO else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
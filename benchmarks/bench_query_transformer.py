@@ -0,0 +1,230 @@
+"""
+Benchmarks QueryTransformationHandler.transform_query on a client dialect payload nesting
+subqueries and unions three levels deep, 40 queries in total. Also times canonical queries
+being passed through by a handler with canonical_keys instead of copied by a transformation
+using the canonical aliases.
+
+``--baseline <git ref>`` also compares against the handler as it is at that ref, e.g. the
+commit before the single pass translators, checked out into a temporary git worktree. Both
+are run on the union payload and on a payload nesting three subqueries per level three levels
+deep (40 queries). Handlers without union support drop the unions, so times are compared per
+query in the transformed payload. Older handlers modify subqueries in place, so both handlers
+are handed deep copies of the payload made before the timing starts.
+
+Run with ``python -m benchmarks.bench_query_transformer [--baseline <git ref>]``.
+"""
+
+import argparse
+import copy
+import importlib.util
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+import types
+from pathlib import Path
+from typing import Callable, Optional
+
+from alchemancer import query_transformation_handler
+
+DEPTH = 3
+QUERY_COUNT = sum(3**level for level in range(DEPTH + 1))
+REPO_ROOT = Path(__file__).parent.parent
+NUMBER, REPEAT = 200, 7
+
+
+def _transformation(module: types.ModuleType):
+    return module.QueryTransformation(
+        module.SelectNode(
+            module.WhenThenNode("if", "then"),
+            alias="fields",
+            label_alias="as",
+            whens_alias="cases",
+            else_alias="otherwise",
+            select_alias="fields",
+            where_alias="filter",
+        ),
+        module.JoinNode(alias="include", where_node=module.WhereClauseNode(alias="on")),
+        module.WhereClauseNode(alias="filter"),
+        module.HavingClauseNode(alias="filter_groups"),
+        module.FilterNode(
+            or_alias="any",
+            and_alias="all",
+            operator_map={"is": "EQ", "is_not": "NE", "above": "GT", "below": "LT"},
+        ),
+        module.LimitNode(alias="take"),
+        module.OffsetNode(alias="skip"),
+        module.OrderByNode(
+            module.SortItemNode(index_alias="position", dir_alias="direction", asc_alias="up"),
+            alias="sort",
+        ),
+        module.GroupByNode(alias="group"),
+        module.DistinctNode(alias="unique"),
+        module.SubqueryNode(alias="nested"),
+        module.HqlCTENode(name_alias="label"),
+        module.HqlUnionNode(alias="merge", name_alias="label"),
+        module.HqlUnionNode(alias="merge_all", name_alias="label"),
+        module.ResolverArgsNode(alias="args"),
+        module.DebugNode(alias="explain"),
+    )
+
+
+def _canonical_transformation(module: types.ModuleType):
+    return module.QueryTransformation(
+        module.SelectNode(module.WhenThenNode()),
+        module.JoinNode(),
+        module.WhereClauseNode(),
+        module.HavingClauseNode(),
+        module.FilterNode(),
+        module.LimitNode(),
+        module.OffsetNode(),
+        module.OrderByNode(module.SortItemNode()),
+        module.GroupByNode(),
+        module.DistinctNode(),
+        module.SubqueryNode(),
+        module.HqlCTENode(),
+        module.HqlUnionNode(),
+        module.HqlUnionNode(alias="union_all"),
+        module.ResolverArgsNode(),
+        module.DebugNode(),
+    )
+
+
+def _client_query(depth: int) -> dict:
+    query = {
+        "fields": {
+            "User": {
+                "id": {},
+                "name": {"as": "user_name"},
+                "status": {
+                    "cases": [{"if": {"User.account_balance__above": 100}, "then": "rich"}],
+                    "otherwise": "poor",
+                },
+            }
+        },
+        "include": {
+            "Address": {"fields": {"id": {}}, "on": {"Address.user_id__is": "User.id"}}
+        },
+        "filter": {
+            "any": [{"User.id__is": index} for index in range(10)],
+            "User.name__is_not": "nobody",
+            "User.account_balance__below": 1000,
+        },
+        "sort": {"User.id": {"position": 0, "direction": "up"}},
+        "take": 50,
+        "skip": 100,
+        "group": ["User.id"],
+    }
+    if depth > 0:
+        query["nested"] = {"inner": _client_query(depth - 1)}
+        query["merge_all"] = {
+            "label": f"union_{depth}",
+            "left": {**_client_query(depth - 1), "alias": f"left_{depth}"},
+            "right": {**_client_query(depth - 1), "alias": f"right_{depth}"},
+        }
+    return query
+
+
+def _client_subquery_query(depth: int) -> dict:
+    query = _client_query(0)
+    if depth > 0:
+        query["nested"] = {
+            name: _client_subquery_query(depth - 1) for name in ("inner", "left", "right")
+        }
+    return query
+
+
+def _load_handler_module(ref: str, worktree: Path) -> types.ModuleType:
+    """Imports alchemancer.query_transformation_handler from a worktree checked out at ref"""
+    subprocess.run(
+        ["git", "worktree", "add", "--detach", str(worktree), ref],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        check=True,
+    )
+    spec = importlib.util.spec_from_file_location(
+        f"query_transformation_handler_{ref}",
+        worktree / "alchemancer" / "query_transformation_handler.py",
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _median_us(function: Callable[[], object]) -> float:
+    runs = timeit.repeat(function, number=NUMBER, repeat=REPEAT)
+    return statistics.median(runs) / NUMBER * 1_000_000
+
+
+def _count_queries(hql_query: dict) -> int:
+    """The query, its subqueries and its union branches, recursively"""
+    count = 1
+    for subquery in (hql_query.get("subqueries") or {}).values():
+        count += _count_queries(subquery)
+    for union_key in ("union", "union_all"):
+        if union := hql_query.get(union_key):
+            count += _count_queries(union["left"]) + _count_queries(union["right"])
+    return count
+
+
+def _compare(name: str, module: types.ModuleType, query: dict) -> float:
+    """Median time per query in the transformed payload"""
+    handler = module.QueryTransformationHandler({"client": _transformation(module)})
+    query_count = _count_queries(handler.transform_query(copy.deepcopy(query)))
+    copies = iter([copy.deepcopy(query) for _ in range(NUMBER * REPEAT)])
+    median_us = _median_us(lambda: handler.transform_query(next(copies)))
+    print(
+        f"  {name}: {median_us:.1f}us per payload, {query_count} queries transformed, "
+        f"{median_us / query_count:.1f}us per query"
+    )
+    return median_us / query_count
+
+
+def _compare_with_baseline(ref: str) -> None:
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        worktree = Path(temporary_directory) / "baseline"
+        try:
+            baseline_module = _load_handler_module(ref, worktree)
+            for payload_name, query in (
+                ("unions and subqueries", _client_query(DEPTH)),
+                ("subqueries only", _client_subquery_query(DEPTH)),
+            ):
+                print(f"{payload_name} ({QUERY_COUNT} queries):")
+                baseline_us = _compare(ref, baseline_module, query)
+                current_us = _compare("current", query_transformation_handler, query)
+                print(f"  speedup per query over {ref}: {baseline_us / current_us:.1f}x")
+        finally:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", str(worktree)],
+                cwd=REPO_ROOT,
+                capture_output=True,
+            )
+
+
+def main(baseline: Optional[str] = None) -> int:
+    module = query_transformation_handler
+    handler = module.QueryTransformationHandler({"client": _transformation(module)})
+    query = _client_query(DEPTH)
+    median_us = _median_us(lambda: handler.transform_query(query))
+    print(f"median per payload: {median_us:.1f}us")
+    print(f"median per query:   {median_us / QUERY_COUNT:.1f}us")
+
+    canonical_query = handler.transform_query(query)
+    canonical_transformations = {"canonical": _canonical_transformation(module)}
+    for canonical_keys in (False, True):
+        canonical_handler = module.QueryTransformationHandler(
+            canonical_transformations, canonical_keys
+        )
+        median_us = _median_us(lambda: canonical_handler.transform_query(canonical_query))
+        print(f"canonical payload, canonical_keys={canonical_keys}: {median_us:.1f}us")
+
+    if baseline is not None:
+        _compare_with_baseline(baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", help="git ref of the handler to compare against")
+    sys.exit(main(parser.parse_args().baseline))
@@ -0,0 +1,88 @@
+"""
+Benchmarks result serialization of a 100k row result, marshmallow schema vs RowSerializer.
+
+Run with ``python -m benchmarks.bench_row_serializer``. Rows are fetched once from an in memory
+sqlite database, only serialization is timed.
+"""
+
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.reflection_handler import ReflectionHandler
+from tests.fixtures.models.generic.base_model import BaseModel
+from tests.fixtures.models.generic.user import User
+
+ROW_COUNT = 100_000
+
+query = {
+    "select": {
+        "User": {
+            "id": {},
+            "date_create": {},
+            "name": {},
+            "fullname": {},
+            "account_balance": {},
+            "account_details": {},
+        }
+    }
+}
+
+
+def main() -> int:
+    models_path = Path.joinpath(Path(__file__).parent.parent, "tests", "fixtures", "models")
+    ReflectionHandler.init(
+        [("tests.fixtures.models.generic", Path.joinpath(models_path, "generic"))]
+    )
+    engine = create_engine("sqlite:///:memory:")
+    BaseModel.metadata.create_all(engine, tables=[User.__table__])
+    started_at = datetime(2024, 1, 1)
+    with engine.connect() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "id": index,
+                    "date_create": started_at + timedelta(minutes=index),
+                    "name": f"user {index}",
+                    "fullname": None if index % 3 == 0 else f"User Number {index}",
+                    "account_balance": index / 7,
+                    "account_details": {"test": "123", "nested": {"inner_test": index}},
+                }
+                for index in range(ROW_COUNT)
+            ],
+        )
+        connection.commit()
+
+    results = {}
+    outputs = {}
+    for fast_serialization in (False, True):
+        query_generator = QueryGenerator(engine, fast_serialization=fast_serialization)
+        with engine.connect() as connection:
+            with Session(bind=connection) as _:
+                generated_query = query_generator._generate_query(query)
+                rows = query_generator._execute_generated_query(
+                    connection, generated_query
+                ).fetchall()
+
+        serializer = query_generator._get_result_serializer(
+            generated_query.query.selected_columns
+        )
+        outputs[fast_serialization] = serializer.dump(rows)
+        runs = timeit.repeat(lambda: serializer.dump(rows), number=1, repeat=5)
+        results[fast_serialization] = ROW_COUNT / statistics.median(runs)
+
+    print(f"marshmallow:   {results[False]:>12,.0f} rows/s")
+    print(f"RowSerializer: {results[True]:>12,.0f} rows/s")
+    print(f"speedup:       {results[True] / results[False]:>12.1f}x")
+    return 0 if outputs[False] == outputs[True] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,17 +36,17 @@ test_query = {
     },
     "expected_sql": """
 SELECT DISTINCT user_account.id,
-                case when :param_1 then :param_2
-                     when :param_3 then :param_4
-                     when :param_5 then user_account.id
+                case when (user_account.id = :id_1) then :param_1
+                     when (user_account.id = :id_2) then :param_2
+                     when (user_account.id = :id_3) then user_account.id
                      else user_account.id end as email
 FROM   user_account
-WHERE  (user_account.id = :id_1
-    or user_account.id = :id_2
-    or user_account.id = :id_3
-    or user_account.id = :id_4)
-   and user_account.id != :id_5
+WHERE  (user_account.id = :id_4
+    or user_account.id = :id_5
+    or user_account.id = :id_6
+    or user_account.id = :id_7)
+   and user_account.id != :id_8
 GROUP BY user_account.id
-ORDER BY user_account.id desc limit :param_6 offset :param_7
+ORDER BY user_account.id desc limit :param_3 offset :param_4
     """,
 }
@@ -0,0 +1,21 @@
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.types import TypeDecorator
+
+from tests.fixtures.models.generic.base_model import BaseModel
+
+
+class LowerCaseString(TypeDecorator):
+    """Stores and compares strings lower cased"""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value.lower() if value is not None else value
+
+
+class Person(BaseModel):
+    __tablename__ = "person"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    email: Mapped[str] = mapped_column(LowerCaseString(100))
@@ -1,3 +1,4 @@
+import pytest
 from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.sql.functions import array_agg, coalesce, func
 
@@ -125,3 +126,39 @@ def test_ast_function_with_function_params_zoo_giga():
             },
         )
     )
+
+
+def test_ast_expression_is_compiled_once():
+    ast_handler = AstHandler()
+    first = ast_handler.convert_ast_to_sqlalchemy_column(
+        "coalesce(1, 0)", {"coalesce": coalesce}
+    )
+    second = ast_handler.convert_ast_to_sqlalchemy_column(
+        "coalesce(1, 0)", {"coalesce": func.max}
+    )
+
+    # names are resolved against each call's context
+    assert str(first) == str(coalesce(1, 0))
+    assert str(second) == str(func.max(1, 0))
+    stats = ast_handler.expression_cache_stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+
+def test_ast_expression_names_resolve_per_model_key():
+    evaluator = AstHandler().compile_expression("coalesce(account_balance, 0)")
+    assert str(evaluator({"coalesce": coalesce}, "User")) == str(
+        coalesce(User.account_balance, 0)
+    )
+    with pytest.raises(Exception):
+        evaluator({"coalesce": coalesce}, None)
+
+
+def test_ast_unsupported_expression_fails_when_compiled():
+    with pytest.raises(NotImplementedError):
+        AstHandler().compile_expression("User.id + 1")
+
+
+def test_ast_expression_cache_can_be_disabled():
+    ast_handler = AstHandler(expression_cache_size=0)
+    assert ast_handler.convert_ast_to_sqlalchemy_column("User.id", {}) == User.id
+    assert ast_handler.expression_cache_stats is None
@@ -0,0 +1,209 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from alchemancer.async_query_generator import AsyncQueryGenerator
+from alchemancer.cost_guard import CostGuard
+from alchemancer.result_cache import InMemoryResultCache
+from alchemancer.statement_timeout import StatementTimeout
+from alchemancer.types.exceptions import QueryTimeoutError
+from tests.fixtures.models.generic.base_model import BaseModel
+from tests.fixtures.models.generic.user import User
+
+query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.id__GTE": 2},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+}
+
+
+def _run(test):
+    async def run_with_engine():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        try:
+            async with engine.begin() as connection:
+                await connection.run_sync(BaseModel.metadata.create_all)
+                await connection.execute(
+                    insert(User).values(
+                        [{"id": index, "name": f"Async{index}"} for index in range(1, 6)]
+                    )
+                )
+            return await test(engine)
+        finally:
+            # aiosqlite connections keep a worker thread alive until they are closed
+            await engine.dispose()
+
+    return asyncio.run(run_with_engine())
+
+
+def test_async_query():
+    async def test(engine):
+        return await AsyncQueryGenerator(engine).return_from_hql_query(query)
+
+    assert _run(test) == [{"id": index, "name": f"Async{index}"} for index in range(2, 6)]
+
+
+def test_async_stream():
+    async def test(engine):
+        query_generator = AsyncQueryGenerator(engine)
+        with pytest.raises(ValueError):
+            query_generator.stream_from_hql_query(query, chunk_size=0)
+
+        stream = query_generator.stream_from_hql_query(query, chunk_size=3)
+        return [chunk async for chunk in stream]
+
+    assert _run(test) == [
+        [{"id": 2, "name": "Async2"}, {"id": 3, "name": "Async3"}, {"id": 4, "name": "Async4"}],
+        [{"id": 5, "name": "Async5"}],
+    ]
+
+
+def test_async_resolver():
+    async def test(engine):
+        return await AsyncQueryGenerator(engine).return_from_hql_query(
+            {
+                "select": {
+                    "RecursiveRolesResolver()": {
+                        "role_id": {},
+                        "role_name": {},
+                        "role_parent_id": {},
+                    }
+                },
+                "resolver_args": {"role_id": 5},
+            }
+        )
+
+    assert sorted(_run(test), key=lambda row: row["role_id"]) == [
+        {"role_id": 5, "role_name": "5", "role_parent_id": None},
+        {"role_id": 6, "role_name": "6", "role_parent_id": 5},
+        {"role_id": 7, "role_name": "7", "role_parent_id": 5},
+        {"role_id": 8, "role_name": "8", "role_parent_id": 5},
+    ]
+
+
+def test_async_batch():
+    async def test(engine):
+        return await AsyncQueryGenerator(engine).return_from_hql_queries(
+            {"first": {**query, "limit": 1}, "broken": {"select": {"NotAModel": {"id": {}}}}},
+            return_errors=True,
+        )
+
+    results = _run(test)
+    assert results["first"] == [{"id": 2, "name": "Async2"}]
+    assert isinstance(results["broken"], Exception)
+
+
+def test_async_concurrent_batch():
+    async def test(engine):
+        return await AsyncQueryGenerator(engine).return_from_hql_queries(
+            {index: {**query, "offset": index} for index in range(3)}, concurrency=2
+        )
+
+    results = _run(test)
+    assert list(results.keys()) == [0, 1, 2]
+    assert [row["id"] for row in results[2]] == [4, 5]
+
+
+def test_async_cost_guard_throttles():
+    async def test(engine):
+        query_generator = AsyncQueryGenerator(
+            engine, cost_guard=CostGuard(max_full_scans=0, action="throttle")
+        )
+
+        async def read_stream():
+            stream = query_generator.stream_from_hql_query(query, chunk_size=10)
+            return [row async for chunk in stream for row in chunk]
+
+        return await asyncio.gather(
+            *[query_generator.return_from_hql_query(query) for _ in range(3)], read_stream()
+        )
+
+    results = _run(test)
+    assert results == [[{"id": index, "name": f"Async{index}"} for index in range(2, 6)]] * 4
+
+
+def test_async_sqlite_statement_timeout():
+    async def test(engine):
+        def run_endless_query(connection):
+            with StatementTimeout(connection, 0.1):
+                connection.execute(
+                    text(
+                        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+                        "SELECT count(*) FROM c"
+                    )
+                )
+
+        async with engine.connect() as connection:
+            with pytest.raises(QueryTimeoutError):
+                await connection.run_sync(run_endless_query)
+
+        return await AsyncQueryGenerator(engine, statement_timeout=5).return_from_hql_query(
+            query
+        )
+
+    assert len(_run(test)) == 4
+
+
+def test_async_stale_responses_are_refreshed():
+    async def test(engine):
+        query_generator = AsyncQueryGenerator(
+            engine, result_cache=InMemoryResultCache(ttl=10, soft_ttl=0.01)
+        )
+        first_response = await query_generator.return_from_hql_query(query)
+        async with engine.begin() as connection:
+            await connection.execute(
+                text("UPDATE user_account SET name = 'Fresh' WHERE id = 2")
+            )
+
+        await asyncio.sleep(0.02)
+        stale_response = await query_generator.return_from_hql_query(query)
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            fresh_response = await query_generator.return_from_hql_query(query)
+            if fresh_response != stale_response:
+                break
+        return first_response, stale_response, fresh_response
+
+    first_response, stale_response, fresh_response = _run(test)
+    assert stale_response == first_response
+    assert fresh_response[0] == {"id": 2, "name": "Fresh"}
+
+
+def test_generator_can_be_used_from_several_event_loops(tmp_path):
+    # asyncio.run per request, every call runs on a new event loop
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/loops.db", poolclass=NullPool)
+    query_generator = AsyncQueryGenerator(
+        engine, result_cache=InMemoryResultCache(ttl=10, soft_ttl=0.2), refresh_workers=1
+    )
+    queries = [{**query, "where": {"User.id__GTE": index}} for index in (2, 3)]
+
+    async def create_users():
+        async with engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+            await connection.execute(
+                insert(User).values([{"id": index, "name": f"Loop{index}"} for index in (2, 3)])
+            )
+
+    result_keys = [query_generator._get_result_key(hql_query)[0] for hql_query in queries]
+
+    async def refresh_stale_responses():
+        for hql_query in queries:
+            await query_generator.return_from_hql_query(hql_query)
+        await asyncio.sleep(0.25)
+        # both responses are stale, the second refresh waits for the single refresh worker
+        for hql_query in queries:
+            await query_generator.return_from_hql_query(hql_query)
+        # polled on the cache itself, stale lookups through the generator would refresh again
+        for _ in range(500):
+            if not any(query_generator.result_cache.lookup(key)[1] for key in result_keys):
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("stale responses were not refreshed")
+
+    asyncio.run(create_users())
+    asyncio.run(refresh_stale_responses())
+    asyncio.run(refresh_stale_responses())
+    asyncio.run(engine.dispose())
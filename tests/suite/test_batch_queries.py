@@ -0,0 +1,163 @@
+import time
+
+import pytest
+from sqlalchemy import event, func, insert
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+
+from alchemancer.query_generator import QueryGenerator
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+users_query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.id__GTE": 4001, "User.id__LT": 4100},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+}
+user_count_query = {
+    "select": {"User": {"count(User.id)": {"label": "user_count"}}},
+    "where": {"User.id__GTE": 4001, "User.id__LT": 4100},
+}
+broken_query = {"select": {"NotAModel": {"id": {}}}}
+resolver_query = {
+    "select": {"RecursiveRolesResolver()": {"role_id": {}}},
+    "resolver_args": {"role_id": 1},
+}
+
+
+def _query_generator(engine):
+    return QueryGenerator(engine, {"count": func.count})
+
+
+def _seed_users():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            psql_insert(User)
+            .values([{"id": 4000 + index, "name": f"Batch{index}"} for index in range(1, 4)])
+            .on_conflict_do_nothing()
+        )
+        testing_connection.commit()
+
+
+def test_batch_runs_on_one_connection():
+    _seed_users()
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(psql_engine.pool, "checkout", on_checkout)
+    try:
+        results = _query_generator(psql_engine).return_from_hql_queries(
+            {"users": users_query, "user_count": user_count_query}
+        )
+    finally:
+        event.remove(psql_engine.pool, "checkout", on_checkout)
+
+    assert len(checkouts) == 1
+    assert results == {
+        "users": [
+            {"id": 4001, "name": "Batch1"},
+            {"id": 4002, "name": "Batch2"},
+            {"id": 4003, "name": "Batch3"},
+        ],
+        "user_count": [{"user_count": 3}],
+    }
+
+
+@pytest.mark.parametrize("engine", [psql_engine, sqlite_engine])
+def test_batch_returns_errors_per_query(engine):
+    results = _query_generator(engine).return_from_hql_queries(
+        {"broken": broken_query, "user_count": user_count_query}, return_errors=True
+    )
+
+    assert isinstance(results["broken"], Exception)
+    assert "user_count" in results["user_count"][0]
+
+
+def test_batch_responses_keep_totals_and_cursors():
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .prefix_with("OR IGNORE")
+            .values([{"id": 4000 + index, "name": f"Batch{index}"} for index in range(1, 4)])
+        )
+        testing_connection.commit()
+
+    query_generator = _query_generator(sqlite_engine)
+    queries = {
+        "counted": {**users_query, "limit": 2, "total_count": True},
+        "paginated": {**users_query, "limit": 2, "cursor": None},
+    }
+    responses = query_generator.return_responses_from_hql_queries(queries)
+
+    assert responses["counted"] == {
+        "data": [{"id": 4001, "name": "Batch1"}, {"id": 4002, "name": "Batch2"}],
+        "total": 3,
+        "total_is_estimate": False,
+    }
+    assert responses["paginated"]["data"] == responses["counted"]["data"]
+    assert responses["paginated"]["cursor"] is not None
+    assert query_generator.return_from_hql_queries(queries) == {
+        "counted": responses["counted"]["data"],
+        "paginated": responses["paginated"]["data"],
+    }
+
+
+def test_batch_raises_without_return_errors():
+    with pytest.raises(Exception):
+        _query_generator(psql_engine).return_from_hql_queries(
+            {"broken": broken_query, "user_count": user_count_query}
+        )
+
+
+def test_batch_is_read_only():
+    # resolvers write to a temp table, which postgres refuses inside a read only transaction,
+    # the resolver error is re-raised by the generator with the database error as its context
+    results = _query_generator(psql_engine).return_from_hql_queries(
+        {"roles": resolver_query}, return_errors=True
+    )
+    assert "read-only transaction" in str(results["roles"].__context__)
+
+
+def _sleep_query(seconds: float):
+    return {
+        "select": {"User": {f"count(pg_sleep({seconds}))": {"label": "slept"}}},
+        "where": {"User.id__EQ": 4001},
+    }
+
+
+def test_concurrent_batch_keeps_request_order():
+    _seed_users()
+    queries = {f"users_{index}": {**users_query, "offset": index} for index in range(4)}
+    query_generator = _query_generator(psql_engine)
+
+    results = query_generator.return_from_hql_queries(queries, concurrency=3)
+    assert list(results.keys()) == list(queries.keys())
+    assert results == query_generator.return_from_hql_queries(queries)
+
+
+def test_concurrent_batch_latency_approaches_the_slowest_query():
+    _seed_users()
+    query_generator = QueryGenerator(
+        psql_engine, {"count": func.count, "pg_sleep": func.pg_sleep}
+    )
+    queries = {index: _sleep_query(0.5) for index in range(4)}
+
+    started_at = time.perf_counter()
+    results = query_generator.return_from_hql_queries(queries, concurrency=4)
+    elapsed = time.perf_counter() - started_at
+
+    assert results == {index: [{"slept": 1}] for index in range(4)}
+    # sequentially this takes 2 seconds
+    assert elapsed < 1.5
+
+
+def test_concurrent_batch_returns_errors_per_query():
+    results = _query_generator(psql_engine).return_from_hql_queries(
+        {"broken": broken_query, "user_count": user_count_query},
+        return_errors=True,
+        concurrency=2,
+    )
+
+    assert isinstance(results["broken"], Exception)
+    assert results["user_count"] == [{"user_count": 3}]
@@ -0,0 +1,89 @@
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from sqlalchemy import func, over
+from sqlalchemy.dialects.postgresql import INTERVAL, aggregate_order_by
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.query_hasher import QueryHasher
+from alchemancer.reflection_handler import ReflectionHandler
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+test_cases = [
+    (x["name"], x)
+    for x in ReflectionHandler._import_objects_from_modules_via_path(
+        str(
+            Path.joinpath(
+                Path(__file__).parent.parent.parent,  # suite dir  # tests dir
+                "examples/queries",
+            )
+        ),
+        "examples.queries",
+        dict,
+        check_subclasses_of_type=False,
+        return_instances=True,
+    )
+]
+base_context_dict = {
+    "aggregate_order_by": aggregate_order_by,
+    "lag": func.lag,
+    "lead": func.lead,
+    "over": over,
+    "INTERVAL": INTERVAL,
+    "cast": func.cast,
+    "count": func.count,
+}
+
+
+@pytest.mark.parametrize("name,test_dict", test_cases)
+def test_example_is_cacheable(name, test_dict: Dict):
+    query_generator = QueryGenerator(psql_engine, base_context_dict)
+    generated_query = query_generator._generate_query(test_dict["query"])
+    if generated_query.template is None:
+        pytest.skip("resolver queries are not templated")
+
+    assert generated_query.template.cacheable
+    assert query_generator.compile_cache_report()[generated_query.template.shape_hash][
+        "cacheable"
+    ]
+
+
+@pytest.mark.parametrize("name,test_dict", test_cases)
+def test_example_cache_key_is_stable(name, test_dict: Dict):
+    # two independent builds of the same query need the same cache key, otherwise every request
+    # would be a compiled cache miss
+    if QueryHasher().fingerprint(test_dict["query"]).uses_resolver:
+        pytest.skip("resolver queries are built against a live connection")
+
+    query_generator = QueryGenerator(psql_engine, base_context_dict)
+    first = query_generator._process_query(test_dict["query"]).query._generate_cache_key()
+    second = query_generator._process_query(test_dict["query"]).query._generate_cache_key()
+
+    assert first is not None
+    assert first == second
+
+
+def _query(user_id: int):
+    return {"select": {"User": {"id": {}, "name": {}}}, "where": {"User.id__EQ": user_id}}
+
+
+def test_compiled_sql_is_reused():
+    query_generator = QueryGenerator(sqlite_engine, cache_compiled_sql=True)
+    query_generator.return_from_hql_query(_query(1))
+    query_generator.return_from_hql_query(_query(2))
+
+    shape_hash = query_generator._generate_query(_query(3)).template.shape_hash
+    assert query_generator.compile_cache_report() == {
+        shape_hash: {"cacheable": True, "compiled_cache_hits": 1, "compiled_cache_misses": 1}
+    }
+
+
+def test_sqlalchemy_compiled_cache_is_reported():
+    query_generator = QueryGenerator(sqlite_engine)
+    query_generator.return_from_hql_query(_query(1))
+    query_generator.return_from_hql_query(_query(2))
+
+    (report,) = query_generator.compile_cache_report().values()
+    assert report["cacheable"]
+    assert report["compiled_cache_hits"] >= 1
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from sqlalchemy import event, func, text
+
+from alchemancer.cost_guard import CostGuard
+from alchemancer.explain import _sqlite_full_scan, explain
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.types.exceptions import QueryCostError
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+from tests.suite.test_total_count import _seed_users
+
+users_query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.name__EQ": "Total1"},
+}
+user_by_id_query = {"select": {"User": {"id": {}, "name": {}}}, "where": {"User.id__EQ": 6001}}
+
+
+def test_postgresql_plan():
+    with psql_engine.connect() as connection:
+        plan = explain(connection, text("SELECT * FROM user_account WHERE name = 'x'"))
+
+    assert plan.total_cost > 0
+    assert plan.rows >= 1
+    assert plan.full_scans == ["user_account"]
+
+
+@pytest.mark.parametrize("threshold", ["max_cost", "max_rows"])
+def test_expensive_queries_are_rejected(threshold):
+    query_generator = QueryGenerator(psql_engine, cost_guard=CostGuard(**{threshold: 0}))
+
+    with pytest.raises(QueryCostError) as error:
+        query_generator.return_from_hql_query(users_query)
+
+    error_dict = error.value.to_dict()
+    assert error_dict["error"] == "query_too_expensive"
+    assert threshold in error_dict["exceeded"]
+    assert error_dict["total_cost"] > 0
+
+
+def test_queries_within_thresholds_run():
+    _seed_users(psql_engine)
+    query_generator = QueryGenerator(
+        psql_engine, cost_guard=CostGuard(max_cost=1_000_000, max_rows=1_000_000)
+    )
+
+    assert query_generator.return_from_hql_query(users_query)
+
+
+@pytest.mark.parametrize("template_cache_size", [0, 256])
+def test_plans_are_cached_per_shape(template_cache_size):
+    cost_guard = CostGuard(max_cost=1_000_000)
+    query_generator = QueryGenerator(
+        psql_engine, cost_guard=cost_guard, template_cache_size=template_cache_size
+    )
+    explained_statements = []
+
+    def count_explains(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("EXPLAIN"):
+            explained_statements.append(statement)
+
+    event.listen(psql_engine, "before_cursor_execute", count_explains)
+    try:
+        for name in ("Total1", "Total2", "Total3"):
+            query_generator.return_from_hql_query(
+                {**users_query, "where": {"User.name__EQ": name}}
+            )
+        query_generator.return_from_hql_query(user_by_id_query)
+    finally:
+        event.remove(psql_engine, "before_cursor_execute", count_explains)
+
+    assert len(explained_statements) == 2
+    assert cost_guard.plan_cache_stats.hits == 2
+
+
+def test_sqlite_only_checks_full_scans():
+    _seed_users(sqlite_engine)
+    query_generator = QueryGenerator(
+        sqlite_engine, cost_guard=CostGuard(max_cost=0, max_rows=0, max_full_scans=0)
+    )
+
+    # the primary key lookup has no full scan and sqlite plans have no cost or rows
+    assert query_generator.return_from_hql_query(user_by_id_query) == [
+        {"id": 6001, "name": "Total0"}
+    ]
+    with pytest.raises(QueryCostError) as error:
+        query_generator.return_from_hql_query(users_query)
+
+    assert error.value.exceeded == ["max_full_scans"]
+    assert error.value.plan.full_scans == ["user_account"]
+    assert error.value.plan.total_cost is None
+
+
+@pytest.mark.parametrize(
+    "detail,table",
+    [
+        ("SCAN user_account", "user_account"),
+        ("SCAN TABLE user_account", "user_account"),
+        ("SCAN user_account USING INDEX ix_name", None),
+        ("SCAN TABLE user_account USING COVERING INDEX ix_name", None),
+        ("SEARCH user_account USING INTEGER PRIMARY KEY (rowid=?)", None),
+        ("SEARCH TABLE user_account USING INTEGER PRIMARY KEY (rowid=?)", None),
+    ],
+)
+def test_sqlite_plan_formats(detail, table):
+    # SQLite before 3.36 writes "SCAN TABLE <table>"
+    assert _sqlite_full_scan(detail) == table
+
+
+def test_expensive_queries_are_throttled():
+    _seed_users(psql_engine)
+    query_generator = QueryGenerator(
+        psql_engine,
+        {"count": func.count, "pg_sleep": func.pg_sleep},
+        cost_guard=CostGuard(max_cost=0, action="throttle"),
+    )
+    sleep_query = {
+        "select": {"User": {"count(pg_sleep(0.2))": {"label": "slept"}}},
+        "where": {"User.id__EQ": 6001},
+    }
+
+    started_at = time.perf_counter()
+    results = query_generator.return_from_hql_queries(
+        {index: sleep_query for index in range(3)}, concurrency=3
+    )
+    elapsed = time.perf_counter() - started_at
+
+    assert results == {index: [{"slept": 1}] for index in range(3)}
+    # expensive queries run one at a time
+    assert elapsed >= 0.6
+
+
+def test_invalid_action():
+    with pytest.raises(ValueError):
+        CostGuard(action="ignore")
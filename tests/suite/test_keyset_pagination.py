@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+
+from alchemancer.keyset_pagination import decode_cursor, encode_cursor
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.query_transformation_handler import (
+    CursorNode,
+    DebugNode,
+    DistinctNode,
+    FilterNode,
+    GroupByNode,
+    HavingClauseNode,
+    HqlCTENode,
+    HqlUnionNode,
+    JoinNode,
+    LimitNode,
+    OffsetNode,
+    OrderByNode,
+    QueryTransformation,
+    QueryTransformationHandler,
+    ResolverArgsNode,
+    SelectNode,
+    SortItemNode,
+    SubqueryNode,
+    WhenThenNode,
+    WhereClauseNode,
+)
+from tests.fixtures.models.generic.reservation import Reservation
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+balances = [10.0, 20.0, 20.0, 20.0, 30.0, 40.0, 40.0]
+where = {"User.id__GTE": 5001, "User.id__LT": 5100}
+
+
+def _seed_users():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            psql_insert(User)
+            .values(
+                [
+                    {"id": 5001 + index, "name": f"Keyset{index}", "account_balance": balance}
+                    for index, balance in enumerate(balances)
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        testing_connection.commit()
+
+
+def _query(order_by, cursor=None):
+    return {
+        "select": {"User": {"id": {}, "account_balance": {}}},
+        "where": where,
+        "order_by": order_by,
+        "limit": 3,
+        "cursor": cursor,
+    }
+
+
+def _read_all_pages(query_generator, order_by):
+    pages = []
+    cursor = None
+    while True:
+        response = query_generator.return_response_from_hql_query(_query(order_by, cursor))
+        pages.append(response["data"])
+        cursor = response["cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = [1, "a", 1.5, None, True, datetime(2024, 2, 29, 13, 5), Decimal("1.10")]
+    cursor = encode_cursor(values)
+
+    assert decode_cursor(cursor) == values
+    assert "=" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", "W3siZGF0ZSI6IngifV0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize(
+    "order_by",
+    [
+        # same direction, a single row value comparison
+        {
+            "User.account_balance": {"index": 0, "dir": "desc"},
+            "User.id": {"index": 1, "dir": "desc"},
+        },
+        # mixed directions
+        {
+            "User.account_balance": {"index": 0, "dir": "asc"},
+            "User.id": {"index": 1, "dir": "desc"},
+        },
+    ],
+)
+def test_pages_cover_the_ordered_result(order_by):
+    _seed_users()
+    query_generator = QueryGenerator(psql_engine)
+    full_result = query_generator.return_from_hql_query(
+        {
+            "select": {"User": {"id": {}, "account_balance": {}}},
+            "where": where,
+            "order_by": order_by,
+        }
+    )
+
+    pages = _read_all_pages(query_generator, order_by)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [row for page in pages for row in page] == full_result
+    # every page after the first is the same shape
+    assert query_generator.template_cache_stats.hits >= 1
+
+
+def test_keyset_uses_a_row_value_comparison():
+    query_generator = QueryGenerator(psql_engine)
+    query = query_generator._process_query(
+        {
+            **_query({"User.id": {"index": 0, "dir": "asc"}}, encode_cursor([5002])),
+            "where": {},
+        }
+    ).query
+
+    assert "WHERE (user_account.id) > (:param_1)" in str(query)
+
+
+def test_keyset_needs_order_by_and_limit():
+    with pytest.raises(ValueError):
+        QueryGenerator(psql_engine).return_response_from_hql_query(
+            {"select": {"User": {"id": {}}}, "cursor": None}
+        )
+
+
+def test_keyset_through_transformation_aliases():
+    _seed_users()
+    transformation = QueryTransformation(
+        SelectNode(when_node=WhenThenNode(), alias="fields"),
+        JoinNode(),
+        WhereClauseNode(alias="filter"),
+        HavingClauseNode(),
+        FilterNode(),
+        LimitNode(alias="page_size"),
+        OffsetNode(),
+        OrderByNode(SortItemNode(asc_alias="ascending", desc_alias="descending"), alias="sort"),
+        GroupByNode(),
+        DistinctNode(),
+        SubqueryNode(),
+        HqlCTENode(),
+        HqlUnionNode(),
+        HqlUnionNode(alias="union_all"),
+        ResolverArgsNode(),
+        DebugNode(),
+        CursorNode(alias="after"),
+    )
+    query_generator = QueryGenerator(
+        psql_engine, query_transformer=QueryTransformationHandler({"custom": transformation})
+    )
+
+    def custom_query(after):
+        return {
+            "fields": {"User": {"id": {}}},
+            "filter": where,
+            "sort": {"User.id": {"index": 0, "dir": "descending"}},
+            "page_size": 4,
+            "after": after,
+        }
+
+    first_page = query_generator.return_response_from_hql_query(custom_query(None))
+    second_page = query_generator.return_response_from_hql_query(
+        custom_query(first_page["cursor"])
+    )
+
+    assert first_page["data"] == [{"id": 5007}, {"id": 5006}, {"id": 5005}, {"id": 5004}]
+    assert second_page == {"data": [{"id": 5003}, {"id": 5002}, {"id": 5001}], "cursor": None}
+
+
+@pytest.mark.parametrize("id_direction", ["asc", "desc"])
+def test_cursor_values_get_their_sort_columns_type(id_direction):
+    # SQLite stores datetimes as strings, an untyped cursor value wouldn't compare like the column
+    start = datetime(2024, 5, 1, 9, 30)
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(Reservation)
+            .prefix_with("OR IGNORE")
+            .values(
+                [
+                    {
+                        "id": 7001 + index,
+                        "date_time_start": start + timedelta(hours=index),
+                        "date_time_end": start + timedelta(hours=index + 1),
+                        "vehicle_id": 1,
+                        "user_account_id": 1,
+                    }
+                    for index in range(7)
+                ]
+            )
+        )
+        testing_connection.commit()
+
+    query_generator = QueryGenerator(sqlite_engine)
+    order_by = {
+        "Reservation.date_time_start": {"index": 0, "dir": "asc"},
+        "Reservation.id": {"index": 1, "dir": id_direction},
+    }
+    pages = []
+    cursor = None
+    while True:
+        response = query_generator.return_response_from_hql_query(
+            {
+                "select": {"Reservation": {"id": {}}},
+                "where": {"Reservation.id__GTE": 7001, "Reservation.id__LT": 7100},
+                "order_by": order_by,
+                "limit": 3,
+                "cursor": cursor,
+            }
+        )
+        pages.append([row["id"] - 7000 for row in response["data"]])
+        cursor = response["cursor"]
+        if cursor is None:
+            break
+
+    assert pages == [[1, 2, 3], [4, 5, 6], [7]]
+    assert query_generator.template_cache_stats.hits >= 1
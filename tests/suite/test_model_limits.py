@@ -0,0 +1,164 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.reflection_handler import ReflectionHandler
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+users_query = {
+    "select": {"User": {"id": {}}},
+    "where": {"User.id__GTE": 7001, "User.id__LT": 7100},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+}
+
+
+@pytest.fixture
+def user_limits():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            psql_insert(User)
+            .values([{"id": 7000 + index, "name": f"Limit{index}"} for index in range(1, 11)])
+            .on_conflict_do_nothing()
+        )
+        testing_connection.commit()
+
+    ReflectionHandler.set_model_limits("User", default_limit=3, max_limit=5)
+    yield
+    ReflectionHandler.set_model_limits("User")
+
+
+@pytest.mark.parametrize(
+    "query_limit,row_count,truncated",
+    [(None, 3, True), (2, 2, True), (8, 5, True), (5, 5, True), (20, 5, True)],
+)
+def test_limits_are_applied(user_limits, query_limit, row_count, truncated):
+    query = {**users_query, "limit": query_limit} if query_limit else users_query
+
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(query)
+    assert [row["id"] for row in response["data"]] == list(range(7001, 7001 + row_count))
+    assert response["truncated"] is truncated
+
+
+def test_results_within_the_limit_are_not_truncated(user_limits):
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {**users_query, "where": {"User.id__GTE": 7009, "User.id__LT": 7100}}
+    )
+
+    assert response == {"data": [{"id": 7009}, {"id": 7010}], "truncated": False}
+
+
+def test_unlimited_models_are_not_truncated():
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(users_query)
+
+    assert "truncated" not in response
+
+
+def test_keyset_pages_report_truncation(user_limits):
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {**users_query, "cursor": None}
+    )
+
+    assert len(response["data"]) == 3
+    assert response["truncated"] is True
+    assert response["cursor"] is not None
+
+
+def test_streams_are_limited(user_limits):
+    chunks = list(
+        QueryGenerator(psql_engine).stream_from_hql_query(
+            {**users_query, "limit": 100}, chunk_size=2
+        )
+    )
+
+    assert [row["id"] for chunk in chunks for row in chunk] == list(range(7001, 7006))
+
+
+def test_subqueries_joins_and_union_branches_are_limited(user_limits):
+    ReflectionHandler.set_model_limits("Address", max_limit=2)
+    try:
+        query = QueryGenerator(psql_engine)._apply_model_limits(
+            {
+                "select": {"union_query": {"id": {}}},
+                "subqueries": {"limited_users": {"select": {"User": {"id": {}}}}},
+                "union": {
+                    "name": "union_query",
+                    "left": {"select": {"User": {"id": {}}}, "alias": "left_users"},
+                    "right": {
+                        "select": {"User": {"id": {}}},
+                        "joins": {
+                            "Address": {
+                                "select": {"id": {}},
+                                "where": {"Address.user_id__EQ": "User.id"},
+                            }
+                        },
+                        "limit": 4,
+                    },
+                },
+            }
+        )
+    finally:
+        ReflectionHandler.set_model_limits("Address")
+
+    assert "limit" not in query
+    assert query["subqueries"]["limited_users"]["limit"] == 3
+    assert query["union"]["left"]["limit"] == 3
+    assert query["union"]["right"]["limit"] == 2
+
+
+def test_recursive_cte_branches_are_not_limited(user_limits):
+    union = {
+        "name": "union_query",
+        "left": {"select": {"User": {"id": {}}}, "alias": "cte_base"},
+        "right": {"select": {"User": {"id": {}}}},
+        "cte": {"recursive": True, "name": "cte_base"},
+    }
+    query = QueryGenerator(psql_engine)._apply_model_limits(
+        {"select": {"union_query": {"id": {}}}, "union_all": union}
+    )
+
+    assert query["union_all"]["left"]["limit"] == 3
+    assert "limit" not in query["union_all"]["right"]
+    assert "limit" not in union["left"]
+
+
+def test_limited_union_branches_on_sqlite():
+    # SQLite has no LIMIT on the selects of a compound select, limited branches are subqueries
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .prefix_with("OR IGNORE")
+            .values([{"id": 7000 + index, "name": f"Limit{index}"} for index in range(1, 11)])
+        )
+        testing_connection.commit()
+
+    ReflectionHandler.set_model_limits("User", default_limit=3, max_limit=5)
+    try:
+        result = QueryGenerator(sqlite_engine).return_from_hql_query(
+            {
+                "select": {"union_query": {"id": {}}},
+                "union_all": {
+                    "name": "union_query",
+                    "left": {**users_query, "alias": "left_users"},
+                    "right": {
+                        **users_query,
+                        "where": {"User.id__GTE": 7006, "User.id__LT": 7100},
+                        "limit": 2,
+                    },
+                },
+            }
+        )
+    finally:
+        ReflectionHandler.set_model_limits("User")
+
+    assert sorted(row["id"] for row in result) == [7001, 7002, 7003, 7006, 7007]
+
+
+@pytest.mark.parametrize(
+    "model_name,default_limit,max_limit",
+    [("NotAModel", 1, 1), ("User", 0, None), ("User", 10, 5)],
+)
+def test_invalid_limits(model_name, default_limit, max_limit):
+    with pytest.raises(ValueError):
+        ReflectionHandler.set_model_limits(model_name, default_limit, max_limit)
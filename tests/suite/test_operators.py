@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql
+
+from alchemancer.operators import OPERATORS, Operator, register_operator, sql_operator
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.query_ir import QueryParser
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.models.postgresql.system import System
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+
+def _compile(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_built_in_operators():
+    assert _compile(OPERATORS[Operator.EQ](User.name, True)) == "user_account.name IS true"
+    assert _compile(OPERATORS[Operator.NE](User.name, "a")) == (
+        "user_account.name != %(name_1)s"
+    )
+    assert _compile(OPERATORS[Operator.NOT_RE](User.name, "^a")) == (
+        "user_account.name !~ %(name_1)s"
+    )
+
+
+def test_operators_are_validated_while_parsing():
+    parser = QueryParser()
+    query_ir = parser.parse({"select": {"User": {"id": {}}}, "where": {"User.id__GtE": 1}})
+    assert query_ir.where[0].op == Operator.GTE
+
+    with pytest.raises(ValueError):
+        parser.parse({"select": {"User": {"id": {}}}, "where": {"User.id__<<=": 1}})
+
+
+def test_operator_names_are_checked_when_registered():
+    with pytest.raises(ValueError):
+        register_operator("eq", OPERATORS[Operator.NE])
+    with pytest.raises(ValueError):
+        register_operator("a__b", OPERATORS[Operator.NE])
+
+
+def test_registered_operators_can_be_queried():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(System).values(
+                [
+                    {
+                        "cidr": "10.20.0.0/16",
+                        "inet": "10.20.30.40",
+                        "macaddr": "08:00:2b:01:02:04",
+                        "macaddr8": "08:00:2b:01:02:03:04:06",
+                    }
+                ]
+            )
+        )
+        testing_connection.commit()
+
+    register_operator("<<=", sql_operator("<<="))
+    try:
+        results = QueryGenerator(psql_engine).return_from_hql_query(
+            {
+                "select": {"System": {"inet": {}}},
+                "where": {"System.inet__<<=": "10.20.30.0/24"},
+            }
+        )
+    finally:
+        del OPERATORS["<<="]
+
+    assert results and all(row["inet"] == "10.20.30.40" for row in results)
+
+
+@pytest.mark.parametrize("template_cache_size", [0, 256])
+def test_registered_operators_work_with_and_without_template_cache(template_cache_size):
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .prefix_with("OR IGNORE")
+            .values([{"id": 3001, "name": "OperatorA"}, {"id": 3002, "name": "OperatorB"}])
+        )
+        testing_connection.commit()
+
+    register_operator("ieq", lambda column, value: func.lower(column) == func.lower(value))
+    try:
+        query_generator = QueryGenerator(sqlite_engine, template_cache_size=template_cache_size)
+        results = [
+            query_generator.return_from_hql_query(
+                {"select": {"User": {"id": {}}}, "where": {"User.name__IEQ": name}}
+            )
+            for name in ("operatora", "OPERATORB")
+        ]
+    finally:
+        del OPERATORS["ieq"]
+
+    assert results == [[{"id": 3001}], [{"id": 3002}]]
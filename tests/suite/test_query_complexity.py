@@ -0,0 +1,102 @@
+import pytest
+
+from alchemancer.query_complexity import QueryComplexityScorer
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.types.exceptions import QueryComplexityError
+from tests.fixtures.test_dbs import psql_engine
+
+simple_query = {"select": {"User": {"id": {}, "name": {}}}, "where": {"User.id__EQ": 1}}
+complex_query = {
+    "select": {"union_query": {"id": {}, "coalesce(max(union_query.id), 0)": {}}},
+    "subqueries": {
+        "user_ids": {
+            "select": {"User": {"id": {}}},
+            "where": {"or": [{"User.id__EQ": 1}, {"User.id__EQ": 2}, {"User.id__EQ": 3}]},
+        }
+    },
+    "union_all": {
+        "name": "union_query",
+        "left": {"select": {"Role": {"id": {}}}, "alias": "cte_base"},
+        "right": {
+            "select": {"cte_base": {"id": {}}},
+            "joins": {
+                "Role": {
+                    "select": {"id": {"label": "parent_role_id"}},
+                    "where": {"Role.id__EQ": "cte_base.parent_role_id"},
+                }
+            },
+        },
+        "cte": {"recursive": True, "name": "cte_base"},
+    },
+}
+
+
+def test_features_are_counted():
+    complexity = QueryComplexityScorer().score(complex_query)
+
+    assert complexity.counts == {
+        "columns": 6,
+        "joins": 1,
+        "subqueries": 1,
+        "nesting_depth": 1,
+        "union_branches": 2,
+        "recursive_ctes": 1,
+        "function_calls": 2,
+        "or_branches": 3,
+    }
+    assert complexity.score == 6 + 5 + 10 + 10 + 20 + 50 + 4 + 6
+
+
+def test_weights_can_be_overridden():
+    scorer = QueryComplexityScorer({"columns": 0, "recursive_ctes": 1000})
+
+    assert scorer.score(simple_query).score == 0
+    assert scorer.score(complex_query).score > 1000
+    with pytest.raises(ValueError):
+        QueryComplexityScorer({"tables": 1})
+
+
+def test_deeply_nested_filters_are_scored():
+    where = {"User.id__EQ": 1}
+    for _ in range(10_000):
+        where = {"or": [where, {"User.id__EQ": 2}]}
+
+    complexity = QueryComplexityScorer().score({"select": {"User": {"id": {}}}, "where": where})
+    assert complexity.counts["or_branches"] == 20_000
+
+
+def test_queries_over_budget_are_rejected_before_building_sql():
+    query_generator = QueryGenerator(psql_engine, complexity_budget=50)
+
+    with pytest.raises(QueryComplexityError) as error:
+        query_generator.return_from_hql_query(complex_query)
+
+    assert error.value.to_dict() == {
+        "error": "query_too_complex",
+        "score": QueryComplexityScorer().score(complex_query).score,
+        "budget": 50,
+        "counts": QueryComplexityScorer().score(complex_query).counts,
+    }
+    assert query_generator.template_cache_stats.misses == 0
+    assert query_generator.return_from_hql_query(simple_query) is not None
+
+
+def test_budget_per_call():
+    query_generator = QueryGenerator(psql_engine, complexity_budget=1)
+
+    with pytest.raises(QueryComplexityError):
+        query_generator.return_from_hql_query(simple_query)
+    query_generator.return_from_hql_query(simple_query, complexity_budget=10)
+    with pytest.raises(QueryComplexityError):
+        list(query_generator.stream_from_hql_query(simple_query))
+
+
+def test_batches_return_complexity_errors():
+    results = QueryGenerator(psql_engine).return_from_hql_queries(
+        {"simple": simple_query, "complex": complex_query},
+        return_errors=True,
+        complexity_budget=50,
+    )
+
+    assert isinstance(results["simple"], list)
+    assert isinstance(results["complex"], QueryComplexityError)
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import pytest
+
+from alchemancer.query_hasher import QueryHasher
+from alchemancer.reflection_handler import ReflectionHandler
+
+test_cases = [
+    (x["name"], x)
+    for x in ReflectionHandler._import_objects_from_modules_via_path(
+        str(
+            Path.joinpath(
+                Path(__file__).parent.parent.parent,  # suite dir  # tests dir
+                "examples/queries",
+            )
+        ),
+        "examples.queries",
+        dict,
+        check_subclasses_of_type=False,
+        return_instances=True,
+    )
+]
+
+
+def test_literals_are_stripped():
+    hasher = QueryHasher()
+    left = hasher.fingerprint(
+        {
+            "select": {"User": {"id": {}}},
+            "where": {"User.id__EQ": 1, "User.name__LIKE": "%A%"},
+            "limit": 5,
+            "offset": 10,
+        }
+    )
+    right = hasher.fingerprint(
+        {
+            "select": {"User": {"id": {}}},
+            "where": {"User.id__EQ": 2, "User.name__LIKE": "%B%"},
+            "limit": 50,
+            "offset": 100,
+        }
+    )
+    assert left.hash == right.hash
+    assert left.key == right.key
+    assert right.parameters == [50, 100, 2, "%B%"]
+
+
+def test_key_order_does_not_change_hash():
+    hasher = QueryHasher()
+    left = hasher.fingerprint(
+        {
+            "where": {"User.name__LIKE": "%A%", "User.id__EQ": 1},
+            "select": {"User": {"id": {}, "name": {}}},
+        }
+    )
+    right = hasher.fingerprint(
+        {
+            "select": {"User": {"id": {}, "name": {}}},
+            "where": {"User.id__EQ": 1, "User.name__LIKE": "%A%"},
+        }
+    )
+    assert left.hash == right.hash
+    assert left.parameters == right.parameters
+
+
+def test_select_order_changes_hash():
+    # the selected columns are returned in order so reordering them is a different query
+    hasher = QueryHasher()
+    left = hasher.fingerprint({"select": {"User": {"id": {}, "name": {}}}})
+    right = hasher.fingerprint({"select": {"User": {"name": {}, "id": {}}}})
+    assert left.hash != right.hash
+    assert left.key != right.key
+
+
+@pytest.mark.parametrize(
+    "other_query",
+    [
+        # different operator
+        {"select": {"User": {"id": {}}}, "where": {"User.id__NE": 1}},
+        # different column
+        {"select": {"User": {"name": {}}}, "where": {"User.id__EQ": 1}},
+        # column reference instead of a literal
+        {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": "User.account_balance"}},
+        # null check instead of a literal
+        {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": None}},
+        # literal of a different type
+        {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": "1"}},
+        # limit is part of the shape, only its value is stripped
+        {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}, "limit": 1},
+    ],
+)
+def test_shape_changes_change_hash(other_query):
+    hasher = QueryHasher()
+    base_query = {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}}
+    assert hasher.hash_query(base_query) != hasher.hash_query(other_query)
+
+
+def test_booleans_are_not_confused_with_nesting():
+    # booleans compare equal to the ints marking where nested structures open and close
+    query = {
+        "select": {"User": {"id": {"whens": [{"when": {}, "then": True}], "else_": False}}},
+        "where": {"User.name__EQ": False},
+    }
+    key = QueryHasher().fingerprint(query).key
+    assert not any(type(token) is bool for token in key)
+
+
+def test_hash_is_stable():
+    # the hash is used to catalogue queries so it must not depend on per process state
+    assert (
+        QueryHasher().hash_query({"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}})
+        == "e17eb501e5185ba958956e78726b63a8"
+    )
+
+
+@pytest.mark.parametrize("name,test_dict", test_cases)
+def test_examples_hash(name, test_dict):
+    fingerprint = QueryHasher().fingerprint(test_dict["query"])
+    assert len(fingerprint.hash) == 32
@@ -0,0 +1,92 @@
+import pytest
+
+from alchemancer.operators import Operator
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.query_ir import (
+    BooleanClause,
+    ColumnRef,
+    FunctionExpr,
+    Join,
+    Predicate,
+    QueryParser,
+    Sort,
+)
+from tests.fixtures.test_dbs import sqlite_engine
+
+query = {
+    "select": {
+        "User": {
+            "id": {},
+            "name": {"label": "user_name"},
+            "coalesce(account_balance, 0)": {"label": "balance"},
+        }
+    },
+    "joins": {
+        "Address": {
+            "select": {"email_address": {}},
+            "where": {"Address.user_id__EQ": "User.id"},
+        }
+    },
+    "where": {"or": [{"User.id__gte": 10}, {"User.name__LIKE": "a%"}]},
+    "group_by": ["User.id", "User.name"],
+    "order_by": {
+        "User.name": {"index": 1, "dir": "asc"},
+        "User.id": {"index": 0, "dir": "desc"},
+    },
+}
+
+
+def test_query_is_parsed_into_the_ir():
+    query_ir = QueryParser().parse(query)
+
+    (select_source,) = query_ir.select
+    assert select_source.columns == (
+        ColumnRef("User", "id"),
+        ColumnRef("User", "name", label="user_name"),
+        FunctionExpr("coalesce(account_balance, 0)", "User", "balance"),
+    )
+    assert query_ir.joins == (
+        Join(
+            "Address",
+            (ColumnRef("Address", "email_address", label="address_email_address"),),
+            (Predicate(ColumnRef("Address", "user_id"), Operator.EQ, ColumnRef("User", "id")),),
+        ),
+    )
+    assert query_ir.where == (
+        BooleanClause(
+            "or",
+            (
+                Predicate(ColumnRef("User", "id"), Operator.GTE, 10),
+                Predicate(ColumnRef("User", "name"), Operator.LIKE, "a%"),
+            ),
+        ),
+    )
+    assert query_ir.group_by == (ColumnRef("User", "id"), ColumnRef("User", "name"))
+    assert query_ir.order_by == (
+        Sort(ColumnRef("User", "id"), "desc"),
+        Sort(ColumnRef("User", "name"), "asc"),
+    )
+
+
+def test_ir_is_hashable():
+    parser = QueryParser()
+    assert parser.parse(query) == parser.parse(query)
+    assert len({parser.parse(query), parser.parse(query)}) == 1
+    with pytest.raises(AttributeError):
+        ColumnRef("User", "id").__dict__
+
+
+def test_ir_builds_the_same_query():
+    query_generator = QueryGenerator(sqlite_engine)
+    assert str(query_generator._process_query(QueryParser().parse(query)).query) == str(
+        query_generator._process_query(query).query
+    )
+
+
+@pytest.mark.parametrize(
+    "where",
+    [{"User.id__BETWEEN": 1}, {"User.id": 1}, {"User.missing__EQ": 1}],
+)
+def test_invalid_queries_fail_while_parsing(where):
+    with pytest.raises(ValueError):
+        QueryParser().parse({"select": {"User": {"id": {}}}, "where": where})
@@ -2,7 +2,9 @@ from pprint import pprint
 from typing import Dict
 
 import pytest
+from sqlalchemy import insert
 
+from alchemancer.query_generator import QueryGenerator
 from alchemancer.query_transformation_handler import (
     DebugNode,
     DistinctNode,
@@ -25,6 +27,8 @@ from alchemancer.query_transformation_handler import (
     SubqueryNode,
 )
 from alchemancer.types.query import HqlQuery
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import sqlite_engine
 
 sample_query = {
     "query": {"User": {"id": {}, "name": {}}},
@@ -311,3 +315,151 @@ def test_query_transformer(
     pprint(expected_query)
 
     assert output_query == expected_query
+
+
+def _transformation(select_alias: str = "select", limit_alias: str = "limit"):
+    return QueryTransformation(
+        SelectNode(WhenThenNode(), alias=select_alias),
+        JoinNode(),
+        WhereClauseNode(),
+        HavingClauseNode(),
+        FilterNode(),
+        LimitNode(alias=limit_alias),
+        OffsetNode(),
+        OrderByNode(SortItemNode()),
+        GroupByNode(),
+        DistinctNode(),
+        SubqueryNode(),
+        HqlCTENode(),
+        HqlUnionNode(),
+        HqlUnionNode(alias="union_all"),
+        ResolverArgsNode(),
+        DebugNode(),
+    )
+
+
+def test_find_transformation_matches_on_top_level_aliases():
+    first = _transformation(select_alias="query")
+    second = _transformation(select_alias="query", limit_alias="take")
+    third = _transformation(select_alias="fields", limit_alias="take")
+    query_transformer = QueryTransformationHandler(
+        {"first": first, "second": second, "third": third}
+    )
+
+    # the first transformation covering every key wins
+    assert query_transformer.find_transformation({"query": {}, "limit": 1}) is first
+    assert query_transformer.find_transformation({"query": {}, "take": 1}) is second
+    assert query_transformer.find_transformation({"fields": {}, "take": 1}) is third
+    assert query_transformer.find_transformation({}) is first
+    assert query_transformer.find_transformation({"fields": {}, "limit": 1}) is None
+    assert query_transformer.find_transformation({"query": {}, "unknown": 1}) is None
+    assert QueryTransformationHandler({}).find_transformation({"query": {}}) is None
+
+
+def test_subqueries_and_unions_are_translated():
+    query_transformer = QueryTransformationHandler(
+        {"client": _transformation(select_alias="query", limit_alias="take")}
+    )
+    branch = {"query": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}, "take": 5}
+    query = {
+        "query": {"users": {"id": {}}},
+        "subqueries": {"inner": branch},
+        "union_all": {
+            "name": "users",
+            "left": {**branch, "alias": "left_users"},
+            "right": {**branch, "alias": "right_users"},
+            "cte": {"name": "users_cte", "recursive": True},
+        },
+    }
+    hql_branch = {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}, "limit": 5}
+
+    assert query_transformer.transform_query(query) == {
+        "select": {"users": {"id": {}}},
+        "subqueries": {"inner": hql_branch},
+        "union_all": {
+            "name": "users",
+            "left": {**hql_branch, "alias": "left_users"},
+            "right": {**hql_branch, "alias": "right_users"},
+            "cte": {"name": "users_cte", "recursive": True},
+        },
+    }
+    # the client query is left untouched
+    assert query["subqueries"]["inner"] is branch
+    assert "take" in branch
+
+
+def test_case_columns_are_translated():
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .prefix_with("OR IGNORE")
+            .values(
+                [
+                    {"id": 9001, "name": "Case1", "account_balance": 10},
+                    {"id": 9002, "name": "Case2", "account_balance": 200},
+                ]
+            )
+        )
+        testing_connection.commit()
+
+    transformation = QueryTransformation(
+        SelectNode(
+            WhenThenNode("if", "then"),
+            alias="fields",
+            whens_alias="cases",
+            else_alias="otherwise",
+        ),
+        JoinNode(),
+        WhereClauseNode(alias="filter"),
+        HavingClauseNode(),
+        FilterNode(operator_map={"above": "GT", "from": "GTE"}),
+        LimitNode(),
+        OffsetNode(),
+        OrderByNode(SortItemNode()),
+        GroupByNode(),
+        DistinctNode(),
+        SubqueryNode(),
+        HqlCTENode(),
+        HqlUnionNode(),
+        HqlUnionNode(alias="union_all"),
+        ResolverArgsNode(),
+        DebugNode(),
+    )
+    query_generator = QueryGenerator(
+        sqlite_engine,
+        query_transformer=QueryTransformationHandler({"client": transformation}),
+    )
+    status = {
+        "cases": [{"if": {"User.account_balance__above": 100}, "then": "rich"}],
+        "otherwise": "poor",
+    }
+
+    assert query_generator.return_from_hql_query(
+        {
+            "fields": {"User": {"id": {}, "status": status}},
+            "filter": {"User.id__from": 9001},
+            "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+        }
+    ) == [{"id": 9001, "status": "poor"}, {"id": 9002, "status": "rich"}]
+
+
+def test_canonical_queries_are_passed_through():
+    query = {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}, "limit": 5}
+
+    assert QueryTransformationHandler({}).transform_query(query) is query
+    # a transformation using the canonical aliases copies the query
+    transformations = {"canonical": _transformation()}
+    assert QueryTransformationHandler(transformations).transform_query(query) is not query
+    query_transformer = QueryTransformationHandler(transformations, canonical_keys=True)
+    assert query_transformer.transform_query(query) is query
+    assert not query_transformer.is_canonical({**query, "take": 5})
+
+
+def test_generator_skips_transforming_canonical_queries():
+    query = {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": 1}}
+    query_transformer = QueryTransformationHandler({"canonical": _transformation()})
+
+    query_generator = QueryGenerator(
+        sqlite_engine, query_transformer=query_transformer, canonical_queries=True
+    )
+    assert query_generator._prepare_query(query)[0] is query
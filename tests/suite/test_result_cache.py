@@ -0,0 +1,214 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+from sqlalchemy.orm import sessionmaker
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.result_cache import InMemoryResultCache, invalidate_on_commit
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+users_query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.id__GTE": 8001, "User.id__LT": 8100},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+}
+
+
+def _seed_users():
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .values([{"id": 8000 + index, "name": f"Cached{index}"} for index in range(1, 4)])
+            .prefix_with("OR IGNORE")
+        )
+        testing_connection.commit()
+
+
+def test_responses_are_cached_per_shape_and_parameters():
+    _seed_users()
+    query_generator = QueryGenerator(sqlite_engine, result_cache=InMemoryResultCache())
+
+    first_response = query_generator.return_response_from_hql_query(users_query)
+    assert query_generator.return_response_from_hql_query(users_query) == first_response
+    assert [row["id"] for row in first_response["data"]] == [8001, 8002, 8003]
+
+    other_query = {**users_query, "where": {"User.id__GTE": 8002, "User.id__LT": 8100}}
+    assert [row["id"] for row in query_generator.return_from_hql_query(other_query)] == [
+        8002,
+        8003,
+    ]
+    stats = query_generator.result_cache_stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+
+
+def test_entries_record_the_tables_they_read():
+    query_generator = QueryGenerator(sqlite_engine, result_cache=InMemoryResultCache())
+    query = {
+        **users_query,
+        "joins": {
+            "Address": {"select": {"id": {}}, "where": {"Address.user_id__EQ": "User.id"}}
+        },
+    }
+
+    _, tables = query_generator._get_result_key(query)
+    assert tables == frozenset(("user_account", "address"))
+
+
+def test_tables_read_outside_the_selected_models_are_recorded():
+    query_generator = QueryGenerator(sqlite_engine, result_cache=InMemoryResultCache())
+    query = {"select": {"User": {"id": {}, "coalesce(Address.id, 0)": {"label": "address"}}}}
+
+    _, tables = query_generator._get_result_key(query)
+    assert tables == frozenset(("user_account", "address"))
+
+
+def test_cached_responses_are_copied():
+    _seed_users()
+    query_generator = QueryGenerator(sqlite_engine, result_cache=InMemoryResultCache())
+
+    first_response = query_generator.return_response_from_hql_query(users_query)
+    first_response["data"][0]["name"] = "Modified"
+    first_response["data"].pop()
+    first_response["cursor"] = "modified"
+
+    cached_response = query_generator.return_response_from_hql_query(users_query)
+    assert cached_response == {
+        "data": [
+            {"id": 8001, "name": "Cached1"},
+            {"id": 8002, "name": "Cached2"},
+            {"id": 8003, "name": "Cached3"},
+        ]
+    }
+    assert query_generator.result_cache_stats.hits == 1
+
+
+def test_commits_invalidate_the_tables_they_wrote():
+    _seed_users()
+    result_cache = InMemoryResultCache()
+    query_generator = QueryGenerator(sqlite_engine, result_cache=result_cache)
+    session_factory = sessionmaker(sqlite_engine)
+    invalidate_on_commit(session_factory, result_cache)
+
+    assert query_generator.return_from_hql_query(users_query)[0]["name"] == "Cached1"
+    with session_factory() as session:
+        session.get(User, 8001).name = "Renamed1"
+        session.commit()
+
+    try:
+        assert result_cache.stats.size == 0
+        assert query_generator.return_from_hql_query(users_query)[0]["name"] == "Renamed1"
+    finally:
+        with session_factory() as session:
+            session.get(User, 8001).name = "Cached1"
+            session.commit()
+
+
+def test_results_read_before_an_invalidation_are_not_cached():
+    result_cache = InMemoryResultCache()
+    tables = frozenset(("user_account",))
+    generations = result_cache.table_generations(tables)
+    # a write commits while the query is running
+    result_cache.invalidate_tables(["user_account"])
+    result_cache.set("a", {"data": []}, tables, generations)
+    assert result_cache.get("a") is None
+
+    result_cache.set("a", {"data": []}, tables, result_cache.table_generations(tables))
+    assert result_cache.get("a") == {"data": []}
+
+
+class InvalidatingQueryGenerator(QueryGenerator):
+    def _fetch_generated_query(self, *args, **kwargs):
+        fetched = super()._fetch_generated_query(*args, **kwargs)
+        # invalidated after the rows were read, before the response is cached
+        self.result_cache.invalidate_tables(["user_account"])
+        return fetched
+
+
+def test_in_flight_queries_dont_cache_invalidated_results():
+    _seed_users()
+    query_generator = InvalidatingQueryGenerator(
+        sqlite_engine, result_cache=InMemoryResultCache()
+    )
+
+    assert query_generator.return_from_hql_query(users_query)[0]["name"] == "Cached1"
+    assert query_generator.result_cache_stats.size == 0
+
+
+def test_in_memory_cache_bounds():
+    result_cache = InMemoryResultCache(maxsize=2, ttl=0.05)
+    for key in ("a", "b", "c"):
+        result_cache.set(key, {"data": [key]}, frozenset(("user_account",)))
+
+    assert result_cache.get("a") is None
+    assert result_cache.stats.evictions == 1
+    time.sleep(0.06)
+    assert result_cache.get("b") is None
+    assert result_cache.stats.expirations == 1
+    # evicted and expired entries are no longer indexed
+    assert result_cache.invalidate_tables(["user_account"]) == 1
+    assert result_cache.get("c") is None
+
+
+def test_soft_ttl_marks_entries_stale():
+    with pytest.raises(ValueError):
+        InMemoryResultCache(ttl=1, soft_ttl=1)
+
+    result_cache = InMemoryResultCache(ttl=1, soft_ttl=0.05)
+    result_cache.set("a", {"data": []}, frozenset())
+    assert result_cache.lookup("a") == ({"data": []}, False)
+    time.sleep(0.06)
+    assert result_cache.lookup("a") == ({"data": []}, True)
+    assert result_cache.lookup("b") == (None, False)
+
+
+def test_stale_responses_are_served_while_refreshed():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            psql_insert(User)
+            .values([{"id": 8001, "name": "Stale1"}])
+            .on_conflict_do_update(index_elements=[User.id], set_={"name": "Stale1"})
+        )
+        testing_connection.commit()
+
+    result_cache = InMemoryResultCache(ttl=10, soft_ttl=0.05)
+    query_generator = QueryGenerator(psql_engine, result_cache=result_cache)
+    query = {**users_query, "where": {"User.id__EQ": 8001}}
+
+    assert query_generator.return_from_hql_query(query) == [{"id": 8001, "name": "Stale1"}]
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(update(User).where(User.id == 8001).values(name="Fresh1"))
+        testing_connection.commit()
+
+    time.sleep(0.06)
+    assert query_generator.return_from_hql_query(query) == [{"id": 8001, "name": "Stale1"}]
+    deadline = time.monotonic() + 5
+    while query_generator.return_from_hql_query(query)[0]["name"] == "Stale1":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert query_generator.result_cache_stats.misses == 1
+
+
+def test_refresh_failures_are_logged_and_workers_are_closed(caplog):
+    def failing_refresh():
+        raise ValueError("refresh failed")
+
+    def refresh_workers():
+        return [t for t in threading.enumerate() if t.name.startswith("alchemancer-refresh")]
+
+    workers_before = len(refresh_workers())
+    with QueryGenerator(sqlite_engine, result_cache=InMemoryResultCache()) as query_generator:
+        query_generator._refresh_in_background("key", failing_refresh)
+        deadline = time.monotonic() + 5
+        while not caplog.records:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+
+    assert "refresh failed" in caplog.text
+    while len(refresh_workers()) > workers_before:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
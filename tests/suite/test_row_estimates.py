@@ -0,0 +1,91 @@
+import time
+
+from sqlalchemy import text
+
+from alchemancer.lru_cache import LruCache
+from alchemancer.query_generator import QueryGenerator
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+from tests.suite.test_total_count import _seed_users
+
+users_query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "limit": 3,
+    "total_count": "estimate",
+}
+
+
+def _analyze_users():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(text("ANALYZE user_account"))
+        testing_connection.commit()
+
+
+def test_whole_table_estimate_uses_cached_statistics():
+    _seed_users(psql_engine)
+    _analyze_users()
+    with psql_engine.connect() as testing_connection:
+        reltuples = testing_connection.execute(
+            text("SELECT reltuples FROM pg_class WHERE relname = 'user_account'")
+        ).scalar_one()
+
+    query_generator = QueryGenerator(psql_engine)
+    first_response = query_generator.return_response_from_hql_query(users_query)
+    second_response = query_generator.return_response_from_hql_query(users_query)
+
+    assert first_response["total"] == second_response["total"] == round(reltuples)
+    assert first_response["total_is_estimate"] is True
+    assert query_generator.statistics_cache_stats.misses == 1
+    assert query_generator.statistics_cache_stats.hits == 1
+
+
+def test_filtered_estimate_uses_the_planner():
+    _seed_users(psql_engine)
+    _analyze_users()
+    query_generator = QueryGenerator(psql_engine)
+
+    response = query_generator.return_response_from_hql_query(
+        {**users_query, "where": {"User.id__GTE": 6001, "User.id__LT": 6100}}
+    )
+
+    assert response["total_is_estimate"] is True
+    assert response["total"] >= 1
+    assert len(response["data"]) == 3
+    assert query_generator.statistics_cache_stats.misses == 0
+
+
+def test_only_plain_single_model_queries_count_the_table():
+    query_generator = QueryGenerator(psql_engine)
+
+    assert query_generator._get_counted_table(users_query) is User.__table__
+    for query in [
+        {**users_query, "where": {"User.id__GTE": 6001}},
+        {**users_query, "distinct": True},
+        {"select": {"User": {"count(User.id)": {}}}, "total_count": "estimate"},
+        {"select": {"User": {"name": {"label": "user_name"}}}, "total_count": "estimate"},
+    ]:
+        assert query_generator._get_counted_table(query) is None
+
+
+def test_estimate_is_exact_on_sqlite():
+    _seed_users(sqlite_engine)
+
+    response = QueryGenerator(sqlite_engine).return_response_from_hql_query(
+        {**users_query, "where": {"User.id__GTE": 6001, "User.id__LT": 6100}}
+    )
+
+    assert response["total"] == 10
+    assert response["total_is_estimate"] is False
+
+
+def test_lru_cache_ttl():
+    cache = LruCache(ttl=0.05)
+    cache["table"] = 10
+
+    assert cache.get("table") == 10
+    assert "table" in cache
+    time.sleep(0.06)
+    assert "table" not in cache
+    assert cache.get("table") is None
+    assert cache.stats.expirations == 1
+    assert cache.stats.size == 0
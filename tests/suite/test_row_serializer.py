@@ -0,0 +1,101 @@
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+import marshmallow
+import pytest
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.reflection_handler import ReflectionHandler
+from alchemancer.row_serializer import RowSerializer
+from alchemancer.types.marshmallow import JsonBField, JsonField
+from tests.fixtures.test_dbs import sqlite_engine
+
+values_by_type = {
+    int: [0, 7, -3],
+    float: [0.0, 1.5],
+    str: ["", "text", "[not json"],
+    bool: [True, False],
+    dict: [{}, {"a": 1}],
+    date: [date(2024, 2, 29)],
+    datetime: [datetime(2024, 2, 29, 13, 5, 1), datetime(2024, 2, 29, 13, 5, 1, 25)],
+    JsonBField: [{"a": 1}, "", "plain", '{"a": [1, 2]}', "[1, 2]"],
+    JsonField: [{"a": 1}, "", " plain ", ' {"a": [1, 2]}\n', "[1, 2]"],
+}
+
+
+def _dump_with_marshmallow(column_fields, rows):
+    schema_dict = {
+        name: marshmallow.fields.List(field) if is_many else field
+        for name, field, is_many in column_fields
+    }
+    return marshmallow.Schema.from_dict(fields=schema_dict)(many=True).dump(rows)
+
+
+@pytest.mark.parametrize(
+    "python_type", list(ReflectionHandler.python_primitive_types_to_marshmallow_fields)
+)
+@pytest.mark.parametrize("is_many", [False, True])
+def test_output_matches_marshmallow(python_type, is_many):
+    if python_type is list:
+        pytest.skip("list columns are serialized through their item type")
+
+    marshmallow_fields = ReflectionHandler.python_primitive_types_to_marshmallow_fields
+    marshmallow_field = marshmallow_fields[python_type]
+    column_fields = [
+        ("id", marshmallow.fields.Integer(), False),
+        ("value", marshmallow_field(), is_many),
+    ]
+    Row = namedtuple("Row", ["id", "value"])
+    values = values_by_type[python_type]
+    if is_many:
+        values = [values, [None, *values], []]
+    rows = [Row(index, value) for index, value in enumerate([*values, None])]
+
+    expected = _dump_with_marshmallow(column_fields, rows)
+    assert RowSerializer(column_fields).dump(rows) == expected
+
+
+def test_fields_without_converter_are_used_directly():
+    column_fields = [("value", marshmallow.fields.Decimal(as_string=True), False)]
+    Row = namedtuple("Row", ["value"])
+    rows = [Row(1), Row(None)]
+
+    expected = _dump_with_marshmallow(column_fields, rows)
+    assert RowSerializer(column_fields).dump(rows) == expected
+
+
+@pytest.mark.parametrize(
+    "marshmallow_field,value",
+    [
+        (marshmallow.fields.Integer, Decimal("7.9")),
+        (marshmallow.fields.Float, Decimal("1.5")),
+        (marshmallow.fields.String, Decimal("1.5")),
+        (marshmallow.fields.String, 7),
+        (marshmallow.fields.Boolean, 1),
+        (marshmallow.fields.Boolean, "false"),
+    ],
+)
+def test_non_native_values_are_coerced_like_marshmallow(marshmallow_field, value):
+    # drivers can hand back other types than the column's python type, e.g. Decimal for numerics
+    column_fields = [("value", marshmallow_field(), False)]
+    Row = namedtuple("Row", ["value"])
+    rows = [Row(value)]
+
+    results = RowSerializer(column_fields).dump(rows)
+    assert results == _dump_with_marshmallow(column_fields, rows)
+    json.dumps(results)
+
+
+def test_query_generator_output_matches_marshmallow():
+    query = {
+        "select": {"User": {"id": {}, "name": {}, "account_balance": {}}},
+        "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+    }
+    fast_query_generator = QueryGenerator(sqlite_engine, fast_serialization=True)
+
+    assert fast_query_generator.return_from_hql_query(query) == QueryGenerator(
+        sqlite_engine
+    ).return_from_hql_query(query)
+    assert fast_query_generator.schema_classes_created_total == 0
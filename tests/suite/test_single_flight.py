@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.single_flight import SingleFlight
+from tests.fixtures.test_dbs import psql_engine
+
+users_query = {
+    "select": {"User": {"id": {}}},
+    "where": {"User.id__GTE": 8101, "User.id__LT": 8200},
+}
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def execute():
+        executions.append(1)
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(5) as executor:
+        futures = [executor.submit(single_flight.do, "key", execute) for _ in range(5)]
+        _wait_for(lambda: single_flight.saved_executions == 4)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    # finished calls aren't shared
+    assert single_flight.do("key", object) is not results[0]
+    assert single_flight.saved_executions == 4
+
+
+def test_errors_are_shared():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def execute():
+        release.wait()
+        raise ValueError("failed")
+
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(single_flight.do, "key", execute) for _ in range(2)]
+        _wait_for(lambda: single_flight.saved_executions == 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="failed"):
+                future.result()
+
+
+def test_concurrent_tasks_share_one_execution():
+    single_flight = SingleFlight()
+    executions = []
+
+    async def execute():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def run():
+        leader = asyncio.ensure_future(single_flight.do_async("key", execute))
+        waiters = [single_flight.do_async("key", execute) for _ in range(4)]
+        await asyncio.sleep(0)
+        # cancelling the caller that started the execution doesn't fail the others
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    assert single_flight.saved_executions == 4
+
+
+class BlockingQueryGenerator(QueryGenerator):
+    release: threading.Event
+
+    def _fetch_generated_query(self, *args, **kwargs):
+        self.release.wait()
+        return super()._fetch_generated_query(*args, **kwargs)
+
+
+def test_identical_queries_are_coalesced():
+    query_generator = BlockingQueryGenerator(psql_engine, coalesce_queries=True)
+    query_generator.release = threading.Event()
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [
+            executor.submit(query_generator.return_response_from_hql_query, users_query)
+            for _ in range(4)
+        ]
+        _wait_for(lambda: query_generator.coalesced_executions == 3)
+        query_generator.release.set()
+        responses = [future.result() for future in futures]
+
+    # every caller gets its own copy of the shared response
+    assert all(response == responses[0] for response in responses)
+    assert all(response is not responses[0] for response in responses[1:])
+    assert QueryGenerator(psql_engine).coalesced_executions is None
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, text
+
+from alchemancer.query_generator import QueryGenerator
+from alchemancer.reflection_handler import ReflectionHandler
+from alchemancer.statement_timeout import StatementTimeout
+from alchemancer.types.exceptions import QueryTimeoutError
+from tests.fixtures.test_dbs import psql_engine
+from tests.suite.test_total_count import _seed_users
+
+endless_sqlite_query = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c"
+)
+
+
+def _sleep_query(seconds: float):
+    return {
+        "select": {"User": {f"count(pg_sleep({seconds}))": {"label": "slept"}}},
+        "where": {"User.id__EQ": 6001},
+    }
+
+
+def _query_generator(**kwargs):
+    _seed_users(psql_engine)
+    return QueryGenerator(
+        psql_engine, {"count": func.count, "pg_sleep": func.pg_sleep}, **kwargs
+    )
+
+
+def _session_statement_timeout():
+    with psql_engine.connect() as connection:
+        return connection.execute(text("SHOW statement_timeout")).scalar_one()
+
+
+def test_global_timeout():
+    default_timeout = _session_statement_timeout()
+    query_generator = _query_generator(statement_timeout=0.1)
+
+    with pytest.raises(QueryTimeoutError) as error:
+        query_generator.return_from_hql_query(_sleep_query(1))
+
+    assert error.value.to_dict() == {"error": "query_timeout", "timeout": 0.1}
+    assert query_generator.return_from_hql_query(_sleep_query(0)) == [{"slept": 1}]
+    # the timeout ends with the transaction, pooled connections are left as they were
+    assert _session_statement_timeout() == default_timeout
+
+
+def test_timeout_per_call():
+    query_generator = _query_generator(statement_timeout=0.1)
+
+    assert query_generator.return_from_hql_query(_sleep_query(0.3), statement_timeout=5) == [
+        {"slept": 1}
+    ]
+    with pytest.raises(QueryTimeoutError):
+        _query_generator().return_from_hql_query(_sleep_query(1), statement_timeout=0.1)
+
+
+def test_model_timeouts_cap_other_timeouts():
+    ReflectionHandler.set_model_timeout("User", 0.1)
+    try:
+        with pytest.raises(QueryTimeoutError):
+            _query_generator(statement_timeout=5).return_from_hql_query(_sleep_query(1))
+    finally:
+        ReflectionHandler.set_model_timeout("User")
+
+    with pytest.raises(ValueError):
+        ReflectionHandler.set_model_timeout("NotAModel", 1)
+
+
+def test_batch_timeouts_per_query():
+    results = _query_generator().return_from_hql_queries(
+        {"slow": _sleep_query(1), "fast": _sleep_query(0)},
+        return_errors=True,
+        statement_timeout=0.1,
+    )
+
+    assert isinstance(results["slow"], QueryTimeoutError)
+    assert results["fast"] == [{"slept": 1}]
+
+
+def test_postgresql_timeout_is_restored():
+    with psql_engine.connect() as connection:
+        default_timeout = connection.execute(text("SHOW statement_timeout")).scalar_one()
+        with StatementTimeout(connection, 1.5, restore=True):
+            assert connection.execute(text("SHOW statement_timeout")).scalar_one() == "1500ms"
+
+        restored_timeout = connection.execute(text("SHOW statement_timeout")).scalar_one()
+        assert restored_timeout == default_timeout
+
+
+def test_postgresql_timeout_set_by_the_caller_is_restored():
+    with psql_engine.connect() as connection:
+        connection.execute(text("SET LOCAL statement_timeout = '7s'"))
+        with StatementTimeout(connection, 1.5, restore=True):
+            assert connection.execute(text("SHOW statement_timeout")).scalar_one() == "1500ms"
+
+        assert connection.execute(text("SHOW statement_timeout")).scalar_one() == "7s"
+
+
+def test_sqlite_progress_handler():
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        with pytest.raises(QueryTimeoutError):
+            with StatementTimeout(connection, 0.1):
+                connection.execute(endless_sqlite_query)
+
+        with StatementTimeout(connection, 0.1):
+            assert connection.execute(text("SELECT 1")).scalar_one() == 1
+
+        # the handler is removed, statements past the deadline are no longer interrupted
+        time.sleep(0.1)
+        assert connection.execute(text("SELECT 1")).scalar_one() == 1
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+
+from alchemancer.query_generator import QueryGenerator
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine
+
+query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.id__GTE": 3001, "User.id__LT": 3100},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+}
+
+
+def _seed_users():
+    with psql_engine.connect() as testing_connection:
+        testing_connection.execute(
+            psql_insert(User)
+            .values([{"id": 3000 + index, "name": f"Stream{index}"} for index in range(1, 6)])
+            .on_conflict_do_nothing()
+        )
+        testing_connection.commit()
+
+
+def test_results_are_streamed_in_chunks():
+    _seed_users()
+    chunks = list(QueryGenerator(psql_engine).stream_from_hql_query(query, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row for chunk in chunks for row in chunk] == QueryGenerator(
+        psql_engine
+    ).return_from_hql_query(query)
+
+
+def test_connection_is_only_held_while_consuming():
+    _seed_users()
+    checked_out = psql_engine.pool.checkedout()
+    stream = QueryGenerator(psql_engine).stream_from_hql_query(query, chunk_size=2)
+    assert psql_engine.pool.checkedout() == checked_out
+
+    assert next(stream) == [{"id": 3001, "name": "Stream1"}, {"id": 3002, "name": "Stream2"}]
+    assert psql_engine.pool.checkedout() == checked_out + 1
+
+    stream.close()
+    assert psql_engine.pool.checkedout() == checked_out
+
+
+def test_streams_are_validated_when_requested():
+    query_generator = QueryGenerator(psql_engine)
+    with pytest.raises(ValueError):
+        query_generator.stream_from_hql_query(query, chunk_size=0)
+    with pytest.raises(ValueError):
+        query_generator.stream_from_hql_query({**query, "cursor": None, "limit": 2})
@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import insert
+
+from alchemancer.query_generator import QueryGenerator
+from tests.fixtures.models.generic.person import Person
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import sqlite_engine
+
+
+def _seed_users():
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(User)
+            .prefix_with("OR IGNORE")
+            .values(
+                [
+                    {"id": 2001, "name": "TemplateA", "account_balance": 10},
+                    {"id": 2002, "name": "TemplateB", "account_balance": 20},
+                    {"id": 2003, "name": "TemplateC", "account_balance": 30},
+                ]
+            )
+        )
+        testing_connection.commit()
+
+
+def _query(user_id: int, name_like: str):
+    return {
+        "select": {"User": {"id": {}, "name": {}}},
+        "where": {"User.id__GTE": user_id, "User.name__LIKE": name_like},
+        "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+        "limit": 5,
+    }
+
+
+def test_template_is_reused_for_queries_of_the_same_shape():
+    _seed_users()
+    query_generator = QueryGenerator(sqlite_engine)
+
+    first = query_generator.return_from_hql_query(_query(2001, "Template%"))
+    second = query_generator.return_from_hql_query(_query(2002, "%C"))
+
+    assert first == [
+        {"id": 2001, "name": "TemplateA"},
+        {"id": 2002, "name": "TemplateB"},
+        {"id": 2003, "name": "TemplateC"},
+    ]
+    assert second == [{"id": 2003, "name": "TemplateC"}]
+    stats = query_generator.template_cache_stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+
+def test_template_parameters_are_bound_on_hit():
+    query_generator = QueryGenerator(sqlite_engine)
+    first = query_generator._generate_query(_query(1, "%A%"))
+    second = query_generator._generate_query(_query(2, "%B%"))
+
+    assert first.query is second.query
+    assert second.parameters == {"hql_0": 5, "hql_1": 2, "hql_2": "%B%"}
+    assert second.limit == 5
+
+
+def test_template_cache_is_bounded():
+    query_generator = QueryGenerator(sqlite_engine, template_cache_size=1)
+    query_generator._generate_query({"select": {"User": {"id": {}}}})
+    query_generator._generate_query({"select": {"User": {"name": {}}}})
+
+    stats = query_generator.template_cache_stats
+    assert (stats.size, stats.evictions) == (1, 1)
+
+
+def test_template_cache_can_be_disabled():
+    query_generator = QueryGenerator(sqlite_engine, template_cache_size=0)
+    generated_query = query_generator._generate_query(_query(1, "%A%"))
+
+    assert query_generator.template_cache_stats is None
+    assert generated_query.parameters is None
+
+
+def test_result_schema_is_reused():
+    _seed_users()
+    query_generator = QueryGenerator(sqlite_engine)
+    query_generator.return_from_hql_query(_query(2001, "Template%"))
+    query_generator.return_from_hql_query({"select": {"User": {"id": {}, "name": {}}}})
+    query_generator.return_from_hql_query({"select": {"User": {"name": {}}}})
+
+    assert query_generator.schema_classes_created_total == 2
+    stats = query_generator.schema_cache_stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+
+
+def test_schema_classes_created_total_counts_evicted_schemas():
+    query_generator = QueryGenerator(sqlite_engine, schema_cache_size=1)
+    query_generator.return_from_hql_query({"select": {"User": {"id": {}}}})
+    query_generator.return_from_hql_query({"select": {"User": {"name": {}}}})
+    query_generator.return_from_hql_query({"select": {"User": {"id": {}}}})
+
+    assert query_generator.schema_classes_created_total == 3
+    assert query_generator.schema_cache_stats.size == 1
+
+
+@pytest.mark.parametrize("template_cache_size", [0, 256])
+def test_template_parameters_use_the_bind_processing_of_their_column(template_cache_size):
+    with sqlite_engine.connect() as testing_connection:
+        testing_connection.execute(
+            insert(Person).prefix_with("OR IGNORE").values([{"id": 1, "email": "A@X.com"}])
+        )
+        testing_connection.commit()
+
+    query_generator = QueryGenerator(sqlite_engine, template_cache_size=template_cache_size)
+    query = {"select": {"Person": {"id": {}}}, "where": {"Person.email__EQ": "A@X.com"}}
+
+    assert query_generator.return_from_hql_query(query) == [{"id": 1}]
+    assert query_generator.return_from_hql_query(query) == [{"id": 1}]
+
+
+@pytest.mark.parametrize("template_cache_size", [0, 256])
+def test_template_literals_are_checked_like_uncached_ones(template_cache_size):
+    query_generator = QueryGenerator(sqlite_engine, template_cache_size=template_cache_size)
+    query = {"select": {"User": {"id": {}}}, "where": {"User.id__EQ": [1, 2]}}
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="Not implemented yet for type"):
+            query_generator.return_from_hql_query(query)
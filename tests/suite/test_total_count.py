@@ -0,0 +1,106 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as psql_insert
+
+from alchemancer.query_generator import QueryGenerator
+from tests.fixtures.models.generic.user import User
+from tests.fixtures.test_dbs import psql_engine, sqlite_engine
+
+user_rows = [{"id": 6001 + index, "name": f"Total{index % 4}"} for index in range(10)]
+users_query = {
+    "select": {"User": {"id": {}, "name": {}}},
+    "where": {"User.id__GTE": 6001, "User.id__LT": 6100},
+    "order_by": {"User.id": {"index": 0, "dir": "asc"}},
+    "limit": 3,
+}
+
+
+def _seed_users(engine):
+    statement = (
+        psql_insert(User).values(user_rows).on_conflict_do_nothing()
+        if engine is psql_engine
+        else insert(User).values(user_rows).prefix_with("OR IGNORE")
+    )
+    with engine.connect() as testing_connection:
+        testing_connection.execute(statement)
+        testing_connection.commit()
+
+
+@pytest.mark.parametrize("engine", [psql_engine, sqlite_engine])
+def test_window_count(engine):
+    _seed_users(engine)
+    query_generator = QueryGenerator(engine)
+    query = {**users_query, "total_count": True}
+
+    response = query_generator.return_response_from_hql_query(query)
+    assert response["total"] == 10
+    assert response["data"] == [
+        {"id": 6001 + index, "name": f"Total{index}"} for index in range(3)
+    ]
+    assert "count(*) OVER ()" in str(query_generator._generate_query(query).query)
+
+
+def test_window_count_past_the_last_page():
+    _seed_users(psql_engine)
+
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {**users_query, "offset": 20, "total_count": True}
+    )
+    assert response == {"data": [], "total": 10, "total_is_estimate": False}
+
+
+def test_window_count_of_an_empty_result():
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {**users_query, "where": {"User.id__EQ": -1}, "total_count": True}
+    )
+    assert response == {"data": [], "total": 0, "total_is_estimate": False}
+
+
+@pytest.mark.parametrize(
+    "cap,total,total_capped", [(5, 5, True), (10, 10, False), (20, 10, False)]
+)
+def test_capped_count(cap, total, total_capped):
+    _seed_users(psql_engine)
+
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {**users_query, "total_count": cap}
+    )
+    assert len(response["data"]) == 3
+    assert response["total"] == total
+    assert response["total_capped"] is total_capped
+
+
+def test_distinct_count():
+    _seed_users(psql_engine)
+
+    response = QueryGenerator(psql_engine).return_response_from_hql_query(
+        {
+            "select": {"User": {"name": {}}},
+            "where": {"User.id__GTE": 6001, "User.id__LT": 6100},
+            "distinct": True,
+            "limit": 2,
+            "total_count": True,
+        }
+    )
+    assert len(response["data"]) == 2
+    assert response["total"] == 4
+
+
+def test_count_while_keyset_paginating():
+    _seed_users(psql_engine)
+    query_generator = QueryGenerator(psql_engine)
+    query = {**users_query, "cursor": None, "total_count": True}
+
+    first_page = query_generator.return_response_from_hql_query(query)
+    second_page = query_generator.return_response_from_hql_query(
+        {**query, "cursor": first_page["cursor"]}
+    )
+
+    assert first_page["total"] == second_page["total"] == 10
+    assert [row["id"] for row in second_page["data"]] == [6004, 6005, 6006]
+
+
+def test_streaming_rejects_total_count():
+    # raised when the stream is requested, not once it is first consumed
+    with pytest.raises(ValueError):
+        QueryGenerator(psql_engine).stream_from_hql_query({**users_query, "total_count": True})